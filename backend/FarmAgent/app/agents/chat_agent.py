@@ -1,8 +1,10 @@
 import os
 from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_client import get_llm_client
 
 # Environment variables are already loaded globally in main.py
 # So here we just configure the API key
+llm_client = get_llm_client("gemini")
 
 def create_chat_prompt(farmer, user_question, weather_data, risk_scores):
     """Creates the context-aware prompt for the chatbot"""
@@ -42,8 +44,8 @@ async def generate_chat_response(farmer, user_question, weather_data, risk_score
             model="gemini-1.5-flash",
             model_kwargs={}
         )
-        response = llm.invoke(prompt)
-        return response.text.strip()
+        response = await llm_client.call(lambda: llm.ainvoke(prompt), deadline=15)
+        return response.content.strip()
     except Exception as e:
         print(f"Chat error: {e}")
         return "I'm having trouble connecting to weather data right now. Please try again later."
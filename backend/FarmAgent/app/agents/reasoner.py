@@ -1,12 +1,14 @@
 import os
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_client import get_llm_client
 
 load_dotenv()
 chat = ChatGoogleGenerativeAI(
     api_key=os.getenv("GOOGLE_API_KEY"),
     model="gemini-1.5-flash"    
 )
+llm_client = get_llm_client("gemini")
 
 async def generate_advice(farmer: dict, weather: dict, risks: dict) -> str:
     prompt = f"""
@@ -24,7 +26,7 @@ async def generate_advice(farmer: dict, weather: dict, risks: dict) -> str:
     Write direct, urgent message in English. No greetings. Just critical actions.
     """
     try:
-        response = await chat.agenerate(messages=[{"role": "user", "content": prompt}])
-        return response.generations[0][0].text.strip().replace('*', '').replace('#', '')[:160]
+        response = await llm_client.call(lambda: chat.ainvoke(prompt), deadline=15)
+        return response.content.strip().replace('*', '').replace('#', '')[:160]
     except Exception as e:
         return f"URGENT: {risks['disease_risk']*100}% disease risk. {risks['irrigation_action'].upper()} irrigation for {farmer.get('crop')}."
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+import asyncio
 import joblib
 import pandas as pd
 import json
 import os
 from langchain_google_genai import ChatGoogleGenerativeAI
 from huggingface_hub import hf_hub_download
+from llm_client import get_llm_client
 import re
 
 router = APIRouter()
@@ -15,6 +17,8 @@ router = APIRouter()
 model = None
 columns = None
 llm = None
+llm_client = get_llm_client("gemini")
+LLM_DEADLINE_SECONDS = float(os.getenv("FERTILIZER_LLM_DEADLINE_SECONDS", "15"))
 
 # Define model repository information clearly at the top.
 REPO_ID = "adityaarun1010/my-new-models"
@@ -81,7 +85,7 @@ def predict_fertilizer(input_data: dict):
 
 # API Endpoint
 @router.post("/predict")
-def predict(data: FertilizerRequest):
+async def predict(data: FertilizerRequest):
     # Check if models were loaded correctly at startup
     if model is None:
         raise HTTPException(status_code=503, detail="Service Unavailable: Prediction model is not loaded. Please check server logs.")
@@ -91,8 +95,8 @@ def predict(data: FertilizerRequest):
     try:
         input_dict = data.dict()
         
-        # 1. Get prediction from your trained ML model
-        ml_prediction_result = predict_fertilizer(input_dict)
+        # 1. Get prediction from your trained ML model (off the event loop; sklearn/pandas are blocking)
+        ml_prediction_result = await asyncio.to_thread(predict_fertilizer, input_dict)
 
         # 2. Use Gemini for supplemental advice
         gemini_prompt = (
@@ -102,16 +106,19 @@ def predict(data: FertilizerRequest):
             f"Input Data: {json.dumps(input_dict)}"
         )
         
-        response = llm.invoke(gemini_prompt)
-        
         # Default values in case Gemini fails
         recommended_n = input_dict["Nitrogen"] + 20
         recommended_p = input_dict["Phosphorus"] + 20
         recommended_k = input_dict["Potassium"] + 20
         explanation = "Based on standard agricultural models, adjustments are recommended to balance nutrient levels for the selected crop."
 
-        # 3. Parse Gemini's response
-        match = re.search(r'\{[\s\S]*\}', response.content) # Use response.content for langchain
+        # 3. Parse Gemini's response (the ML prediction alone is still useful if Gemini is down)
+        try:
+            response = await llm_client.call(lambda: llm.ainvoke(gemini_prompt), deadline=LLM_DEADLINE_SECONDS)
+            match = re.search(r'\{[\s\S]*\}', response.content) # Use response.content for langchain
+        except Exception as e:
+            print(f"⚠️ Gemini advice unavailable, using default recommendations: {e}")
+            match = None
         if match:
             try:
                 gemini_data = json.loads(match.group(0).replace("'", '"'))
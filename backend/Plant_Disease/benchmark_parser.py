@@ -0,0 +1,61 @@
+"""Micro-benchmark for the diagnosis section parser on recorded Gemini responses.
+
+Measures throughput (MB/s) for parsing a whole response at once and for
+feeding it in small chunks the way /disease/predict-stream does.
+
+Run from backend/:
+    python -m Plant_Disease.benchmark_parser --repeat 8 --chunk-size 64
+"""
+import os
+import glob
+import time
+import argparse
+from typing import Callable
+
+from Plant_Disease.response_parser import DiagnosisStreamParser, parse_diagnosis_text
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def parse_in_chunks(text: str, chunk_size: int):
+    parser = DiagnosisStreamParser()
+    for start in range(0, len(text), chunk_size):
+        parser.feed(text[start:start + chunk_size])
+    parser.close()
+    return parser.result
+
+
+def throughput(fn: Callable[[], object], size_bytes: int, min_time: float) -> float:
+    """Run fn repeatedly for at least min_time seconds and return MB/s"""
+    iterations = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        fn()
+        iterations += 1
+        elapsed = time.perf_counter() - started
+    return size_bytes * iterations / elapsed / 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--responses", default=os.path.join(FIXTURES_DIR, "*.md"),
+                            help="Glob of recorded responses to parse")
+    arg_parser.add_argument("--repeat", type=int, default=1,
+                            help="Concatenate each response N times to simulate longer outputs")
+    arg_parser.add_argument("--chunk-size", type=int, default=64)
+    arg_parser.add_argument("--min-time", type=float, default=0.5)
+    args = arg_parser.parse_args()
+
+    print(f"{'response':<32}{'bytes':>10}{'whole MB/s':>12}{'chunked MB/s':>14}")
+    for path in sorted(glob.glob(args.responses)):
+        with open(path, encoding="utf-8") as f:
+            text = f.read() * args.repeat
+        size = len(text.encode("utf-8"))
+        whole = throughput(lambda: parse_diagnosis_text(text), size, args.min_time)
+        chunked = throughput(lambda: parse_in_chunks(text, args.chunk_size), size, args.min_time)
+        print(f"{os.path.basename(path):<32}{size:>10}{whole:>12.1f}{chunked:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
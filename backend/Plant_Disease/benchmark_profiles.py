@@ -0,0 +1,134 @@
+"""Benchmark analysis profiles against a local stub vision model.
+
+The stub behaves like a verbose model: it answers every field the schema asks
+for, keeps writing markdown sections until it hits the output budget, and
+"generates" at a fixed token rate. Latency and token counts therefore reflect
+each profile's prompt and budget rather than network conditions.
+
+Run from backend/:
+    python -m Plant_Disease.benchmark_profiles --runs 5 --tokens-per-second 200
+"""
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from types import SimpleNamespace
+from typing import Dict, Any, List
+
+from Plant_Disease.prompt_profiles import PROFILES, AnalysisProfile, parse_json_response
+from Plant_Disease.response_parser import DiagnosisStreamParser
+
+CHARS_PER_TOKEN = 4
+SENTENCE = "Remove and destroy infected lower leaves"
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def fill_schema(schema: Dict[str, Any]) -> Any:
+    if schema.get("type") == "object":
+        return {key: fill_schema(sub) for key, sub in schema["properties"].items()}
+    if schema.get("type") == "array":
+        return [SENTENCE] * schema.get("maxItems", 3)
+    if "enum" in schema:
+        return schema["enum"][0]
+    return "Tomato Late Blight"
+
+
+def markdown_response(prompt: str, budget_tokens: int) -> str:
+    lines: List[str] = []
+    chars = 0
+    while chars // CHARS_PER_TOKEN < budget_tokens:
+        for line in prompt.splitlines():
+            if line.startswith("**"):
+                line = line.split("[")[0] + " Tomato Late Blight"
+            elif line.startswith("- ["):
+                line = f"- {SENTENCE}"
+            else:
+                continue
+            lines.append(line)
+            chars += len(line) + 1
+            if chars // CHARS_PER_TOKEN >= budget_tokens:
+                break
+    return "\n".join(lines)
+
+
+class StubVisionModel:
+    """Mimics GenerativeModel.generate_content_async with deterministic output"""
+
+    def __init__(self, tokens_per_second: float, time_to_first_token: float):
+        self.tokens_per_second = tokens_per_second
+        self.time_to_first_token = time_to_first_token
+
+    async def generate_content_async(self, contents, generation_config=None):
+        prompt = contents[0]
+        budget = (generation_config or {}).get("max_output_tokens", 8192)
+        if (generation_config or {}).get("response_mime_type") == "application/json":
+            schema = json.loads(prompt[prompt.index("{"):prompt.rindex("}") + 1])
+            text = json.dumps(fill_schema(schema))
+        else:
+            text = markdown_response(prompt, budget)
+        output_tokens = estimate_tokens(text)
+
+        await asyncio.sleep(self.time_to_first_token + output_tokens / self.tokens_per_second)
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=estimate_tokens(prompt),
+                candidates_token_count=output_tokens
+            )
+        )
+
+
+def parse(text: str, profile: AnalysisProfile) -> Dict[str, Any]:
+    if profile.response_format == "json":
+        return parse_json_response(text, profile.schema)
+    parser = DiagnosisStreamParser()
+    parser.feed(text)
+    parser.close()
+    return parser.result
+
+
+async def benchmark_profile(model: StubVisionModel, profile: AnalysisProfile, runs: int) -> Dict[str, Any]:
+    latencies, parse_times = [], []
+    usage = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = await model.generate_content_async([profile.prompt, None], profile.generation_config)
+        generated = time.perf_counter()
+        parse(response.text, profile)
+        finished = time.perf_counter()
+        latencies.append(finished - started)
+        parse_times.append(finished - generated)
+        usage = response.usage_metadata
+
+    return {
+        "profile": profile.name,
+        "max_output_tokens": profile.max_output_tokens,
+        "prompt_tokens": usage.prompt_token_count,
+        "output_tokens": usage.candidates_token_count,
+        "latency_p50_s": round(statistics.median(latencies), 3),
+        "latency_max_s": round(max(latencies), 3),
+        "parse_ms": round(statistics.median(parse_times) * 1000, 3)
+    }
+
+
+async def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--runs", type=int, default=3)
+    arg_parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    arg_parser.add_argument("--time-to-first-token", type=float, default=0.4)
+    args = arg_parser.parse_args()
+
+    model = StubVisionModel(args.tokens_per_second, args.time_to_first_token)
+    print(f"{'profile':<10}{'budget':>8}{'prompt_tok':>12}{'output_tok':>12}{'p50_s':>9}{'max_s':>9}{'parse_ms':>10}")
+    for profile in PROFILES.values():
+        row = await benchmark_profile(model, profile, args.runs)
+        print(f"{row['profile']:<10}{row['max_output_tokens']:>8}{row['prompt_tokens']:>12}{row['output_tokens']:>12}"
+              f"{row['latency_p50_s']:>9}{row['latency_max_s']:>9}{row['parse_ms']:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # 8x8 difference hash -> 64-bit fingerprint
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """Compute a 64-bit difference hash (dHash) of an image.
+
+    Resizing/recompressing the same photo only flips a few bits, so
+    near-duplicates land within a small Hamming distance of each other.
+    """
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class DiagnosisCache:
+    """LRU + TTL cache of diagnosis results keyed on a perceptual image hash"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 7 * 24 * 3600,
+                 max_distance: int = 4, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.db_path = db_path
+        # (namespace, phash) -> (created, result), least recently used first
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db = None
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS diagnosis_cache ("
+                "namespace TEXT NOT NULL, phash INTEGER NOT NULL, created REAL NOT NULL, "
+                "result TEXT NOT NULL, PRIMARY KEY (namespace, phash))"
+            )
+            self._db.commit()
+            self._load_from_db()
+        except Exception as e:
+            logger.error(f"Failed to open diagnosis cache store {db_path}: {e}")
+            self._db = None
+
+    def _load_from_db(self):
+        cutoff = time.time() - self.ttl_seconds
+        self._db.execute("DELETE FROM diagnosis_cache WHERE created < ?", (cutoff,))
+        rows = self._db.execute(
+            "SELECT namespace, phash, created, result FROM diagnosis_cache "
+            "ORDER BY created DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for namespace, phash, created, result in reversed(rows):
+            # SQLite integers are signed 64-bit; hashes are stored two's-complement
+            self._entries[(namespace, phash & 0xFFFFFFFFFFFFFFFF)] = (created, json.loads(result))
+        self._db.commit()
+        logger.info(f"Loaded {len(rows)} cached diagnoses from {self.db_path}")
+
+    @staticmethod
+    def _to_signed(value: int) -> int:
+        return value - (1 << 64) if value >= (1 << 63) else value
+
+    def get(self, phash: int, namespace: str = "default") -> Optional[Dict[str, Any]]:
+        """Return the closest non-expired result within max_distance, if any"""
+        now = time.time()
+        with self._lock:
+            best_key, best_distance = None, self.max_distance + 1
+            expired = []
+            for key, (created, _) in self._entries.items():
+                if key[0] != namespace:
+                    continue
+                if now - created > self.ttl_seconds:
+                    expired.append(key)
+                    continue
+                distance = hamming_distance(key[1], phash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+            for key in expired:
+                del self._entries[key]
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][1]
+
+    def put(self, phash: int, result: Dict[str, Any], namespace: str = "default"):
+        created = time.time()
+        with self._lock:
+            key = (namespace, phash)
+            self._entries[key] = (created, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO diagnosis_cache (namespace, phash, created, result) "
+                        "VALUES (?, ?, ?, ?)",
+                        (namespace, self._to_signed(phash), created, json.dumps(result))
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    logger.warning(f"Failed to persist diagnosis cache entry: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "persistent": self._db is not None
+            }
+
+
+def create_diagnosis_cache() -> DiagnosisCache:
+    """Build the diagnosis cache from environment configuration"""
+    return DiagnosisCache(
+        max_entries=int(os.getenv("DIAGNOSIS_CACHE_SIZE", "1024")),
+        ttl_seconds=int(os.getenv("DIAGNOSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+        max_distance=int(os.getenv("DIAGNOSIS_CACHE_MAX_DISTANCE", "4")),
+        db_path=os.getenv("DIAGNOSIS_CACHE_PATH") or None
+    )
@@ -0,0 +1,173 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "data", "diagnosis_history.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS diagnoses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    image_hash TEXT,
+    plant_type TEXT,
+    plant_key TEXT,
+    condition TEXT,
+    condition_key TEXT,
+    disease_key TEXT,
+    urgency_level TEXT,
+    confidence REAL,
+    latency_ms REAL,
+    model_type TEXT,
+    profile TEXT,
+    cache_hit INTEGER
+);
+"""
+
+# Created after migrate() so databases from before disease_key can be indexed too
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_diagnoses_created ON diagnoses (created_at);
+CREATE INDEX IF NOT EXISTS idx_diagnoses_condition ON diagnoses (condition_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_diagnoses_disease ON diagnoses (disease_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_diagnoses_plant ON diagnoses (plant_key, created_at);
+"""
+
+GROUP_COLUMNS = {
+    "condition": "condition_key",
+    "plant": "plant_key",
+    "urgency": "urgency_level",
+    "day": "date(created_at, 'unixepoch')",
+}
+
+
+def normalize_key(text: Optional[str]) -> str:
+    """'Tomato Late Blight (Phytophthora infestans)' -> 'tomato late blight'"""
+    text = re.sub(r"\(.*?\)", "", text or "").lower()
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def disease_key(condition_key: str, plant_key: str) -> str:
+    """Condition without the plant name: 'tomato late blight' -> 'late blight'"""
+    if plant_key and condition_key.startswith(plant_key + " "):
+        return condition_key[len(plant_key) + 1:]
+    return condition_key
+
+
+def prefix_range(prefix: str):
+    """[low, high) bounds matching every key starting with prefix, usable by a B-tree index"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class DiagnosisHistoryStore:
+    """Append-only SQLite log of diagnosis results.
+
+    All database work happens on one dedicated thread, so request handlers
+    only enqueue writes and sqlite never blocks the event loop.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+        self._conn: Optional[sqlite3.Connection] = None
+        self.available = True
+        try:
+            self.executor.submit(self._connect).result()
+        except Exception as e:
+            logger.error(f"Failed to open diagnosis history store {db_path}: {e}")
+            self.available = False
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(diagnoses)")}
+        if "disease_key" not in columns:
+            self._conn.execute("ALTER TABLE diagnoses ADD COLUMN disease_key TEXT")
+            self._conn.execute("UPDATE diagnoses SET disease_key = condition_key")
+        self._conn.executescript(INDEXES)
+        self._conn.commit()
+
+    def _insert(self, row: Dict[str, Any]):
+        try:
+            self._conn.execute(
+                "INSERT INTO diagnoses (created_at, image_hash, plant_type, plant_key, condition, condition_key, "
+                "disease_key, urgency_level, confidence, latency_ms, model_type, profile, cache_hit) "
+                "VALUES (:created_at, :image_hash, :plant_type, :plant_key, :condition, :condition_key, "
+                ":disease_key, :urgency_level, :confidence, :latency_ms, :model_type, :profile, :cache_hit)",
+                row
+            )
+            self._conn.commit()
+        except Exception as e:
+            logger.warning(f"Failed to record diagnosis history: {e}")
+
+    def record(self, response: Dict[str, Any], image_hash: Optional[int], latency_ms: float, profile: str):
+        """Queue a diagnosis for storage without waiting for the write"""
+        if not self.available or response.get("status") != "success":
+            return
+        plant_key, condition_key = normalize_key(response.get("plant_type")), normalize_key(response.get("class"))
+        self.executor.submit(self._insert, {
+            "created_at": time.time(),
+            "image_hash": f"{image_hash:016x}" if image_hash is not None else None,
+            "plant_type": response.get("plant_type"),
+            "plant_key": plant_key,
+            "condition": response.get("class"),
+            "condition_key": condition_key,
+            "disease_key": disease_key(condition_key, plant_key),
+            "urgency_level": response.get("urgency_level"),
+            "confidence": response.get("confidence"),
+            "latency_ms": round(latency_ms, 2),
+            "model_type": response.get("model_type"),
+            "profile": profile,
+            "cache_hit": int(bool(response.get("cache_hit"))),
+        })
+
+    def _query(self, condition: Optional[str], plant: Optional[str], days: float,
+               group_by: Optional[str], limit: int) -> Dict[str, Any]:
+        # Cache hits are re-uploads of an image already counted; they would inflate outbreak counts
+        where = ["created_at >= ?", "cache_hit = 0"]
+        params: List[Any] = [time.time() - days * 86400]
+        key = normalize_key(condition)
+        if key:
+            # Prefix ranges on either key, each served by its own index ("late blight" or "tomato late blight")
+            where.append("((condition_key >= ? AND condition_key < ?) OR (disease_key >= ? AND disease_key < ?))")
+            params.extend(prefix_range(key) * 2)
+        if plant:
+            where.append("plant_key = ?")
+            params.append(normalize_key(plant))
+        where_sql = " AND ".join(where)
+
+        total, avg_latency, avg_confidence = self._conn.execute(
+            f"SELECT COUNT(*), AVG(latency_ms), AVG(confidence) FROM diagnoses WHERE {where_sql}", params
+        ).fetchone()
+        result = {
+            "count": total,
+            "avg_latency_ms": round(avg_latency, 2) if avg_latency is not None else None,
+            "avg_confidence": round(avg_confidence, 2) if avg_confidence is not None else None,
+        }
+        if group_by:
+            column = GROUP_COLUMNS[group_by]
+            rows = self._conn.execute(
+                f"SELECT {column} AS bucket, COUNT(*) AS n FROM diagnoses WHERE {where_sql} "
+                f"GROUP BY bucket ORDER BY n DESC LIMIT ?", params + [limit]
+            ).fetchall()
+            result["groups"] = [{"key": bucket, "count": n} for bucket, n in rows]
+        return result
+
+    def query(self, condition: Optional[str] = None, plant: Optional[str] = None, days: float = 7,
+              group_by: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+        """Count diagnoses in the last `days`, optionally filtered and grouped (blocking)"""
+        if group_by and group_by not in GROUP_COLUMNS:
+            raise ValueError(f"group_by must be one of: {', '.join(GROUP_COLUMNS)}")
+        return self.executor.submit(self._query, condition, plant, days, group_by, limit).result()
+
+
+def create_history_store() -> Optional[DiagnosisHistoryStore]:
+    if os.getenv("DIAGNOSIS_HISTORY_ENABLED", "true").lower() != "true":
+        return None
+    return DiagnosisHistoryStore(os.getenv("DIAGNOSIS_HISTORY_PATH", DEFAULT_DB_PATH))
@@ -0,0 +1,106 @@
+import io
+import os
+import time
+import logging
+from typing import Callable, Dict, Tuple
+from fastapi import Request, UploadFile
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+TARGET_SIZE = 1024
+READ_CHUNK_BYTES = 256 * 1024
+# Multipart boundaries, headers and small form fields on top of the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES"""
+
+
+class ContentLengthLimitRoute(APIRoute):
+    """Route that rejects a request with 413 when its declared Content-Length is too large.
+
+    Starlette spools the whole multipart body to a temporary file before the
+    endpoint (and read_upload_limited) runs, so this header check is what
+    actually bounds what the server accepts. Chunked requests without a
+    Content-Length are still spooled in full and only rejected afterwards.
+    """
+
+    def max_request_bytes(self) -> int:
+        return MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        max_bytes = self.max_request_bytes()
+
+        async def limited_handler(request: Request):
+            declared = request.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                return JSONResponse(content={
+                    "error": f"Request is larger than the {max_bytes // (1024 * 1024)}MB limit",
+                    "status": "error"
+                }, status_code=413)
+            return await handler(request)
+
+        return limited_handler
+
+
+async def read_upload_limited(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read an upload in chunks, stopping as soon as it exceeds max_bytes.
+
+    This bounds memory per file; the request body itself is bounded by
+    ContentLengthLimitRoute before it is spooled.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeError(f"File is larger than the {max_bytes // (1024 * 1024)}MB limit")
+
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise UploadTooLargeError(f"File is larger than the {max_bytes // (1024 * 1024)}MB limit")
+    return bytes(buffer)
+
+
+def ingest_image(image_bytes: bytes, max_size: int = TARGET_SIZE) -> Tuple[Image.Image, Dict[str, float]]:
+    """Decode an upload to an RGB image no larger than max_size, with per-stage timings in ms.
+
+    JPEGs are decoded in draft mode, letting libjpeg scale by 1/2, 1/4 or 1/8
+    during decoding so a 12MP photo never materialises at full resolution.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    def mark(stage: str):
+        nonlocal started
+        now = time.perf_counter()
+        timings[stage] = round((now - started) * 1000, 2)
+        started = now
+
+    image = Image.open(io.BytesIO(image_bytes))
+    original_size = image.size
+    if image.format == "JPEG":
+        image.draft("RGB", (max_size, max_size))
+    mark("open")
+
+    image.load()
+    mark("decode")
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    mark("orient_convert")
+
+    if max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    mark("resize")
+
+    logger.info(f"Ingested image {original_size} -> {image.size} in {sum(timings.values()):.1f}ms")
+    return image, timings
@@ -0,0 +1,160 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    import tensorflow as tf
+    TF_AVAILABLE = True
+except ImportError as e:
+    TF_AVAILABLE = False
+    logger.warning(f"TensorFlow not available, local classifier disabled: {e}")
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "trained_model_savedmodel")
+INPUT_SIZE = (128, 128)
+
+# PlantVillage classes in the order the bundled model was trained on
+CLASS_NAMES = [
+    "Apple___Apple_scab", "Apple___Black_rot", "Apple___Cedar_apple_rust", "Apple___healthy",
+    "Blueberry___healthy", "Cherry_(including_sour)___Powdery_mildew", "Cherry_(including_sour)___healthy",
+    "Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot", "Corn_(maize)___Common_rust_", "Corn_(maize)___Northern_Leaf_Blight",
+    "Corn_(maize)___healthy", "Grape___Black_rot", "Grape___Esca_(Black_Measles)",
+    "Grape___Leaf_blight_(Isariopsis_Leaf_Spot)", "Grape___healthy",
+    "Orange___Haunglongbing_(Citrus_greening)", "Peach___Bacterial_spot", "Peach___healthy",
+    "Pepper,_bell___Bacterial_spot", "Pepper,_bell___healthy", "Potato___Early_blight", "Potato___Late_blight",
+    "Potato___healthy", "Raspberry___healthy", "Soybean___healthy", "Squash___Powdery_mildew",
+    "Strawberry___Leaf_scorch", "Strawberry___healthy", "Tomato___Bacterial_spot", "Tomato___Early_blight",
+    "Tomato___Late_blight", "Tomato___Leaf_Mold", "Tomato___Septoria_leaf_spot",
+    "Tomato___Spider_mites Two-spotted_spider_mite", "Tomato___Target_Spot",
+    "Tomato___Tomato_Yellow_Leaf_Curl_Virus", "Tomato___Tomato_mosaic_virus", "Tomato___healthy"
+]
+
+
+def split_class_name(class_name: str) -> Tuple[str, str]:
+    """Split 'Tomato___Late_blight' into ('Tomato', 'Late blight')"""
+    plant, _, condition = class_name.partition("___")
+    plant = plant.replace("_", " ").strip()
+    condition = condition.replace("_", " ").strip()
+    if condition.lower() == "healthy":
+        condition = "Healthy Plant"
+    return plant, condition
+
+
+class LocalClassifier:
+    """CPU inference for the bundled PlantVillage model with request micro-batching.
+
+    Concurrent callers are queued and run through the model together, up to
+    max_batch_size images or max_wait_ms of queueing, whichever comes first.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0, workers: int = 1):
+        self.model_path = model_path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="local-clf")
+        self.model = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches_run = 0
+        self.images_classified = 0
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None
+
+    def load(self):
+        if not TF_AVAILABLE:
+            return
+        try:
+            self.model = tf.keras.models.load_model(self.model_path)
+            # Warm up once so the first request does not pay graph tracing cost
+            self.model.predict(np.zeros((1, *INPUT_SIZE, 3), dtype=np.float32), verbose=0)
+            logger.info(f"✅ Local disease classifier loaded from {self.model_path}")
+        except Exception as e:
+            logger.error(f"Failed to load local disease classifier: {e}")
+            self.model = None
+
+    @staticmethod
+    def _preprocess(image: Image.Image) -> "np.ndarray":
+        image = image.convert("RGB").resize(INPUT_SIZE, Image.Resampling.BILINEAR)
+        return np.asarray(image, dtype=np.float32) / 255.0
+
+    def _predict_batch(self, images: List[Image.Image]) -> "np.ndarray":
+        batch = np.stack([self._preprocess(image) for image in images])
+        prediction = self.model.predict(batch, verbose=0)
+        if not np.allclose(prediction.sum(axis=1), 1.0, atol=1e-3):
+            prediction = tf.nn.softmax(prediction).numpy()
+        return prediction
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            images = [image for image, _ in items]
+            try:
+                predictions = await loop.run_in_executor(self.executor, self._predict_batch, images)
+                for (_, future), prediction in zip(items, predictions):
+                    if not future.done():
+                        future.set_result(prediction)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+            self.batches_run += 1
+            self.images_classified += len(items)
+
+    async def classify(self, image: Image.Image, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Return the top_k classes for an image as [{'class', 'probability'}]"""
+        if not self.available:
+            raise RuntimeError("Local classifier not loaded")
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run_batches())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future))
+        prediction = await future
+
+        top_indices = np.argsort(prediction)[-top_k:][::-1]
+        return [
+            {"class": CLASS_NAMES[index], "probability": float(prediction[index])}
+            for index in top_indices
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "max_batch_size": self.max_batch_size,
+            "batches_run": self.batches_run,
+            "images_classified": self.images_classified,
+            "avg_batch_size": round(self.images_classified / self.batches_run, 2) if self.batches_run else 0.0
+        }
+
+
+def create_local_classifier() -> LocalClassifier:
+    """Build and load the local classifier from environment configuration"""
+    classifier = LocalClassifier(
+        model_path=os.getenv("LOCAL_MODEL_PATH", MODEL_PATH),
+        max_batch_size=int(os.getenv("LOCAL_MODEL_MAX_BATCH", "16")),
+        max_wait_ms=float(os.getenv("LOCAL_MODEL_MAX_WAIT_MS", "5")),
+        workers=int(os.getenv("LOCAL_MODEL_WORKERS", "1"))
+    )
+    if os.getenv("LOCAL_MODEL_ENABLED", "true").lower() == "true":
+        classifier.load()
+    return classifier
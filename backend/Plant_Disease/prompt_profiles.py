@@ -0,0 +1,338 @@
+import os
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
+from .response_parser import empty_result
+
+# The legacy /predict response shape; quick/standard are opt-in via ?profile= or DISEASE_ANALYSIS_PROFILE
+DEFAULT_PROFILE = "full"
+
+URGENCY_LEVELS = ["Critical", "High", "Medium", "Low", "Monitor"]
+CONFIDENCE_LEVELS = ["High", "Medium", "Low"]
+
+
+def _string_list(max_items: int) -> Dict[str, Any]:
+    return {"type": "array", "items": {"type": "string"}, "maxItems": max_items}
+
+
+QUICK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "plant_type": {"type": "string"},
+        "condition": {"type": "string"},
+        "confidence": {"type": "string", "enum": CONFIDENCE_LEVELS},
+        "urgency_level": {"type": "string", "enum": URGENCY_LEVELS},
+        "immediate_actions": _string_list(3)
+    },
+    "required": ["plant_type", "condition", "confidence", "urgency_level", "immediate_actions"]
+}
+
+STANDARD_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "plant_type": {"type": "string"},
+        "condition": {"type": "string"},
+        "confidence": {"type": "string", "enum": CONFIDENCE_LEVELS},
+        "urgency_level": {"type": "string", "enum": URGENCY_LEVELS},
+        "identification_process": _string_list(3),
+        "symptoms": _string_list(5),
+        "causes": _string_list(4),
+        "immediate_actions": _string_list(4),
+        "precautions": _string_list(3),
+        "timeline": _string_list(3),
+        "treatment": {
+            "type": "object",
+            "properties": {
+                "organic": _string_list(4),
+                "chemical": _string_list(4),
+                "prevention": _string_list(4)
+            },
+            "required": ["organic", "chemical", "prevention"]
+        }
+    },
+    "required": ["plant_type", "condition", "confidence", "urgency_level", "symptoms", "causes",
+                 "immediate_actions", "treatment"]
+}
+
+JSON_PROMPT_TEMPLATE = """
+You are an experienced plant pathologist helping a farmer. Examine this plant image and diagnose it.
+
+{instructions}
+
+Respond with ONLY a JSON object (no markdown, no commentary) that matches this JSON schema exactly:
+{schema}
+
+Use "Healthy Plant" as the condition if no problem is visible. Keep every list item to one short, practical sentence.
+"""
+
+# Original exhaustive case-study prompt
+FULL_PROMPT = """
+You are a world-renowned plant pathologist and agricultural specialist with 30+ years of experience. Analyze this plant image with extreme detail and provide the most comprehensive assessment possible. Don't limit information - provide EVERYTHING you can observe and analyze.
+
+IMPORTANT: Be extremely thorough, detailed, and educational. Provide unlimited information in a structured format. This analysis will be used to educate farmers and help save their crops.
+
+Please examine every detail in the image and provide:
+
+**Plant Type**: [Identify the exact plant species, variety if possible, growth stage, and any notable characteristics]
+
+**Overall Health Status**: [Healthy/Diseased/Stressed/Critical - with detailed explanation]
+
+**Specific Condition/Disease**: [Provide the exact disease name, alternative names, scientific pathogen name if applicable]
+**Confidence Level**: [High/Medium/Low - explain in detail why you are confident or uncertain, what additional angles/images would help]
+
+**Detailed Visual Analysis - What I See in the Image**:
+- [Describe EVERY visible symptom in extreme detail]
+- [Color changes: exact colors, gradients, patterns - be very specific]
+- [Spot characteristics: size, shape, borders, centers, halos]
+- [Leaf texture changes: wilting, curling, brittleness, glossiness]
+- [Distribution patterns: where symptoms appear, how they spread]
+- [Severity assessment: percentage of plant affected]
+- [Any visible insects, eggs, webbing, or pest signs]
+- [Stem condition, root visibility if any]
+- [Background clues: soil condition, other plants, environment]
+
+**How I Diagnosed This Disease**:
+- [Step-by-step explanation of the diagnostic process]
+- [Specific visual clues that led to this diagnosis]
+- [Distinctive features that rule out other similar diseases]
+- [Pattern recognition: how symptoms match known disease profiles]
+- [Any unique identifying characteristics]
+- [Comparison with similar-looking conditions]
+- [what disease it has u mention it here. the name of the disease if it has any.]
+**Complete Symptom Breakdown**:
+- [Early stage symptoms and progression]
+- [Current visible symptoms in detail]
+- [Advanced stage symptoms if progression continues]
+- [Microscopic details that might be present]
+- [Seasonal variation in symptom appearance]
+
+**Disease Biology and Pathology**:
+- [Scientific name and classification of the pathogen]
+- [Life cycle of the disease organism]
+- [How the pathogen infects and spreads]
+- [Optimal conditions for pathogen growth]
+- [Host range and susceptibility factors]
+- [Disease triangle: host, pathogen, environment interaction]
+
+**Root Causes and Contributing Factors**:
+- [Primary causes of this condition]
+- [Environmental factors that promote disease]
+- [Cultural practices that increase susceptibility]
+- [Stress factors that weaken plant immunity]
+- [Seasonal timing and weather patterns]
+- [Soil conditions that favor disease]
+- [Water management issues]
+- [Nutrition imbalances that contribute]
+
+**Complete Impact Analysis**:
+- [Immediate effects on plant health]
+- [Impact on photosynthesis and plant metabolism]
+- [Effects on fruit/grain production and quality]
+- [Economic impact and yield losses]
+- [Long-term plant health consequences]
+- [Impact on neighboring plants]
+- [Effects on soil health]
+
+**Disease Progression Timeline**:
+- [Day-by-day progression if untreated]
+- [Critical intervention points]
+- [Point of no return for plant recovery]
+- [Spread rate to other plants]
+- [Seasonal progression patterns]
+
+**Emergency Response Plan**:
+- [Immediate actions in first 24 hours]
+- [Priority steps to prevent spread]
+- [Emergency isolation procedures]
+- [Quick diagnostic confirmation methods]
+- [Damage control measures]
+
+**Comprehensive Treatment Strategy**:
+
+**Organic and Natural Treatments**:
+- [Detailed homemade remedies with exact recipes]
+- [Application methods, timing, and frequency]
+- [Beneficial microorganisms and biological controls]
+- [Plant-based treatments and essential oils]
+- [Soil amendments and organic fertilizers]
+- [Cultural control methods]
+- [Companion planting solutions]
+
+**Chemical Treatment Options**:
+- [Specific fungicides/pesticides with active ingredients]
+- [Commercial product names and concentrations]
+- [Application rates and mixing instructions]
+- [Spray timing and weather considerations]
+- [Resistance management strategies]
+- [Safety equipment and precautions]
+- [Pre-harvest interval and safety periods]
+
+**Integrated Management Approach**:
+- [Combination treatment strategies]
+- [Sequential treatment protocols]
+- [Monitoring and adjustment procedures]
+- [Resistance prevention methods]
+
+**Prevention and Long-term Management**:
+- [Detailed cultural practices for prevention]
+- [Resistant varieties and genetic solutions]
+- [Soil health improvement strategies]
+- [Water management best practices]
+- [Nutrition and fertilization programs]
+- [Crop rotation recommendations]
+- [Sanitation and hygiene protocols]
+- [Monitoring and early detection methods]
+
+**Critical Safety Information**:
+- [Personal protective equipment needed]
+- [Handling precautions for affected plants]
+- [Chemical safety and application warnings]
+- [First aid measures if needed]
+- [Environmental protection measures]
+- [What NOT to do - common dangerous mistakes]
+- [When to evacuate/abandon treatment]
+
+**Recovery and Monitoring Timeline**:
+- [Expected response to treatment (daily/weekly)]
+- [Key indicators of improvement]
+- [Warning signs of treatment failure]
+- [When to change treatment approach]
+- [Long-term recovery expectations]
+- [Monitoring schedule and checkpoints]
+
+**Professional Recommendations**:
+- [Expert tips for optimal results]
+- [Advanced diagnostic techniques]
+- [Professional consultation recommendations]
+- [Laboratory testing options]
+- [Extension service resources]
+- [Specialized equipment or tools needed]
+
+**Environmental Modifications**:
+- [Microclimate adjustments needed]
+- [Greenhouse or protection requirements]
+- [Air circulation improvements]
+- [Lighting and shading modifications]
+- [Temperature and humidity management]
+
+**Similar Diseases to Rule Out**:
+- [Differential diagnosis considerations]
+- [How to distinguish from look-alike conditions]
+- [Additional tests or observations needed]
+
+**Economic Considerations**:
+- [Cost-benefit analysis of treatments]
+- [Most economical effective treatments]
+- [When treatment isn't economically viable]
+- [Insurance and crop loss considerations]
+
+**Research and Latest Developments**:
+- [Recent scientific findings on this disease]
+- [New treatment methods or products]
+- [Emerging resistant varieties]
+- [Climate change impacts on this disease]
+
+**Regional Considerations**:
+- [Geographic prevalence patterns]
+- [Local regulatory restrictions]
+- [Regional treatment preferences]
+- [Climate-specific recommendations]
+
+**Urgency Classification**: [Critical/High/Medium/Low - with detailed explanation of timeframe and consequences of delay]
+
+Be extremely detailed, scientific, and practical. Provide as much information as possible - there are no limits. Think like you're writing a comprehensive case study that will be used to train future plant pathologists.
+"""
+
+@dataclass
+class AnalysisProfile:
+    """A prompt, output-token budget and output format for one depth of analysis"""
+    name: str
+    description: str
+    prompt: str
+    max_output_tokens: int
+    response_format: str  # "json" or "markdown"
+    schema: Optional[Dict[str, Any]] = None
+    generation_config: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.generation_config = {"max_output_tokens": self.max_output_tokens}
+        if self.response_format == "json":
+            self.generation_config["response_mime_type"] = "application/json"
+
+
+PROFILES: Dict[str, AnalysisProfile] = {
+    "quick": AnalysisProfile(
+        name="quick",
+        description="Triage: plant, condition, urgency and up to three immediate actions",
+        prompt=JSON_PROMPT_TEMPLATE.format(
+            instructions="Give a fast triage only: what the plant is, what is wrong, how urgent it is and what to do today.",
+            schema=json.dumps(QUICK_SCHEMA)
+        ),
+        max_output_tokens=256,
+        response_format="json",
+        schema=QUICK_SCHEMA
+    ),
+    "standard": AnalysisProfile(
+        name="standard",
+        description="Diagnosis with symptoms, causes, actions and organic/chemical/preventive treatments",
+        prompt=JSON_PROMPT_TEMPLATE.format(
+            instructions="Give a complete but concise diagnosis with the evidence you used, likely causes and a treatment plan.",
+            schema=json.dumps(STANDARD_SCHEMA)
+        ),
+        max_output_tokens=1024,
+        response_format="json",
+        schema=STANDARD_SCHEMA
+    ),
+    "full": AnalysisProfile(
+        name="full",
+        description="Full case study covering pathology, economics, research and regional considerations",
+        prompt=FULL_PROMPT,
+        max_output_tokens=8192,
+        response_format="markdown"
+    )
+}
+
+
+def coerce_to_schema(value: Any, schema: Dict[str, Any]) -> Any:
+    """Coerce model JSON into the schema: drop unknown keys, fill defaults, clip lists and enums"""
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        value = value if isinstance(value, dict) else {}
+        return {
+            key: coerce_to_schema(value.get(key), sub_schema)
+            for key, sub_schema in schema["properties"].items()
+        }
+    if schema_type == "array":
+        items = value if isinstance(value, list) else []
+        items = [coerce_to_schema(item, schema["items"]) for item in items]
+        items = [item for item in items if item]
+        return items[:schema.get("maxItems", len(items))]
+    if value is None:
+        return schema["enum"][-1] if "enum" in schema else ""
+    text = str(value).strip()
+    if "enum" in schema:
+        for option in schema["enum"]:
+            if option.lower() in text.lower():
+                return option
+        return schema["enum"][-1]
+    return text
+
+
+def parse_json_response(response_text: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Parse a JSON-mode response into the structured analysis shape"""
+    data = coerce_to_schema(json.loads(response_text), schema)
+    result = empty_result()
+    for key, value in data.items():
+        if key == "treatment":
+            result["treatment"].update(value)
+        elif value:
+            result[key] = value
+    return result
+
+
+def get_profile(name: Optional[str]) -> AnalysisProfile:
+    """Profile by name, or the configured default; raises ValueError for unknown names"""
+    name = name or os.getenv("DISEASE_ANALYSIS_PROFILE") or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown analysis profile '{name}'. Available: {', '.join(PROFILES)}")
+    return PROFILES[name]
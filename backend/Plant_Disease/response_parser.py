@@ -0,0 +1,176 @@
+import re
+import json
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+# Header keyword -> result section, checked in order (first match wins)
+SECTION_TABLE: List[Tuple[Tuple[str, ...], Optional[str]]] = [
+    (("plant type",), "plant_type"),
+    (("urgency",), "urgency_level"),
+    (("confidence",), "confidence"),
+    (("specific condition", "condition"), "condition"),
+    (("organic",), "organic"),
+    (("chemical",), "chemical"),
+    (("prevention",), "prevention"),
+    (("why this happens", "disease biology"), "why_happens"),
+    (("what causes", "causes"), "causes"),
+    (("symptom", "visual analysis"), "symptoms"),
+    (("how i identified", "how i diagnosed", "identification"), "identification_process"),
+    (("impact",), "impact_progression"),
+    (("immediate actions", "emergency response"), "immediate_actions"),
+    (("precautions", "safety"), "precautions"),
+    (("timeline",), "timeline"),
+    (("additional tips", "professional recommendations"), "additional_tips"),
+]
+
+SCALAR_SECTIONS = {"plant_type", "condition", "confidence", "urgency_level"}
+TREATMENT_SECTIONS = {"organic", "chemical", "prevention"}
+
+HEADER_RE = re.compile(r"^\*\*(.+?)\*\*:?\s*(.*)$")
+LIST_MARKERS = ("-", "•", "*")
+
+PLANT_TYPE_PLACEHOLDERS = {"[Name of the plant species, e.g., Tomato, Corn, Apple, etc.]", "Unknown"}
+CONDITION_PLACEHOLDERS = {"[Name the specific disease, pest, or condition - be specific, e.g., \"Tomato Late Blight\", \"Apple Scab\", \"Healthy Plant\", etc.]", "Unknown"}
+
+
+def empty_result() -> Dict[str, Any]:
+    return {
+        "plant_type": "Unknown",
+        "condition": "Unknown",
+        "confidence": "Medium",
+        "identification_process": [],
+        "symptoms": [],
+        "causes": [],
+        "why_happens": [],
+        "impact_progression": [],
+        "immediate_actions": [],
+        "precautions": [],
+        "timeline": [],
+        "additional_tips": [],
+        "urgency_level": "Monitor",
+        "treatment": {
+            "organic": [],
+            "chemical": [],
+            "prevention": []
+        }
+    }
+
+
+@lru_cache(maxsize=512)
+def match_section(header: str) -> Optional[str]:
+    """Map a header or key to its result section; headers repeat, so lookups are memoized"""
+    header = header.lower()
+    for keywords, section in SECTION_TABLE:
+        for keyword in keywords:
+            if keyword in header:
+                return section
+    return None
+
+
+class DiagnosisStreamParser:
+    """Incremental parser for Gemini's markdown diagnosis.
+
+    Feed it text chunks as they arrive; each call returns the sections that
+    were completed by that chunk as (section, value) pairs.
+    """
+
+    def __init__(self):
+        self.result = empty_result()
+        self._buffer = ""
+        self._current: Optional[str] = None
+
+    def _section_value(self, section: str) -> Any:
+        if section in TREATMENT_SECTIONS:
+            return self.result["treatment"][section]
+        return self.result[section]
+
+    def _close_section(self, events: List[Tuple[str, Any]]):
+        section = self._current
+        self._current = None
+        if section and section not in SCALAR_SECTIONS and self._section_value(section):
+            events.append((section, self._section_value(section)))
+
+    def _set_scalar(self, section: str, value: str, events: List[Tuple[str, Any]]):
+        value = value.replace("[", "").replace("]", "").strip()
+        if value:
+            self.result[section] = value
+            events.append((section, value))
+
+    def _process_line(self, line: str, events: List[Tuple[str, Any]]):
+        line = line.strip()
+        if not line:
+            return
+
+        header = HEADER_RE.match(line)
+        if header:
+            section = match_section(header.group(1))
+            self._close_section(events)
+            if section in SCALAR_SECTIONS and header.group(2):
+                self._set_scalar(section, header.group(2), events)
+            else:
+                self._current = section
+            return
+
+        if line.startswith(LIST_MARKERS):
+            item = line[1:].strip()
+            if not item or item.startswith("[") and item.endswith("]"):
+                return
+            if self._current and self._current not in SCALAR_SECTIONS:
+                self._section_value(self._current).append(item)
+            return
+
+        if ":" in line:
+            key, value = line.split(":", 1)
+            section = match_section(key.replace("**", ""))
+            if section in SCALAR_SECTIONS:
+                self._set_scalar(section, value, events)
+                return
+
+        # Plain text directly under a scalar header is its value
+        if self._current in SCALAR_SECTIONS:
+            self._set_scalar(self._current, line, events)
+            self._current = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        events: List[Tuple[str, Any]] = []
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            self._process_line(line, events)
+        return events
+
+    def close(self) -> List[Tuple[str, Any]]:
+        events: List[Tuple[str, Any]] = []
+        if self._buffer:
+            self._process_line(self._buffer, events)
+            self._buffer = ""
+        self._close_section(events)
+
+        if self.result["plant_type"] in PLANT_TYPE_PLACEHOLDERS:
+            self.result["plant_type"] = "Unknown Plant"
+        if self.result["condition"] in CONDITION_PLACEHOLDERS:
+            self.result["condition"] = "Unknown Condition"
+        return events
+
+
+_json_decoder = json.JSONDecoder()
+
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Decode the first JSON object embedded in text, honouring nested braces"""
+    start = text.find("{")
+    if start == -1:
+        return None
+    try:
+        value, _ = _json_decoder.raw_decode(text, start)
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def parse_diagnosis_text(text: str) -> Dict[str, Any]:
+    """Parse a complete markdown diagnosis in one pass"""
+    parser = DiagnosisStreamParser()
+    parser.feed(text)
+    parser.close()
+    return parser.result
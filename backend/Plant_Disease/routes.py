@@ -1,15 +1,26 @@
 import os
 import base64
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from PIL import Image
-import io
 import json
-import re
 import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
-from typing import Dict, Any
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from llm_client import get_llm_client
+from .diagnosis_cache import create_diagnosis_cache, perceptual_hash
+from .local_classifier import create_local_classifier, split_class_name
+from .response_parser import DiagnosisStreamParser, extract_json_object, parse_diagnosis_text
+from .history_store import create_history_store
+from .image_ingest import (
+    ContentLengthLimitRoute, UploadTooLargeError, ingest_image, read_upload_limited, MAX_UPLOAD_BYTES
+)
+from .prompt_profiles import AnalysisProfile, PROFILES, get_profile, parse_json_response
 
 # Load environment variables
 load_dotenv()
@@ -18,7 +29,18 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/disease", tags=["Plant Disease"])
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "100"))
+MAX_BATCH_REQUEST_BYTES = int(os.getenv("MAX_BATCH_REQUEST_BYTES", str(200 * 1024 * 1024)))
+
+class DiseaseRoute(ContentLengthLimitRoute):
+    """Single-image routes get the per-file cap; the batch route a whole-survey cap"""
+
+    def max_request_bytes(self) -> int:
+        if self.path.endswith("/predict-batch"):
+            return MAX_BATCH_REQUEST_BYTES
+        return super().max_request_bytes()
+
+router = APIRouter(prefix="/disease", tags=["Plant Disease"], route_class=DiseaseRoute)
 
 # Initialize Gemini API
 try:
@@ -33,164 +55,65 @@ except Exception as e:
     logger.error(f"Failed to initialize Gemini API: {str(e)}")
     gemini_model = None
 
-def process_image_for_gemini(image_bytes: bytes) -> Image.Image:
-    """Process image for optimal Gemini analysis"""
-    try:
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize for optimal processing (Gemini works well with various sizes)
-        # Keep aspect ratio and ensure reasonable size
-        max_size = 1024
-        if max(image.size) > max_size:
-            ratio = max_size / max(image.size)
-            new_size = tuple(int(dim * ratio) for dim in image.size)
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
-        
-        logger.info(f"Processed image size: {image.size}")
-        return image
-        
-    except Exception as e:
-        logger.error(f"Error processing image: {str(e)}")
-        raise
+# Cap on concurrent Gemini calls so a burst of diagnoses cannot exhaust quota
+# or starve other routers sharing this worker
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+# Deadlines, retries, hedging and the circuit breaker are shared with the other Gemini callers
+llm_client = get_llm_client("gemini")
+GEMINI_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", "60"))
+
+async def generate_gemini_content(contents, generation_config: Optional[Dict[str, Any]] = None):
+    """Run a Gemini generate_content call without blocking the event loop"""
+    async def attempt():
+        async with gemini_semaphore:
+            return await gemini_model.generate_content_async(contents, generation_config=generation_config)
+
+    return await llm_client.call(attempt, deadline=GEMINI_DEADLINE_SECONDS)
+
+async def stream_gemini_content(contents, generation_config: Optional[Dict[str, Any]] = None):
+    """Yield Gemini response text chunks as they are generated"""
+    async with gemini_semaphore:
+        # Only opening the stream is retried; a stream that breaks midway is counted as a failure
+        response = await llm_client.call(
+            lambda: gemini_model.generate_content_async(contents, generation_config=generation_config, stream=True),
+            deadline=GEMINI_DEADLINE_SECONDS,
+            hedge=False
+        )
+        try:
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            llm_client.record_failure(e)
+            raise
+
+# Decoding and resizing run here so large uploads do not block the event loop
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+
+# Near-duplicate uploads are answered from here instead of calling Gemini again
+diagnosis_cache = create_diagnosis_cache()
+
+# Append-only log of every diagnosis, queried by the outbreak dashboard
+history_store = create_history_store()
+
+# Bundled PlantVillage model; Gemini is only consulted when it is unsure
+local_classifier = create_local_classifier()
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_CONFIDENCE_THRESHOLD", "0.85"))
 
 def extract_structured_response(response_text: str) -> Dict[str, Any]:
     """Extract structured information from Gemini's response"""
     try:
-        # Try to extract JSON if present
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group())
-            except json.JSONDecodeError:
-                pass
-        
-        # Fall back to text parsing with improved structure
-        lines = response_text.strip().split('\n')
-        result = {
-            "plant_type": "Unknown",
-            "condition": "Unknown",
-            "confidence": "Medium",
-            "identification_process": [],
-            "symptoms": [],
-            "causes": [],
-            "why_happens": [],
-            "impact_progression": [],
-            "immediate_actions": [],
-            "precautions": [],
-            "timeline": [],
-            "additional_tips": [],
-            "urgency_level": "Monitor",
-            "treatment": {
-                "organic": [],
-                "chemical": [],
-                "prevention": []
-            }
-        }
-        
-        current_section = None
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Check for structured section headers (with **)
-            if line.startswith('**') and line.endswith('**'):
-                header = line.replace('**', '').strip().lower()
-                if 'plant type' in header:
-                    current_section = 'plant_type'
-                elif 'specific condition' in header or 'condition' in header:
-                    current_section = 'condition'
-                elif 'confidence' in header:
-                    current_section = 'confidence'
-                elif 'how i identified' in header or 'identification' in header:
-                    current_section = 'identification_process'
-                elif 'detailed symptoms' in header or 'symptoms' in header:
-                    current_section = 'symptoms'
-                elif 'what causes' in header or 'causes' in header:
-                    current_section = 'causes'
-                elif 'why this happens' in header:
-                    current_section = 'why_happens'
-                elif 'impact and progression' in header:
-                    current_section = 'impact_progression'
-                elif 'immediate actions' in header:
-                    current_section = 'immediate_actions'
-                elif 'important precautions' in header or 'precautions' in header:
-                    current_section = 'precautions'
-                elif 'expected timeline' in header or 'timeline' in header:
-                    current_section = 'timeline'
-                elif 'additional tips' in header:
-                    current_section = 'additional_tips'
-                elif 'urgency level' in header or 'urgency' in header:
-                    current_section = 'urgency_level'
-                elif 'organic treatment' in header:
-                    current_section = 'organic'
-                elif 'chemical treatment' in header:
-                    current_section = 'chemical'
-                elif 'prevention and future care' in header or 'prevention' in header:
-                    current_section = 'prevention'
-                continue
-            
-            # Check for key-value pairs (with :)
-            if ':' in line and not line.startswith('-'):
-                key, value = line.split(':', 1)
-                key = key.strip().lower().replace('**', '')
-                value = value.strip().replace('[', '').replace(']', '')
-                
-                if 'plant type' in key:
-                    result["plant_type"] = value
-                elif 'specific condition' in key or 'condition' in key:
-                    result["condition"] = value
-                elif 'confidence' in key:
-                    result["confidence"] = value
-                continue
-            
-            # Handle list items
-            if line.startswith('-') or line.startswith('•') or line.startswith('*'):
-                item = line[1:].strip()
-                if not item or item.startswith('[') and item.endswith(']'):
-                    continue
-                    
-                if current_section == 'identification_process':
-                    result["identification_process"].append(item)
-                elif current_section == 'symptoms':
-                    result["symptoms"].append(item)
-                elif current_section == 'causes':
-                    result["causes"].append(item)
-                elif current_section == 'why_happens':
-                    result["why_happens"].append(item)
-                elif current_section == 'impact_progression':
-                    result["impact_progression"].append(item)
-                elif current_section == 'immediate_actions':
-                    result["immediate_actions"].append(item)
-                elif current_section == 'precautions':
-                    result["precautions"].append(item)
-                elif current_section == 'timeline':
-                    result["timeline"].append(item)
-                elif current_section == 'additional_tips':
-                    result["additional_tips"].append(item)
-                elif current_section == 'organic':
-                    result["treatment"]["organic"].append(item)
-                elif current_section == 'chemical':
-                    result["treatment"]["chemical"].append(item)
-                elif current_section == 'prevention':
-                    result["treatment"]["prevention"].append(item)
-            
-            # Handle urgency level as text (not list item)
-            elif current_section == 'urgency_level' and line.strip():
-                result["urgency_level"] = line.strip()
-        
-        # Clean up empty bracket placeholders
-        if result["plant_type"] in ["[Name of the plant species, e.g., Tomato, Corn, Apple, etc.]", "Unknown"]:
-            result["plant_type"] = "Unknown Plant"
-        if result["condition"] in ["[Name the specific disease, pest, or condition - be specific, e.g., \"Tomato Late Blight\", \"Apple Scab\", \"Healthy Plant\", etc.]", "Unknown"]:
-            result["condition"] = "Unknown Condition"
-            
-        return result
-        
+        # Use an embedded JSON object if the response contains one
+        json_result = extract_json_object(response_text)
+        if json_result is not None:
+            return json_result
+
+        # Otherwise parse the markdown sections in a single pass
+        return parse_diagnosis_text(response_text)
+
     except Exception as e:
         logger.error(f"Error extracting structured response: {str(e)}")
         return {
@@ -200,194 +123,36 @@ def extract_structured_response(response_text: str) -> Dict[str, Any]:
             "raw_response": response_text
         }
 
-async def analyze_plant_with_gemini(image: Image.Image) -> Dict[str, Any]:
-    """Use Gemini Vision to analyze plant health"""
+def parse_profile_response(response_text: str, profile: AnalysisProfile) -> Dict[str, Any]:
+    """Parse model output according to the profile's response format"""
+    if profile.response_format == "json":
+        try:
+            return parse_json_response(response_text, profile.schema)
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.warning(f"Profile '{profile.name}' returned invalid JSON, falling back to text parsing: {e}")
+    return extract_structured_response(response_text)
+
+def usage_from_response(response) -> Dict[str, int]:
+    """Token counts reported by Gemini for a response"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", 0),
+        "output_tokens": getattr(usage, "candidates_token_count", 0),
+        "total_tokens": getattr(usage, "total_token_count", 0)
+    }
+
+async def analyze_plant_with_gemini(image: Image.Image, profile: AnalysisProfile) -> Dict[str, Any]:
+    """Use Gemini Vision to analyze plant health with the given analysis profile"""
     if gemini_model is None:
         raise ValueError("Gemini model not initialized")
     
     try:
-        # Create an extremely comprehensive prompt for detailed plant disease analysis
-        prompt = """
-You are a world-renowned plant pathologist and agricultural specialist with 30+ years of experience. Analyze this plant image with extreme detail and provide the most comprehensive assessment possible. Don't limit information - provide EVERYTHING you can observe and analyze.
-
-IMPORTANT: Be extremely thorough, detailed, and educational. Provide unlimited information in a structured format. This analysis will be used to educate farmers and help save their crops.
-
-Please examine every detail in the image and provide:
-
-**Plant Type**: [Identify the exact plant species, variety if possible, growth stage, and any notable characteristics]
-
-**Overall Health Status**: [Healthy/Diseased/Stressed/Critical - with detailed explanation]
-
-**Specific Condition/Disease**: [Provide the exact disease name, alternative names, scientific pathogen name if applicable]
-**Confidence Level**: [High/Medium/Low - explain in detail why you are confident or uncertain, what additional angles/images would help]
-
-**Detailed Visual Analysis - What I See in the Image**:
-- [Describe EVERY visible symptom in extreme detail]
-- [Color changes: exact colors, gradients, patterns - be very specific]
-- [Spot characteristics: size, shape, borders, centers, halos]
-- [Leaf texture changes: wilting, curling, brittleness, glossiness]
-- [Distribution patterns: where symptoms appear, how they spread]
-- [Severity assessment: percentage of plant affected]
-- [Any visible insects, eggs, webbing, or pest signs]
-- [Stem condition, root visibility if any]
-- [Background clues: soil condition, other plants, environment]
-
-**How I Diagnosed This Disease**:
-- [Step-by-step explanation of the diagnostic process]
-- [Specific visual clues that led to this diagnosis]
-- [Distinctive features that rule out other similar diseases]
-- [Pattern recognition: how symptoms match known disease profiles]
-- [Any unique identifying characteristics]
-- [Comparison with similar-looking conditions]
-- [what disease it has u mention it here. the name of the disease if it has any.]
-**Complete Symptom Breakdown**:
-- [Early stage symptoms and progression]
-- [Current visible symptoms in detail]
-- [Advanced stage symptoms if progression continues]
-- [Microscopic details that might be present]
-- [Seasonal variation in symptom appearance]
-
-**Disease Biology and Pathology**:
-- [Scientific name and classification of the pathogen]
-- [Life cycle of the disease organism]
-- [How the pathogen infects and spreads]
-- [Optimal conditions for pathogen growth]
-- [Host range and susceptibility factors]
-- [Disease triangle: host, pathogen, environment interaction]
-
-**Root Causes and Contributing Factors**:
-- [Primary causes of this condition]
-- [Environmental factors that promote disease]
-- [Cultural practices that increase susceptibility]
-- [Stress factors that weaken plant immunity]
-- [Seasonal timing and weather patterns]
-- [Soil conditions that favor disease]
-- [Water management issues]
-- [Nutrition imbalances that contribute]
-
-**Complete Impact Analysis**:
-- [Immediate effects on plant health]
-- [Impact on photosynthesis and plant metabolism]
-- [Effects on fruit/grain production and quality]
-- [Economic impact and yield losses]
-- [Long-term plant health consequences]
-- [Impact on neighboring plants]
-- [Effects on soil health]
-
-**Disease Progression Timeline**:
-- [Day-by-day progression if untreated]
-- [Critical intervention points]
-- [Point of no return for plant recovery]
-- [Spread rate to other plants]
-- [Seasonal progression patterns]
-
-**Emergency Response Plan**:
-- [Immediate actions in first 24 hours]
-- [Priority steps to prevent spread]
-- [Emergency isolation procedures]
-- [Quick diagnostic confirmation methods]
-- [Damage control measures]
-
-**Comprehensive Treatment Strategy**:
-
-**Organic and Natural Treatments**:
-- [Detailed homemade remedies with exact recipes]
-- [Application methods, timing, and frequency]
-- [Beneficial microorganisms and biological controls]
-- [Plant-based treatments and essential oils]
-- [Soil amendments and organic fertilizers]
-- [Cultural control methods]
-- [Companion planting solutions]
-
-**Chemical Treatment Options**:
-- [Specific fungicides/pesticides with active ingredients]
-- [Commercial product names and concentrations]
-- [Application rates and mixing instructions]
-- [Spray timing and weather considerations]
-- [Resistance management strategies]
-- [Safety equipment and precautions]
-- [Pre-harvest interval and safety periods]
-
-**Integrated Management Approach**:
-- [Combination treatment strategies]
-- [Sequential treatment protocols]
-- [Monitoring and adjustment procedures]
-- [Resistance prevention methods]
-
-**Prevention and Long-term Management**:
-- [Detailed cultural practices for prevention]
-- [Resistant varieties and genetic solutions]
-- [Soil health improvement strategies]
-- [Water management best practices]
-- [Nutrition and fertilization programs]
-- [Crop rotation recommendations]
-- [Sanitation and hygiene protocols]
-- [Monitoring and early detection methods]
-
-**Critical Safety Information**:
-- [Personal protective equipment needed]
-- [Handling precautions for affected plants]
-- [Chemical safety and application warnings]
-- [First aid measures if needed]
-- [Environmental protection measures]
-- [What NOT to do - common dangerous mistakes]
-- [When to evacuate/abandon treatment]
-
-**Recovery and Monitoring Timeline**:
-- [Expected response to treatment (daily/weekly)]
-- [Key indicators of improvement]
-- [Warning signs of treatment failure]
-- [When to change treatment approach]
-- [Long-term recovery expectations]
-- [Monitoring schedule and checkpoints]
-
-**Professional Recommendations**:
-- [Expert tips for optimal results]
-- [Advanced diagnostic techniques]
-- [Professional consultation recommendations]
-- [Laboratory testing options]
-- [Extension service resources]
-- [Specialized equipment or tools needed]
-
-**Environmental Modifications**:
-- [Microclimate adjustments needed]
-- [Greenhouse or protection requirements]
-- [Air circulation improvements]
-- [Lighting and shading modifications]
-- [Temperature and humidity management]
-
-**Similar Diseases to Rule Out**:
-- [Differential diagnosis considerations]
-- [How to distinguish from look-alike conditions]
-- [Additional tests or observations needed]
-
-**Economic Considerations**:
-- [Cost-benefit analysis of treatments]
-- [Most economical effective treatments]
-- [When treatment isn't economically viable]
-- [Insurance and crop loss considerations]
-
-**Research and Latest Developments**:
-- [Recent scientific findings on this disease]
-- [New treatment methods or products]
-- [Emerging resistant varieties]
-- [Climate change impacts on this disease]
-
-**Regional Considerations**:
-- [Geographic prevalence patterns]
-- [Local regulatory restrictions]
-- [Regional treatment preferences]
-- [Climate-specific recommendations]
-
-**Urgency Classification**: [Critical/High/Medium/Low - with detailed explanation of timeframe and consequences of delay]
-
-Be extremely detailed, scientific, and practical. Provide as much information as possible - there are no limits. Think like you're writing a comprehensive case study that will be used to train future plant pathologists.
-"""
-        
-        logger.info("Sending image to Gemini for analysis...")
+        logger.info(f"Sending image to Gemini for '{profile.name}' analysis...")
         
         # Generate response using Gemini Vision
-        response = gemini_model.generate_content([prompt, image])
+        response = await generate_gemini_content([profile.prompt, image], profile.generation_config)
         
         # Check if response was blocked or empty
         if not response.text:
@@ -401,8 +166,9 @@ Be extremely detailed, scientific, and practical. Provide as much information as
         logger.debug(f"Gemini response: {response.text[:200]}...")
         
         # Process the response
-        structured_response = extract_structured_response(response.text)
+        structured_response = parse_profile_response(response.text, profile)
         structured_response["raw_response"] = response.text
+        structured_response["usage"] = usage_from_response(response)
         
         return structured_response
         
@@ -492,19 +258,148 @@ def determine_confidence_score(analysis: Dict[str, Any]) -> float:
     except Exception:
         return 65.0
 
+def build_prediction_response(analysis: Dict[str, Any], profile: AnalysisProfile) -> Dict[str, Any]:
+    """Shape a Gemini analysis into the /predict response payload"""
+    condition = analysis.get("condition", "Unknown Condition")
+    confidence_score = determine_confidence_score(analysis)
+    advice = format_advice_response(analysis)
+
+    return {
+        "class": condition,
+        "confidence": round(confidence_score, 2),
+        "advice": advice,
+        "model_type": "gemini_vision",
+        "status": "success",
+        "plant_type": analysis.get("plant_type", "Unknown"),
+        "urgency_level": analysis.get("urgency_level", "Monitor"),
+        "analysis_profile": profile.name,
+        "usage": analysis.get("usage", {}),
+        "analysis_details": {
+            "identification_process": analysis.get("identification_process", []),
+            "symptoms": analysis.get("symptoms", []),
+            "causes": analysis.get("causes", []),
+            "why_happens": analysis.get("why_happens", []),
+            "impact_progression": analysis.get("impact_progression", []),
+            "immediate_actions": analysis.get("immediate_actions", []),
+            "precautions": analysis.get("precautions", []),
+            "timeline": analysis.get("timeline", []),
+            "additional_tips": analysis.get("additional_tips", []),
+            "treatments": analysis.get("treatment", {})
+        }
+    }
+
+async def process_image_async(image_bytes: bytes) -> Tuple[Image.Image, Dict[str, float]]:
+    """Decode and resize an upload on the image worker pool, returning per-stage timings"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(image_executor, ingest_image, image_bytes)
+
+def upload_too_large_response(error: UploadTooLargeError) -> JSONResponse:
+    return JSONResponse(content={"error": str(error), "status": "error"}, status_code=413)
+
+def build_local_response(top_predictions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Shape a confident local classifier result into the /predict response payload"""
+    best = top_predictions[0]
+    plant_type, condition = split_class_name(best["class"])
+    healthy = condition == "Healthy Plant"
+    label = condition if healthy else f"{plant_type} {condition}"
+
+    if healthy:
+        advice = f"Your {plant_type} plant appears to be healthy. Continue with regular care and monitoring."
+    else:
+        advice = f"Disease detected: {label}. Please consult with a local agricultural expert for specific treatment recommendations."
+
+    return {
+        "class": label,
+        "confidence": round(best["probability"] * 100, 2),
+        "advice": advice,
+        "model_type": "local_classifier",
+        "status": "success",
+        "plant_type": plant_type,
+        "urgency_level": "Monitor" if healthy else "Medium",
+        "local_predictions": top_predictions,
+        "analysis_details": {}
+    }
+
+async def fast_path_diagnosis(processed_image: Image.Image, profile: AnalysisProfile) -> Tuple[int, Optional[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+    """Try the diagnosis cache and the local classifier before Gemini.
+
+    Returns the image hash, a finished response if one of them answered,
+    and the local top-k predictions (if the classifier ran).
+    """
+    image_hash = perceptual_hash(processed_image)
+    cached_response = diagnosis_cache.get(image_hash, namespace=profile.name)
+    if cached_response is not None:
+        logger.info(f"Diagnosis cache hit for image hash {image_hash:016x}")
+        return image_hash, {**cached_response, "cache_hit": True}, None
+
+    top_predictions = None
+    if local_classifier.available:
+        try:
+            top_predictions = await local_classifier.classify(processed_image)
+        except Exception as e:
+            logger.warning(f"Local classifier failed, escalating to Gemini: {e}")
+
+    if top_predictions and (top_predictions[0]["probability"] >= LOCAL_CONFIDENCE_THRESHOLD or gemini_model is None):
+        response = build_local_response(top_predictions)
+        diagnosis_cache.put(image_hash, response, namespace=profile.name)
+        return image_hash, {**response, "cache_hit": False}, top_predictions
+
+    return image_hash, None, top_predictions
+
+async def run_diagnosis(processed_image: Image.Image, profile: AnalysisProfile) -> Tuple[int, Dict[str, Any]]:
+    """Diagnose a processed image: cache, then local model, then Gemini"""
+    image_hash, response, top_predictions = await fast_path_diagnosis(processed_image, profile)
+    if response is not None:
+        return image_hash, response
+
+    try:
+        analysis = await analyze_plant_with_gemini(processed_image, profile)
+    except Exception as e:
+        # Degrade to the local model's answer rather than failing the request
+        if not top_predictions:
+            raise
+        logger.warning(f"Gemini unavailable, serving local prediction instead: {e}")
+        return image_hash, {**build_local_response(top_predictions), "cache_hit": False, "degraded": True}
+
+    response = build_prediction_response(analysis, profile)
+    if top_predictions:
+        response["local_predictions"] = top_predictions
+
+    diagnosis_cache.put(image_hash, response, namespace=profile.name)
+    return image_hash, {**response, "cache_hit": False}
+
+async def diagnose_image(processed_image: Image.Image, profile: AnalysisProfile) -> Dict[str, Any]:
+    """Diagnose a processed image and append the result to the diagnosis history"""
+    started = time.perf_counter()
+    image_hash, response = await run_diagnosis(processed_image, profile)
+    if history_store:
+        history_store.record(response, image_hash, (time.perf_counter() - started) * 1000, profile.name)
+    return response
+
 @router.post("/predict")
-async def predict(file: UploadFile = File(...)):
+async def predict(
+    file: UploadFile = File(...),
+    profile: Optional[str] = Query(default=None, description="Analysis profile: quick, standard or full")
+):
     """Analyze plant image using Gemini Vision API"""
     
-    if gemini_model is None:
+    if gemini_model is None and not local_classifier.available:
         return JSONResponse(content={
             "error": "Gemini Vision API not available. Please check your API key configuration.",
             "status": "error"
         }, status_code=500)
 
+    try:
+        analysis_profile = get_profile(profile)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e), "status": "error"}, status_code=422)
+
     try:
         # Read and validate the uploaded file
-        contents = await file.read()
+        try:
+            contents = await read_upload_limited(file)
+        except UploadTooLargeError as e:
+            return upload_too_large_response(e)
         if not contents or len(contents) < 10:
             return JSONResponse(content={
                 "error": "Uploaded file is empty or invalid. Please upload a valid image file.",
@@ -515,16 +410,17 @@ async def predict(file: UploadFile = File(...)):
 
         # Process the image
         try:
-            processed_image = process_image_for_gemini(contents)
+            processed_image, ingest_timings = await process_image_async(contents)
         except Exception as e:
             return JSONResponse(content={
                 "error": "Invalid image file. Please upload a clear photo of the plant.",
                 "status": "error"
             }, status_code=422)
 
-        # Analyze with Gemini Vision
+        # Analyze with Gemini Vision (or the diagnosis cache)
         try:
-            analysis = await analyze_plant_with_gemini(processed_image)
+            analysis_started = time.perf_counter()
+            response = await diagnose_image(processed_image, analysis_profile)
         except Exception as e:
             logger.error(f"Gemini analysis failed: {str(e)}")
             return JSONResponse(content={
@@ -532,35 +428,12 @@ async def predict(file: UploadFile = File(...)):
                 "status": "error"
             }, status_code=500)
 
-        # Format the response
-        condition = analysis.get("condition", "Unknown Condition")
-        confidence_score = determine_confidence_score(analysis)
-        advice = format_advice_response(analysis)
-        
-        # Create the comprehensive response
-        response = {
-            "class": condition,
-            "confidence": round(confidence_score, 2),
-            "advice": advice,
-            "model_type": "gemini_vision",
-            "status": "success",
-            "plant_type": analysis.get("plant_type", "Unknown"),
-            "urgency_level": analysis.get("urgency_level", "Monitor"),
-            "analysis_details": {
-                "identification_process": analysis.get("identification_process", []),
-                "symptoms": analysis.get("symptoms", []),
-                "causes": analysis.get("causes", []),
-                "why_happens": analysis.get("why_happens", []),
-                "impact_progression": analysis.get("impact_progression", []),
-                "immediate_actions": analysis.get("immediate_actions", []),
-                "precautions": analysis.get("precautions", []),
-                "timeline": analysis.get("timeline", []),
-                "additional_tips": analysis.get("additional_tips", []),
-                "treatments": analysis.get("treatment", {})
-            }
+        response["timings_ms"] = {
+            **ingest_timings,
+            "analysis": round((time.perf_counter() - analysis_started) * 1000, 2)
         }
 
-        logger.info(f"Analysis completed: {condition} with {confidence_score}% confidence")
+        logger.info(f"Analysis completed: {response['class']} with {response['confidence']}% confidence")
         return response
 
     except Exception as e:
@@ -572,14 +445,278 @@ async def predict(file: UploadFile = File(...)):
             "status": "error"
         }, status_code=500)
 
+# Urgency keywords in descending order of severity, used to rank batch results
+URGENCY_RANKING = ["critical", "high", "medium", "low", "monitor"]
+
+def urgency_rank(urgency_level: str) -> int:
+    """Map a free-text urgency level to an index in URGENCY_RANKING"""
+    text = (urgency_level or "").lower()
+    for rank, keyword in enumerate(URGENCY_RANKING):
+        if keyword in text:
+            return rank
+    return len(URGENCY_RANKING)
+
+def summarize_batch(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build a field-level summary from per-image batch results"""
+    successes = [r for r in results if r.get("status") == "success"]
+    conditions: Dict[str, int] = {}
+    urgency_counts: Dict[str, int] = {}
+    for result in successes:
+        conditions[result["class"]] = conditions.get(result["class"], 0) + 1
+        rank = urgency_rank(result.get("urgency_level", ""))
+        label = URGENCY_RANKING[rank] if rank < len(URGENCY_RANKING) else "unknown"
+        urgency_counts[label] = urgency_counts.get(label, 0) + 1
+
+    most_urgent = min(successes, key=lambda r: urgency_rank(r.get("urgency_level", "")), default=None)
+    return {
+        "total_images": len(results),
+        "analyzed": len(successes),
+        "failed": len(results) - len(successes),
+        "cache_hits": sum(1 for r in successes if r.get("cache_hit")),
+        "conditions": dict(sorted(conditions.items(), key=lambda item: -item[1])),
+        "urgency_counts": urgency_counts,
+        "field_urgency": most_urgent.get("urgency_level") if most_urgent else None,
+        "most_urgent_image": most_urgent.get("filename") if most_urgent else None
+    }
+
+@router.post("/predict-batch")
+async def predict_batch(
+    files: List[UploadFile] = File(...),
+    profile: Optional[str] = Query(default=None, description="Analysis profile: quick, standard or full")
+):
+    """Analyze a field survey of many plant images, streaming results as NDJSON"""
+
+    if gemini_model is None and not local_classifier.available:
+        return JSONResponse(content={
+            "error": "Gemini Vision API not available. Please check your API key configuration.",
+            "status": "error"
+        }, status_code=500)
+
+    try:
+        analysis_profile = get_profile(profile)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e), "status": "error"}, status_code=422)
+
+    if len(files) > MAX_BATCH_FILES:
+        return JSONResponse(content={
+            "error": f"Too many files. A batch may contain at most {MAX_BATCH_FILES} images.",
+            "status": "error"
+        }, status_code=422)
+
+    # Read every upload before streaming starts; the form is closed once the handler returns
+    uploads = []
+    digests = []
+    for index, file in enumerate(files):
+        try:
+            contents = await read_upload_limited(file)
+            digests.append(hashlib.sha256(contents).hexdigest())
+        except UploadTooLargeError as e:
+            contents = e
+            digests.append(f"rejected-{index}")
+        uploads.append((file.filename, contents))
+
+    # Identical files share one decode and one model call
+    unique_indexes: Dict[str, int] = {}
+    for index, digest in enumerate(digests):
+        unique_indexes.setdefault(digest, index)
+
+    async def analyze_unique(digest: str, index: int):
+        contents = uploads[index][1]
+        if isinstance(contents, UploadTooLargeError):
+            return digest, {"status": "error", "error": str(contents)}
+        if not contents or len(contents) < 10:
+            return digest, {"status": "error", "error": "Uploaded file is empty or invalid."}
+        try:
+            processed_image, _ = await process_image_async(contents)
+        except Exception:
+            return digest, {"status": "error", "error": "Invalid image file."}
+        try:
+            return digest, await diagnose_image(processed_image, analysis_profile)
+        except Exception as e:
+            logger.error(f"Batch analysis failed for {uploads[index][0]}: {str(e)}")
+            return digest, {"status": "error", "error": f"Plant analysis failed: {str(e)}"}
+
+    async def stream_results():
+        started = time.perf_counter()
+        results: List[Dict[str, Any]] = []
+        tasks = [asyncio.create_task(analyze_unique(digest, index)) for digest, index in unique_indexes.items()]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                digest, result = await finished
+                first_index = unique_indexes[digest]
+                for index, file_digest in enumerate(digests):
+                    if file_digest != digest:
+                        continue
+                    item = {
+                        **result,
+                        "index": index,
+                        "filename": uploads[index][0],
+                        "duplicate_of": first_index if index != first_index else None
+                    }
+                    results.append(item)
+                    yield json.dumps({"type": "result", **item}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        summary = summarize_batch(results)
+        summary["unique_images"] = len(unique_indexes)
+        summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        yield json.dumps({"type": "summary", **summary}) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/predict-stream")
+async def predict_stream(
+    file: UploadFile = File(...),
+    profile: Optional[str] = Query(default=None, description="Analysis profile: quick, standard or full")
+):
+    """Analyze a plant image, streaming tokens and parsed sections over Server-Sent Events"""
+
+    if gemini_model is None and not local_classifier.available:
+        return JSONResponse(content={
+            "error": "Gemini Vision API not available. Please check your API key configuration.",
+            "status": "error"
+        }, status_code=500)
+
+    try:
+        analysis_profile = get_profile(profile)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e), "status": "error"}, status_code=422)
+
+    try:
+        contents = await read_upload_limited(file)
+    except UploadTooLargeError as e:
+        return upload_too_large_response(e)
+    if not contents or len(contents) < 10:
+        return JSONResponse(content={
+            "error": "Uploaded file is empty or invalid. Please upload a valid image file.",
+            "status": "error"
+        }, status_code=422)
+
+    try:
+        processed_image, _ = await process_image_async(contents)
+    except Exception:
+        return JSONResponse(content={
+            "error": "Invalid image file. Please upload a clear photo of the plant.",
+            "status": "error"
+        }, status_code=422)
+
+    async def event_stream():
+        started = time.perf_counter()
+
+        def record(image_hash: int, response: Dict[str, Any]):
+            if history_store:
+                history_store.record(response, image_hash, (time.perf_counter() - started) * 1000, analysis_profile.name)
+
+        try:
+            image_hash, response, top_predictions = await fast_path_diagnosis(processed_image, analysis_profile)
+            if response is not None:
+                record(image_hash, response)
+                yield sse_event("result", response)
+                yield sse_event("done", {"status": "success"})
+                return
+
+            # Markdown profiles are parsed section by section as tokens arrive;
+            # JSON profiles can only be parsed once the object is complete
+            parser = DiagnosisStreamParser() if analysis_profile.response_format == "markdown" else None
+            chunks: List[str] = []
+            contents = [analysis_profile.prompt, processed_image]
+            try:
+                async for text in stream_gemini_content(contents, analysis_profile.generation_config):
+                    chunks.append(text)
+                    yield sse_event("token", {"text": text})
+                    for section, value in parser.feed(text) if parser else []:
+                        yield sse_event("section", {"section": section, "value": value})
+            except Exception as e:
+                if chunks or not top_predictions:
+                    raise
+                logger.warning(f"Gemini unavailable, streaming local prediction instead: {e}")
+                response = {**build_local_response(top_predictions), "cache_hit": False, "degraded": True}
+                record(image_hash, response)
+                yield sse_event("result", response)
+                yield sse_event("done", {"status": "success"})
+                return
+
+            raw_response = "".join(chunks)
+            if not raw_response:
+                raise ValueError("Empty response from Gemini")
+
+            if parser:
+                for section, value in parser.close():
+                    yield sse_event("section", {"section": section, "value": value})
+                analysis = parser.result
+            else:
+                analysis = parse_profile_response(raw_response, analysis_profile)
+                sections = {**analysis, **(analysis.get("treatment") or {})}
+                sections.pop("treatment", None)
+                for section, value in sections.items():
+                    if value:
+                        yield sse_event("section", {"section": section, "value": value})
+            analysis["raw_response"] = raw_response
+
+            response = build_prediction_response(analysis, analysis_profile)
+            if top_predictions:
+                response["local_predictions"] = top_predictions
+            diagnosis_cache.put(image_hash, response, namespace=analysis_profile.name)
+            response = {**response, "cache_hit": False}
+            record(image_hash, response)
+            yield sse_event("result", response)
+            yield sse_event("done", {"status": "success"})
+
+        except Exception as e:
+            logger.error(f"Streaming analysis failed: {str(e)}")
+            yield sse_event("error", {"error": f"Plant analysis failed: {str(e)}", "status": "error"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/history/stats")
+def get_history_stats(
+    condition: Optional[str] = Query(default=None, description="Condition to count, e.g. 'late blight' (prefix match, with or without the plant name)"),
+    plant: Optional[str] = Query(default=None, description="Plant type, e.g. 'Tomato'"),
+    days: float = Query(default=7, gt=0, description="Look-back window in days"),
+    group_by: Optional[str] = Query(default=None, description="Group counts by condition, plant, urgency or day"),
+    limit: int = Query(default=50, ge=1, le=500, description="Maximum number of groups")
+):
+    """Aggregate stored diagnoses for outbreak dashboards"""
+    if history_store is None or not history_store.available:
+        raise HTTPException(status_code=503, detail="Diagnosis history is not enabled")
+    try:
+        stats = history_store.query(condition=condition, plant=plant, days=days, group_by=group_by, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return {
+        "status": "success",
+        "filters": {"condition": condition, "plant": plant, "days": days, "group_by": group_by},
+        **stats
+    }
+
 @router.get("/health")
 def health_check():
     """Health check endpoint to verify Gemini Vision API status"""
+    try:
+        default_profile = get_profile(None).name
+    except ValueError as e:
+        default_profile = f"invalid: {e}"
     return {
         "status": "healthy",
         "model_type": "gemini_vision",
         "gemini_initialized": gemini_model is not None,
         "api_available": gemini_model is not None,
+        "max_concurrency": GEMINI_MAX_CONCURRENCY,
+        "diagnosis_cache": diagnosis_cache.stats(),
+        "local_classifier": local_classifier.stats(),
+        "upstream": llm_client.stats(),
+        "local_confidence_threshold": LOCAL_CONFIDENCE_THRESHOLD,
+        "default_profile": default_profile,
         "version": "2.0.0"
     }
 
@@ -598,7 +735,11 @@ def get_api_info():
             "Organic and chemical remedies",
             "Prevention advice"
         ],
+        "analysis_profiles": {
+            name: {"description": p.description, "max_output_tokens": p.max_output_tokens}
+            for name, p in PROFILES.items()
+        },
         "supported_formats": ["JPEG", "PNG", "WEBP"],
-        "max_file_size": "10MB",
+        "max_file_size": f"{MAX_UPLOAD_BYTES // (1024 * 1024)}MB",
         "status": "active" if gemini_model else "unavailable"
     }
@@ -0,0 +1,3 @@
+# Shared resilience layer for upstream LLM calls (Gemini via google-generativeai or LangChain)
+
+from .resilience import CircuitOpenError, ResilientLLMClient, get_llm_client, all_client_stats
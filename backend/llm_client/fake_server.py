@@ -0,0 +1,168 @@
+"""Local fake LLM server for exercising ResilientLLMClient without a real API key.
+
+The server answers POST /generate with {"text": ...}. Its latency, error rate
+and error status are configurable, so retries, hedging, deadlines and the
+circuit breaker can be driven deterministically.
+
+Run from backend/:
+    python -m llm_client.fake_server            # scripted scenarios against an in-process server
+    python -m llm_client.fake_server --serve    # just serve on 127.0.0.1:8765
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from llm_client.resilience import ResilientLLMClient, CircuitOpenError
+
+
+class UpstreamHTTPError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+
+
+class FakeLLMServer:
+    """Threaded HTTP server; behaviour can be changed while it runs"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.05,
+                 slow_rate: float = 0.0, slow_latency: float = 2.0,
+                 error_rate: float = 0.0, error_status: int = 503):
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests_served = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                prompt = json.loads(self.rfile.read(length) or b"{}").get("prompt", "")
+                server.requests_served += 1
+                slow = random.random() < server.slow_rate
+                time.sleep(server.slow_latency if slow else server.latency)
+                if random.random() < server.error_rate:
+                    status, body = server.error_status, {"error": "simulated upstream failure"}
+                else:
+                    status, body = 200, {"text": f"Advice for: {prompt[:40]}"}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/generate"
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeLLM:
+    """Minimal async LLM client for the fake server"""
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, prompt: str) -> str:
+        request = urllib.request.Request(
+            self.url, data=json.dumps({"prompt": prompt}).encode(),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())["text"]
+        except urllib.error.HTTPError as e:
+            raise UpstreamHTTPError(e.code, e.reason) from None
+
+    async def generate(self, prompt: str) -> str:
+        return await asyncio.to_thread(self._post, prompt)
+
+
+async def run_calls(client: ResilientLLMClient, llm: FakeLLM, count: int, concurrency: int = 8):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await client.call(lambda: llm.generate(f"prompt {i}"))
+                latencies.append(time.perf_counter() - started)
+            except (CircuitOpenError, UpstreamHTTPError, asyncio.TimeoutError):
+                pass
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] if latencies else 0.0
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    return p50, p99
+
+
+async def scenarios():
+    with FakeLLMServer() as server:
+        llm = FakeLLM(server.url)
+
+        print("== flaky upstream: 30% 503s, retries absorb them ==")
+        server.error_rate = 0.3
+        client = ResilientLLMClient("flaky", deadline=5, max_retries=3, base_delay=0.01)
+        p50, p99 = await run_calls(client, llm, 100)
+        print(f"p50={p50:.3f}s p99={p99:.3f}s {client.stats()}")
+
+        print("== tail latency: 5% of calls take 2s, hedging after 0.2s ==")
+        server.error_rate, server.slow_rate = 0.0, 0.05
+        for hedge_after in (None, 0.2):
+            client = ResilientLLMClient("tail", deadline=5, hedge_after=hedge_after)
+            p50, p99 = await run_calls(client, llm, 100)
+            print(f"hedge_after={hedge_after}: p50={p50:.3f}s p99={p99:.3f}s "
+                  f"hedges={client.counters['hedges_launched']} wins={client.counters['hedge_wins']}")
+
+        print("== outage: every call fails, breaker opens and fails fast ==")
+        server.slow_rate, server.error_rate = 0.0, 1.0
+        client = ResilientLLMClient("outage", deadline=5, max_retries=1, base_delay=0.01,
+                                    failure_threshold=3, reset_timeout=60)
+        served_before = server.requests_served
+        await run_calls(client, llm, 50, concurrency=1)
+        print(f"upstream requests={server.requests_served - served_before} {client.stats()}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--serve", action="store_true")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--latency", type=float, default=0.05)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--error-status", type=int, default=503)
+    args = arg_parser.parse_args()
+
+    if args.serve:
+        server = FakeLLMServer(port=args.port, latency=args.latency,
+                               error_rate=args.error_rate, error_status=args.error_status)
+        print(f"Fake LLM listening on {server.url}")
+        server.httpd.serve_forever()
+    else:
+        asyncio.run(scenarios())
+
+
+if __name__ == "__main__":
+    main()
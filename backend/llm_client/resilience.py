@@ -0,0 +1,225 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Upstream error classes (google.api_core, httpx, ...) worth retrying, matched by name
+# so this module does not need to import every client library
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "GatewayTimeout", "BadGateway", "Aborted",
+    "ConnectError", "ConnectTimeout", "ReadTimeout", "RemoteProtocolError",
+}
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return isinstance(status, int) and status in RETRYABLE_STATUS_CODES
+
+
+class CircuitBreaker:
+    """Opens after N consecutive failures, then allows one trial call after reset_timeout"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        """End a half-open trial without a verdict (cancelled call, client error)"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class ResilientLLMClient:
+    """Deadlines, jittered retries, optional hedging and a circuit breaker around LLM calls.
+
+    Callers pass a zero-argument coroutine factory so each attempt (and each
+    hedge) issues a fresh upstream request:
+
+        response = await client.call(lambda: llm.ainvoke(prompt), deadline=20)
+    """
+
+    def __init__(self, name: str, deadline: float = 30.0, max_retries: int = 2,
+                 base_delay: float = 0.5, max_delay: float = 8.0,
+                 hedge_after: Optional[float] = None, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        self.name = name
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.counters: Dict[str, int] = {
+            "calls": 0, "successes": 0, "failures": 0, "client_errors": 0, "retries": 0, "timeouts": 0,
+            "short_circuited": 0, "hedges_launched": 0, "hedge_wins": 0,
+        }
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many workers instead of synchronising them
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _hedged_attempt(self, factory: Callable[[], Awaitable[T]], hedge_after: float) -> T:
+        primary = asyncio.ensure_future(factory())
+        pending = {primary}
+        error: Optional[BaseException] = None
+        # Everything after creating primary is inside the try, so a cancelled caller (e.g. the
+        # call() deadline) never leaves an attempt running and holding its semaphore
+        try:
+            done, _ = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return primary.result()
+
+            self.counters["hedges_launched"] += 1
+            hedge = asyncio.ensure_future(factory())
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _attempts(self, factory: Callable[[], Awaitable[T]], hedge_after: Optional[float]) -> T:
+        attempt = 0
+        while True:
+            try:
+                if hedge_after:
+                    return await self._hedged_attempt(factory, hedge_after)
+                return await factory()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                self.counters["retries"] += 1
+                logger.warning(f"[{self.name}] retryable error ({type(e).__name__}: {e}); retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def call(self, factory: Callable[[], Awaitable[T]], deadline: Optional[float] = None,
+                   hedge: bool = True) -> T:
+        """Run factory() under the deadline, retry policy, hedging and circuit breaker"""
+        self.counters["calls"] += 1
+        if not self.breaker.allow():
+            self.counters["short_circuited"] += 1
+            raise CircuitOpenError(f"{self.name} circuit is open; failing fast")
+
+        hedge_after = self.hedge_after if hedge else None
+        try:
+            result = await asyncio.wait_for(self._attempts(factory, hedge_after), deadline or self.deadline)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            self.counters["failures"] += 1
+            self.breaker.record_failure()
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        except BaseException:
+            # Caller was cancelled; let a half-open breaker try again later
+            self.breaker.release_trial()
+            raise
+
+        self.counters["successes"] += 1
+        self.breaker.record_success()
+        return result
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        """Count a failure, also one observed after call() returned (e.g. mid-stream).
+
+        Only transient/server errors count toward the shared breaker; a
+        client error such as a rejected prompt says nothing about upstream
+        health, so one bad caller cannot open the circuit for everyone.
+        """
+        if error is not None and not is_retryable(error):
+            self.counters["client_errors"] += 1
+            self.breaker.release_trial()
+            return
+        self.counters["failures"] += 1
+        self.breaker.record_failure()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "deadline_seconds": self.deadline,
+            "max_retries": self.max_retries,
+            "hedge_after_seconds": self.hedge_after,
+            **self.counters,
+        }
+
+
+_clients: Dict[str, ResilientLLMClient] = {}
+
+
+def get_llm_client(name: str = "gemini") -> ResilientLLMClient:
+    """Shared client per upstream, so every caller trips and respects the same breaker"""
+    if name not in _clients:
+        hedge_after = os.getenv("LLM_HEDGE_AFTER_SECONDS")
+        _clients[name] = ResilientLLMClient(
+            name=name,
+            deadline=float(os.getenv("LLM_DEADLINE_SECONDS", "30")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "8")),
+            hedge_after=float(hedge_after) if hedge_after else None,
+            failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+        )
+    return _clients[name]
+
+
+def all_client_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: client.stats() for name, client in _clients.items()}
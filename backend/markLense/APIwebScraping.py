@@ -10,13 +10,21 @@ from selenium.webdriver.support.ui import WebDriverWait
 from datetime import datetime, timedelta
 from selenium.webdriver.support import expected_conditions as EC
 import time
+try:
+    from .selenium_waits import StepTimer, options_loaded, click_and_wait_for_postback, POLL_SECONDS
+except ImportError:
+    from selenium_waits import StepTimer, options_loaded, click_and_wait_for_postback, POLL_SECONDS
+
 
 def script(state, commodity, market):
     # URL of the website with the dropdown fields
     initial_url = "https://agmarknet.gov.in/SearchCmmMkt.aspx"
 
+    timer = StepTimer(f"{commodity}/{state}/{market}")
     driver = webdriver.Chrome()
+    timer.mark("start_browser")
     driver.get(initial_url)
+    timer.mark("load_form")
 
     print("Commodity")
     dropdown = Select(driver.find_element("id", 'ddlCommodity'))
@@ -34,30 +42,28 @@ def script(state, commodity, market):
     date_input.clear()
     date_input.send_keys(desired_date.strftime('%d-%b-%Y'))
 
-    print("Click")
-    button = driver.find_element("id", 'btnGo')
-    button.click()
+    timer.mark("fill_form")
 
-    time.sleep(3)
+    print("Click")
+    click_and_wait_for_postback(driver, 'btnGo', 'ddlMarket')
+    timer.mark("search_postback")
 
     print("Market")
-    dropdown = Select(driver.find_element("id", 'ddlMarket'))
+    dropdown = Select(WebDriverWait(driver, 10, poll_frequency=POLL_SECONDS).until(options_loaded('ddlMarket')))
+    timer.mark("markets_loaded")
     dropdown.select_by_visible_text(market)
 
     print("Click")
-    button = driver.find_element("id", 'btnGo')
-    button.click()
-
-    time.sleep(1)
-
-    driver.implicitly_wait(10)
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
+    # The old grid (or market list) goes stale once the results postback lands
+    watched = 'cphBody_GridPriceData' if driver.find_elements(By.ID, 'cphBody_GridPriceData') else 'ddlMarket'
+    click_and_wait_for_postback(driver, 'btnGo', watched)
+    timer.mark("market_postback")
 
     # Wait for the table to be present
-    table = WebDriverWait(driver, 10).until(
+    table = WebDriverWait(driver, 10, poll_frequency=POLL_SECONDS).until(
         EC.presence_of_element_located((By.ID, 'cphBody_GridPriceData'))
     )
+    timer.mark("grid_ready")
     soup = BeautifulSoup(driver.page_source, 'html.parser')
 
     data_list = []
@@ -76,8 +82,10 @@ def script(state, commodity, market):
         d["Model Prize"] = i[9]
         d["Date"] = i[10]
         jsonList.append(d)
+    timer.mark("parse")
 
     driver.quit()
+    print(f"Step timings (ms): {timer.steps}")
     return jsonList
 
 app = Flask(__name__)
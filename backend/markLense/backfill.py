@@ -0,0 +1,231 @@
+"""Backfill historical Agmarknet prices into the local price warehouse.
+
+Crawls every (state, commodity, market, date) in the requested range with a
+few worker threads and a rate limit shared by every upstream GET and
+postback. Finished tasks are appended to a JSONL checkpoint, so an
+interrupted run picks up where it stopped. For a single market, dates that
+already have rows for it in the warehouse are skipped without a request; a
+state-wide backfill only trusts the checkpoint, since a few stored markets
+say nothing about the rest. It uses the HTTP engine directly, so upstream
+errors are retried and left unchecked rather than recorded as empty days.
+
+Run from backend/:
+    python -m markLense.backfill --states Kerala --commodities Onion Tomato \\
+        --start 2024-01-01 --end 2024-12-31 --workers 2 --rate 0.5
+"""
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Set, Tuple
+
+import requests
+
+from markLense.http_scraper import AgmarknetHttpScraper
+from markLense.price_rows import clean_price_rows
+from markLense.price_warehouse import PriceWarehouse, DEFAULT_DB_PATH, SOURCE_BACKFILL, normalize_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(__file__), "data", "backfill_checkpoint.jsonl")
+
+Task = Tuple[str, str, Optional[str], date]
+
+
+class RateLimiter:
+    """Token bucket shared by all workers: `rate` requests per second, bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedSession(requests.Session):
+    """Session that takes a limiter token before every request, so each postback counts"""
+
+    def __init__(self, limiter: RateLimiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def request(self, *args, **kwargs):
+        self.limiter.acquire()
+        return super().request(*args, **kwargs)
+
+
+class Checkpoint:
+    """Append-only JSONL log of finished tasks; survives crashes mid-run"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line)["task"])
+                    except (ValueError, KeyError):
+                        continue  # torn last line from a crash
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def key(task: Task) -> str:
+        state, commodity, market, day = task
+        return "|".join([normalize_key(state), normalize_key(commodity), normalize_key(market) or "*", day.isoformat()])
+
+    def mark(self, task: Task, rows: int):
+        key = self.key(task)
+        with self._lock:
+            self._file.write(json.dumps({"task": key, "rows": rows, "at": time.time()}) + "\n")
+            self._file.flush()
+            self.done.add(key)
+
+    def close(self):
+        self._file.close()
+
+
+def date_range(start: date, end: date) -> Iterator[date]:
+    day = end
+    while day >= start:  # newest first, so a partial run yields the most useful data
+        yield day
+        day -= timedelta(days=1)
+
+
+class Backfill:
+    def __init__(self, warehouse: PriceWarehouse, checkpoint: Checkpoint, workers: int = 2,
+                 rate: float = 0.5, max_retries: int = 3):
+        self.warehouse = warehouse
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.max_retries = max_retries
+        self._local = threading.local()
+        self.counters = {"planned": 0, "skipped_checkpoint": 0, "skipped_present": 0,
+                         "fetched": 0, "rows": 0, "failed": 0}
+        self._counter_lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._counter_lock:
+            self.counters[name] += amount
+
+    def _scraper(self) -> AgmarknetHttpScraper:
+        # One HTTP session (and so one ASP.NET form state) per worker thread
+        if not hasattr(self._local, "scraper"):
+            self._local.scraper = AgmarknetHttpScraper(session_factory=lambda: RateLimitedSession(self.limiter))
+        return self._local.scraper
+
+    def plan(self, states: List[str], commodities: List[str], markets: List[Optional[str]],
+             start: date, end: date) -> List[Task]:
+        tasks = []
+        for state in states:
+            for commodity in commodities:
+                for market in markets:
+                    # Rows from a live scrape of one market do not mean the state-wide day was fetched
+                    present = self.warehouse.dates_present(commodity, state, market, start, end) if market else set()
+                    for day in date_range(start, end):
+                        task = (state, commodity, market, day)
+                        self.counters["planned"] += 1
+                        if Checkpoint.key(task) in self.checkpoint.done:
+                            self.counters["skipped_checkpoint"] += 1
+                        elif day in present:
+                            self.counters["skipped_present"] += 1
+                        else:
+                            tasks.append(task)
+        return tasks
+
+    def run_task(self, task: Task) -> int:
+        state, commodity, market, day = task
+        scraper = self._scraper()
+        for attempt in range(self.max_retries + 1):
+            try:
+                days_back = (date.today() - day).days
+                raw_rows = scraper.scrape_single_commodity_data(state, commodity, market, days_back)
+                written = self.warehouse.store(clean_price_rows(raw_rows), state, commodity, source=SOURCE_BACKFILL)
+                self.checkpoint.mark(task, written)
+                self._count("fetched")
+                self._count("rows", written)
+                return written
+            except Exception as e:
+                # ValueError means a populated form does not list the commodity/state; retrying will not
+                # help. A maintenance or error page raises FormUnavailableError instead and is retried.
+                if attempt == self.max_retries or isinstance(e, ValueError):
+                    raise
+                delay = random.uniform(0, min(60, 2 ** attempt * 2))
+                logger.warning(f"{task} failed ({e}); retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+        return 0
+
+    def run(self, tasks: List[Task]):
+        total = len(tasks)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as executor:
+            futures = {executor.submit(self.run_task, task): task for task in tasks}
+            for done, future in enumerate(as_completed(futures), start=1):
+                task = futures[future]
+                try:
+                    rows = future.result()
+                    logger.info(f"[{done}/{total}] {task[1]} {task[0]} {task[2] or '*'} {task[3]}: {rows} rows")
+                except Exception as e:
+                    self._count("failed")
+                    logger.error(f"[{done}/{total}] {task} gave up: {e}")
+        self.counters["duration_seconds"] = round(time.perf_counter() - started, 1)
+        return self.counters
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--states", nargs="+", required=True)
+    arg_parser.add_argument("--commodities", nargs="+", required=True)
+    arg_parser.add_argument("--markets", nargs="*", default=None,
+                            help="Specific markets; omit to fetch every market in each state")
+    arg_parser.add_argument("--start", type=date.fromisoformat, required=True, help="YYYY-MM-DD")
+    arg_parser.add_argument("--end", type=date.fromisoformat, default=date.today(), help="YYYY-MM-DD (default today)")
+    arg_parser.add_argument("--workers", type=int, default=2)
+    arg_parser.add_argument("--rate", type=float, default=0.5, help="Upstream HTTP requests (GETs and postbacks) per second across all workers")
+    arg_parser.add_argument("--retries", type=int, default=3)
+    arg_parser.add_argument("--warehouse", default=os.getenv("MANDI_WAREHOUSE_PATH", DEFAULT_DB_PATH))
+    arg_parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    arg_parser.add_argument("--dry-run", action="store_true", help="Only report what would be fetched")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.start > args.end:
+        arg_parser.error("--start must not be after --end")
+
+    warehouse = PriceWarehouse(args.warehouse)
+    checkpoint = Checkpoint(args.checkpoint)
+    backfill = Backfill(warehouse, checkpoint, workers=args.workers, rate=args.rate,
+                        max_retries=args.retries)
+    try:
+        tasks = backfill.plan(args.states, args.commodities, args.markets or [None], args.start, args.end)
+        logger.info(f"{len(tasks)} tasks to fetch; skipped {backfill.counters['skipped_checkpoint']} "
+                    f"checkpointed and {backfill.counters['skipped_present']} already stored")
+        if not args.dry_run:
+            print(json.dumps(backfill.run(tasks), indent=2))
+    finally:
+        checkpoint.close()
+
+
+if __name__ == "__main__":
+    main()
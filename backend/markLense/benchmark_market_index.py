@@ -0,0 +1,118 @@
+"""Benchmark nearest-mandi lookups: per-request linear scan vs the spatial index.
+
+Builds synthetic registries of random markets inside India's bounding box
+(3,000 and 30,000 by default), checks that the index returns the same
+nearest markets as the old loop of calculate_distance + full sort, and
+reports build time and per-query latency for k-nearest and radius queries.
+
+Run from backend/:
+    python -m markLense.benchmark_market_index
+    python -m markLense.benchmark_market_index --sizes 3000 30000 100000 --queries 500
+"""
+import math
+import time
+import random
+import argparse
+import statistics
+from typing import Callable, Dict, List
+
+from markLense import market_registry
+from markLense.market_registry import Market, MarketIndex
+
+INDIA_BOUNDS = {"lat": (8.0, 35.0), "lon": (68.0, 97.0)}
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # Same formula as routes.calculate_distance, which is the baseline being replaced
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def linear_nearest(markets: List[Market], lat: float, lon: float, k: int):
+    scored = [(market, haversine_km(lat, lon, market.lat, market.lon)) for market in markets]
+    scored.sort(key=lambda item: item[1])
+    return scored[:k]
+
+
+def synthetic_markets(count: int, seed: int = 7) -> List[Market]:
+    rng = random.Random(seed)
+    return [
+        Market(f"Market {i}", f"State {i % 36}", rng.uniform(*INDIA_BOUNDS["lat"]), rng.uniform(*INDIA_BOUNDS["lon"]))
+        for i in range(count)
+    ]
+
+
+def synthetic_queries(count: int, seed: int = 11):
+    rng = random.Random(seed)
+    return [(rng.uniform(*INDIA_BOUNDS["lat"]), rng.uniform(*INDIA_BOUNDS["lon"])) for _ in range(count)]
+
+
+def time_queries(fn: Callable, queries) -> Dict[str, float]:
+    durations = []
+    for lat, lon in queries:
+        started = time.perf_counter()
+        fn(lat, lon)
+        durations.append((time.perf_counter() - started) * 1000)
+    durations.sort()
+    return {
+        "mean_ms": round(statistics.mean(durations), 4),
+        "p95_ms": round(durations[int(len(durations) * 0.95) - 1], 4),
+    }
+
+
+def check_agreement(index: MarketIndex, markets: List[Market], queries, k: int):
+    for lat, lon in queries:
+        expected = linear_nearest(markets, lat, lon, k)
+        actual = index.nearest(lat, lon, k)
+        for (want, want_km), (got, got_km) in zip(expected, actual):
+            # Ties may come back in either order; distances must match
+            assert abs(want_km - got_km) < 1e-6, f"{want} {want_km} != {got} {got_km} for ({lat}, {lon})"
+
+
+def benchmark(size: int, query_count: int, k: int, radius_km: float):
+    markets = synthetic_markets(size)
+    queries = synthetic_queries(query_count)
+
+    started = time.perf_counter()
+    index = MarketIndex(markets)
+    build_ms = (time.perf_counter() - started) * 1000
+    check_agreement(index, markets, queries[:50], k)
+
+    results = {
+        "linear_scan": time_queries(lambda lat, lon: linear_nearest(markets, lat, lon, k), queries),
+        f"index_nearest_k{k}": time_queries(lambda lat, lon: index.nearest(lat, lon, k), queries),
+        f"index_within_{radius_km:g}km": time_queries(lambda lat, lon: index.within(lat, lon, radius_km), queries),
+    }
+    print(f"\n{size:,} markets ({index.stats()['backend']}, built in {build_ms:.1f} ms, {query_count} queries)")
+    for name, timing in results.items():
+        print(f"  {name:<22} mean {timing['mean_ms']:>9.4f} ms   p95 {timing['p95_ms']:>9.4f} ms")
+    speedup = results["linear_scan"]["mean_ms"] / results[f"index_nearest_k{k}"]["mean_ms"]
+    print(f"  speedup (k-nearest vs linear scan): {speedup:.1f}x")
+
+    lats, lons = [lat for lat, _ in queries], [lon for _, lon in queries]
+    started = time.perf_counter()
+    index.nearest_many(lats, lons, k)
+    batch_ms = (time.perf_counter() - started) * 1000
+    print(f"  batch nearest_many for all {query_count} queries: {batch_ms:.2f} ms "
+          f"({batch_ms / query_count:.4f} ms/query)")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[3000, 30000])
+    arg_parser.add_argument("--queries", type=int, default=200)
+    arg_parser.add_argument("--k", type=int, default=5)
+    arg_parser.add_argument("--radius-km", type=float, default=50.0)
+    args = arg_parser.parse_args()
+
+    if not market_registry.SKLEARN_AVAILABLE:
+        print("scikit-learn not installed; timing the NumPy brute-force fallback")
+    for size in args.sizes:
+        benchmark(size, args.queries, args.k, args.radius_km)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark the typed price rows against the legacy string dicts they replace.
+
+Builds N synthetic scraped rows (100,000 by default) three ways: the legacy
+{"Min Prize": "2,400", ...} dicts, PriceRow objects, and a NumPy structured
+array as a columnar reference point. Reports retained memory per layout
+(tracemalloc, strings included) and the time to serialize them for the
+cache (compact codec) and for an API response (legacy names, the
+PriceJSONResponse path), plus the cache round trip back to rows. The
+legacy baseline is FastAPI's jsonable_encoder walk, which the price
+endpoints went through before returning PriceJSONResponse.
+
+Run from backend/:
+    python -m markLense.benchmark_price_rows
+    python -m markLense.benchmark_price_rows --rows 500000 --runs 5
+"""
+import gc
+import json
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+from datetime import date, timedelta
+from typing import Callable, Dict, List
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from markLense.price_rows import (
+    PriceRow, cache_default, cache_object_hook, legacy_default, to_epoch_day, LEGACY_DATE_FORMAT
+)
+
+MARKETS = ["Ernakulam", "Kottayam", "Thrissur", "Palakkad", "Kozhikode", "Kannur", "Kollam", "Alappuzha"]
+COMMODITIES = ["Onion", "Potato", "Tomato", "Cabbage", "Carrot", "Beans", "Brinjal", "Ginger"]
+
+
+def synthetic_legacy_rows(count: int, seed: int = 3) -> List[Dict[str, str]]:
+    """Rows as the scrapers used to emit them: every field a freshly parsed string"""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        modal = rng.randrange(800, 9000)
+        market = MARKETS[i % len(MARKETS)]
+        rows.append({
+            "S.No": str(i % 50 + 1),
+            "City": market,
+            "Commodity": COMMODITIES[i % len(COMMODITIES)],
+            "Min Prize": f"{modal - rng.randrange(100, 600):,}",
+            "Max Prize": f"{modal + rng.randrange(100, 600):,}",
+            "Model Prize": f"{modal:,}",
+            "Date": (start + timedelta(days=i % 365)).strftime(LEGACY_DATE_FORMAT),
+            "State": "Kerala",
+            "Market": market,
+        })
+    return rows
+
+
+def as_structured_array(rows: List[PriceRow]) -> np.ndarray:
+    dtype = [("serial", "i4"), ("market", "i4"), ("commodity", "i4"),
+             ("min_price", "f4"), ("max_price", "f4"), ("modal_price", "f4"), ("day", "i4")]
+    markets = {name: i for i, name in enumerate(MARKETS)}
+    commodities = {name: i for i, name in enumerate(COMMODITIES)}
+    return np.array([(r.serial, markets[r.market], commodities[r.commodity],
+                      r.min_price, r.max_price, r.modal_price, r.day) for r in rows], dtype=dtype)
+
+
+def retained_bytes(build: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def time_call(fn: Callable[[], object], runs: int) -> float:
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations)
+
+
+def benchmark(count: int, runs: int):
+    legacy = synthetic_legacy_rows(count)
+    rows = [PriceRow.from_legacy(item) for item in legacy]
+    assert rows[0].to_legacy()["Date"] == legacy[0]["Date"]
+    assert to_epoch_day(rows[0].price_date) == rows[0].day
+
+    memory = {
+        "legacy dicts": retained_bytes(lambda: synthetic_legacy_rows(count)),
+        # Built from already-parsed values so only the rows themselves are counted
+        "PriceRow (__slots__)": retained_bytes(lambda: [PriceRow.from_compact(row.to_compact()) for row in rows]),
+        "NumPy structured": retained_bytes(lambda: as_structured_array(rows)),
+    }
+    baseline = memory["legacy dicts"]
+    print(f"\nMemory for {count:,} rows (tracemalloc, retained)")
+    for name, size in memory.items():
+        print(f"  {name:<22} {size / 2 ** 20:8.1f} MiB  {size / count:7.0f} B/row  {size / baseline:5.2f}x legacy")
+
+    cache_payload = json.dumps(rows, default=cache_default)
+    timings = {
+        # What every price endpoint used to do with the legacy dicts it returned
+        "legacy FastAPI encode": time_call(lambda: json.dumps(jsonable_encoder(legacy)), runs),
+        "legacy json.dumps": time_call(lambda: json.dumps(legacy), runs),
+        "cache codec dumps": time_call(lambda: json.dumps(rows, default=cache_default), runs),
+        "cache codec loads": time_call(lambda: json.loads(cache_payload, object_hook=cache_object_hook), runs),
+        "API render (legacy)": time_call(
+            lambda: json.dumps(rows, ensure_ascii=False, separators=(",", ":"), default=legacy_default), runs),
+    }
+    print(f"Serialization, median of {runs} runs")
+    for name, ms in timings.items():
+        print(f"  {name:<22} {ms:9.1f} ms")
+    print(f"  cache payload {len(cache_payload) / 2 ** 20:.1f} MiB vs legacy "
+          f"{len(json.dumps(legacy)) / 2 ** 20:.1f} MiB")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--rows", type=int, default=100_000)
+    arg_parser.add_argument("--runs", type=int, default=3)
+    args = arg_parser.parse_args()
+    benchmark(args.rows, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Validate the HTTP Agmarknet scraper against saved pages and benchmark it against Selenium.
+
+Offline (default): replays the saved form and result pages in fixtures/
+through AgmarknetHttpScraper, checks the parsed rows and market list, and
+reports per-lookup parse cost.
+
+Live (--live): runs the same lookups against agmarknet.gov.in with both
+engines and prints wall time per lookup and how many rows each returned.
+
+Run from backend/:
+    python -m markLense.benchmark_scraper
+    python -m markLense.benchmark_scraper --live --state Kerala --commodities Onion Tomato
+"""
+import os
+import time
+import argparse
+import statistics
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from markLense.http_scraper import AgmarknetHttpScraper, group_by_market
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+EXPECTED_MARKETS = ["Ernakulam", "Kottayam", "Thrissur", "Palakkayam"]
+EXPECTED_ROWS = 4
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+class FixtureSession:
+    """Stands in for requests.Session: GET returns the form, every POST the result page"""
+
+    def __init__(self):
+        self.form_page = read_fixture("agmarknet_form.html")
+        self.results_page = read_fixture("agmarknet_results.html")
+        self.headers: Dict[str, str] = {}
+        self.posts: List[Dict[str, str]] = []
+
+    def _response(self, text: str):
+        return SimpleNamespace(text=text, raise_for_status=lambda: None)
+
+    def get(self, url, timeout=None):
+        return self._response(self.form_page)
+
+    def post(self, url, data=None, timeout=None):
+        self.posts.append(data)
+        return self._response(self.results_page)
+
+
+def validate_fixtures():
+    session = FixtureSession()
+    scraper = AgmarknetHttpScraper(session_factory=lambda: session)
+
+    rows = scraper.scrape_single_commodity_data("Kerala", "Onion")
+    assert len(rows) == EXPECTED_ROWS, f"expected {EXPECTED_ROWS} rows, got {len(rows)}"
+    first = rows[0]
+    assert (first.city, first.market, first.modal_price) == ("Ernakulam", "Ernakulam", 3600.0), first
+    assert first.to_legacy()["Model Prize"] == "3600" and first.price_date is not None, first
+    assert all(row.state == "Kerala" and row.commodity == "Onion" for row in rows)
+
+    state_post = session.posts[0]
+    assert state_post["__EVENTTARGET"] == "ctl00$ddlState", state_post["__EVENTTARGET"]
+    assert state_post["ctl00$ddlCommodity"] == "23" and state_post["ctl00$ddlState"] == "KL"
+    assert state_post["__VIEWSTATE"], "ViewState was not replayed"
+    assert session.posts[1]["ctl00$btnGo"] == "Go"
+
+    markets = scraper.get_available_markets_for_state("Kerala")
+    assert markets == EXPECTED_MARKETS, markets
+
+    rows = scraper.scrape_single_commodity_data("Kerala", "Onion", market="Kottayam")
+    assert session.posts[-1]["ctl00$ddlMarket"] == "1151"
+    assert all(row.market == "Kottayam" for row in rows)
+
+    # State sweep: one state postback, then one search per commodity, no market selected
+    posts_before = len(session.posts)
+    sweep = scraper.scrape_state_sweep("Kerala", ["Onion", "Tomato", "Saffron"])
+    sweep_posts = session.posts[posts_before:]
+    assert len(sweep_posts) == 3, f"expected 3 POSTs for the sweep, got {len(sweep_posts)}"
+    assert [post["ctl00$ddlCommodity"] for post in sweep_posts[1:]] == ["23", "78"]
+    assert len(sweep["Onion"]) == EXPECTED_ROWS and sweep["Saffron"] == []
+    grouped = group_by_market(sweep)
+    assert sorted(grouped) == sorted(row.market for row in sweep["Onion"]), grouped.keys()
+    assert all(set(by_commodity) == {"Onion", "Tomato"} for by_commodity in grouped.values())
+    print(f"fixtures OK: {EXPECTED_ROWS} rows, {len(markets)} markets, ViewState/postback fields replayed, "
+          f"state sweep split into {len(grouped)} markets")
+    return scraper
+
+
+def time_calls(fn: Callable[[], List], runs: int) -> Dict[str, float]:
+    durations, sizes = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        sizes.append(len(fn() or []))
+        durations.append(time.perf_counter() - started)
+    return {
+        "median_s": statistics.median(durations),
+        "max_s": max(durations),
+        "rows": max(sizes),
+    }
+
+
+def benchmark_offline(runs: int):
+    scraper = AgmarknetHttpScraper(session_factory=FixtureSession)
+    result = time_calls(lambda: scraper.scrape_single_commodity_data("Kerala", "Onion"), runs)
+    _, timings = scraper.fetch_single_commodity("Kerala", "Onion")
+    print(f"offline replay ({runs} runs): median={result['median_s'] * 1000:.2f}ms "
+          f"max={result['max_s'] * 1000:.2f}ms per lookup; step timings {timings}")
+
+
+def benchmark_live(state: str, commodities: List[str], runs: int):
+    from markLense.comprehensive_scraper import AgmarknetScraper, SELENIUM_AVAILABLE
+
+    engines = {"http": AgmarknetScraper(engine="http")}
+    if SELENIUM_AVAILABLE:
+        engines["selenium"] = AgmarknetScraper(engine="selenium")
+    else:
+        print("selenium not installed; benchmarking the HTTP engine only")
+
+    print(f"{'commodity':<14}{'engine':<10}{'median s':>10}{'max s':>10}{'rows':>6}")
+    for commodity in commodities:
+        for name, scraper in engines.items():
+            result = time_calls(lambda: scraper.scrape_single_commodity_data(state, commodity), runs)
+            print(f"{commodity:<14}{name:<10}{result['median_s']:>10.2f}{result['max_s']:>10.2f}{result['rows']:>6}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--live", action="store_true", help="Compare engines against agmarknet.gov.in")
+    arg_parser.add_argument("--state", default="Kerala")
+    arg_parser.add_argument("--commodities", nargs="+", default=["Onion", "Tomato"])
+    arg_parser.add_argument("--runs", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    validate_fixtures()
+    benchmark_offline(max(args.runs, 50))
+    if args.live:
+        benchmark_live(args.state, args.commodities, args.runs)
+
+
+if __name__ == "__main__":
+    main()
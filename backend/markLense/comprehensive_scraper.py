@@ -5,28 +5,67 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from bs4 import BeautifulSoup
 import logging
-import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select, WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+import os
+import threading
 from concurrent.futures import ThreadPoolExecutor
 import requests
 
+try:
+    from .http_scraper import AgmarknetHttpScraper, group_by_market
+    from .driver_pool import create_driver_pool
+    from .price_rows import PriceRow, clean_price_rows, legacy_default
+except ImportError:
+    from http_scraper import AgmarknetHttpScraper, group_by_market
+    from driver_pool import create_driver_pool
+    from price_rows import PriceRow, clean_price_rows, legacy_default
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+try:
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import Select, WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException, NoSuchElementException
+    try:
+        from .selenium_waits import StepTimer, options_loaded, click_and_wait_for_postback, POLL_SECONDS
+    except ImportError:
+        from selenium_waits import StepTimer, options_loaded, click_and_wait_for_postback, POLL_SECONDS
+    SELENIUM_AVAILABLE = True
+except ImportError:
+    SELENIUM_AVAILABLE = False
+
+# "http" replays the form postbacks without a browser, "selenium" drives headless
+# Chrome, "auto" tries HTTP first and falls back to Selenium when it fails
+SCRAPER_ENGINE = os.getenv("SCRAPER_ENGINE", "auto").lower()
+
+# HTTP-engine methods with a variant that also returns per-step timings
+HTTP_TIMED_METHODS = {
+    "scrape_single_commodity_data": "fetch_single_commodity",
+    "scrape_state_sweep": "fetch_state_sweep",
+}
+
 class AgmarknetScraper:
     """Comprehensive Agmarknet scraper that can fetch data from all states and mandis"""
     
-    def __init__(self):
+    def __init__(self, engine: str = SCRAPER_ENGINE):
         self.base_url = "https://agmarknet.gov.in/SearchCmmMkt.aspx"
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        self.engine = engine
+        self.http_scraper = AgmarknetHttpScraper(self.base_url)
+        # Bumped from scraper executor threads, so always through _count
+        self.engine_stats = {"http_success": 0, "http_failure": 0, "selenium_calls": 0}
+        self._stats_lock = threading.Lock()
+        # Warm Chrome instances shared by every Selenium lookup, created on first use
+        self.driver_pool = create_driver_pool(self.setup_selenium_driver)
+        # Per-step milliseconds of the most recent Selenium and HTTP lookups (replaced whole, never mutated)
+        self.last_timings_ms: Dict[str, float] = {}
+        self.last_http_timings_ms: Dict[str, float] = {}
         
         # Comprehensive list of all Indian states and major commodities
         self.states_list = [
@@ -65,8 +104,37 @@ class AgmarknetScraper:
             "Malappuram": {"lat": 11.0688, "lon": 76.0759}
         }
     
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.engine_stats[name] += 1
+
+    def _via_http(self, method: str, *args) -> Optional[List]:
+        """Run an HTTP-engine method; None means fall back to Selenium.
+
+        Only a failed request (including FormUnavailableError) falls back;
+        an empty result is a valid answer, e.g. no arrivals that day.
+        """
+        if self.engine == "selenium":
+            return None
+        try:
+            if method in HTTP_TIMED_METHODS:
+                result, self.last_http_timings_ms = getattr(self.http_scraper, HTTP_TIMED_METHODS[method])(*args)
+            else:
+                result = getattr(self.http_scraper, method)(*args)
+            self._count("http_success")
+            return result
+        except Exception as e:
+            self._count("http_failure")
+            logger.warning(f"HTTP engine failed for {method}{args}: {e}")
+            if self.engine == "http" or not SELENIUM_AVAILABLE:
+                return []
+        return None
+
     def setup_selenium_driver(self, headless=True):
         """Setup Selenium WebDriver with Chrome options"""
+        if not SELENIUM_AVAILABLE:
+            logger.error("selenium is not installed; use SCRAPER_ENGINE=http")
+            return None
         chrome_options = Options()
         if headless:
             chrome_options.add_argument('--headless')
@@ -83,18 +151,30 @@ class AgmarknetScraper:
             logger.error(f"Failed to setup Chrome driver: {e}")
             return None
     
-    def scrape_single_commodity_data(self, state: str, commodity: str, market: str = None, days_back: int = 0) -> List[Dict]:
+    def scrape_single_commodity_data(self, state: str, commodity: str, market: str = None, days_back: int = 0) -> List[PriceRow]:
         """Scrape data for a single commodity from specific state and market"""
-        driver = self.setup_selenium_driver()
-        if not driver:
+        result = self._via_http("scrape_single_commodity_data", state, commodity, market, days_back)
+        if result is not None:
+            return result
+        return self._selenium_scrape_single_commodity_data(state, commodity, market, days_back)
+
+    def _selenium_scrape_single_commodity_data(self, state: str, commodity: str, market: str = None, days_back: int = 0) -> List[PriceRow]:
+        self._count("selenium_calls")
+        try:
+            driver = self.driver_pool.acquire()
+        except Exception as e:
+            logger.error(f"No WebDriver available: {e}")
             return []
         
+        failed = False
+        timer = StepTimer(f"selenium {commodity}/{state}/{market or '*'}")
         try:
             driver.get(self.base_url)
-            wait = WebDriverWait(driver, 10)
+            wait = WebDriverWait(driver, 10, poll_frequency=POLL_SECONDS)
             
             # Select commodity
             commodity_dropdown = wait.until(EC.presence_of_element_located((By.ID, 'ddlCommodity')))
+            timer.mark("load_form")
             commodity_select = Select(commodity_dropdown)
             
             try:
@@ -125,18 +205,17 @@ class AgmarknetScraper:
             date_input = driver.find_element(By.ID, "txtDate")
             date_input.clear()
             date_input.send_keys(target_date.strftime('%d-%b-%Y'))
+            timer.mark("fill_form")
             
-            # Click first Go button to load markets
-            go_button = driver.find_element(By.ID, 'btnGo')
-            go_button.click()
-            
-            # Wait for markets to load
-            time.sleep(3)
+            # Click first Go button and wait for the postback to re-render the market list
+            click_and_wait_for_postback(driver, 'btnGo', 'ddlMarket')
+            timer.mark("search_postback")
             
             # Select market if specified
             if market:
                 try:
-                    market_dropdown = wait.until(EC.presence_of_element_located((By.ID, 'ddlMarket')))
+                    market_dropdown = wait.until(options_loaded('ddlMarket'))
+                    timer.mark("markets_loaded")
                     market_select = Select(market_dropdown)
                     
                     # Try exact match first, then partial match
@@ -152,19 +231,18 @@ class AgmarknetScraper:
                             if len(market_select.options) > 1:
                                 market_select.select_by_index(1)  # Skip "--Select--" option
                     
-                    # Click second Go button to get data
-                    go_button = driver.find_element(By.ID, 'btnGo')
-                    go_button.click()
+                    # Click second Go button; the old grid (or market list) goes stale once results arrive
+                    watched = 'cphBody_GridPriceData' if driver.find_elements(By.ID, 'cphBody_GridPriceData') else 'ddlMarket'
+                    click_and_wait_for_postback(driver, 'btnGo', watched)
+                    timer.mark("market_postback")
                     
                 except Exception as e:
                     logger.warning(f"Market selection failed: {e}")
             
-            # Wait for results table
-            time.sleep(2)
-            
             # Try to find the data table
             try:
                 table = wait.until(EC.presence_of_element_located((By.ID, 'cphBody_GridPriceData')))
+                timer.mark("grid_ready")
                 soup = BeautifulSoup(driver.page_source, 'html.parser')
                 
                 # Parse the table data
@@ -193,36 +271,53 @@ class AgmarknetScraper:
                                 "State": state,
                                 "Market": market or row_data[2] if len(row_data) > 2 else "Unknown"
                             }
-                            json_list.append(price_data)
+                            json_list.append(PriceRow.from_legacy(price_data))
                         except Exception as e:
                             logger.warning(f"Error parsing row data: {e}")
                             continue
                 
+                timer.mark("parse")
                 return json_list
                 
             except TimeoutException:
+                timer.mark("grid_timeout")
                 logger.warning(f"No data table found for {commodity} in {state}")
                 return []
                 
         except Exception as e:
+            failed = True
             logger.error(f"Error scraping data for {commodity} in {state}: {e}")
             return []
         
         finally:
-            driver.quit()
+            self.driver_pool.release(driver, failed=failed)
+            self.last_timings_ms = timer.steps
+            timer.log()
     
     def get_available_markets_for_state(self, state: str, commodity: str = "Onion") -> List[str]:
         """Get list of available markets for a given state"""
-        driver = self.setup_selenium_driver()
-        if not driver:
+        result = self._via_http("get_available_markets_for_state", state, commodity)
+        if result is not None:
+            return result
+        return self._selenium_get_available_markets_for_state(state, commodity)
+
+    def _selenium_get_available_markets_for_state(self, state: str, commodity: str = "Onion") -> List[str]:
+        self._count("selenium_calls")
+        try:
+            driver = self.driver_pool.acquire()
+        except Exception as e:
+            logger.error(f"No WebDriver available: {e}")
             return []
         
+        failed = False
+        timer = StepTimer(f"selenium markets {state}")
         try:
             driver.get(self.base_url)
-            wait = WebDriverWait(driver, 10)
+            wait = WebDriverWait(driver, 10, poll_frequency=POLL_SECONDS)
             
             # Select commodity
             commodity_dropdown = wait.until(EC.presence_of_element_located((By.ID, 'ddlCommodity')))
+            timer.mark("load_form")
             commodity_select = Select(commodity_dropdown)
             commodity_select.select_by_visible_text(commodity)
             
@@ -235,17 +330,16 @@ class AgmarknetScraper:
             date_input = driver.find_element(By.ID, "txtDate")
             date_input.clear()
             date_input.send_keys(datetime.now().strftime('%d-%b-%Y'))
+            timer.mark("fill_form")
             
-            # Click Go button to load markets
-            go_button = driver.find_element(By.ID, 'btnGo')
-            go_button.click()
-            
-            # Wait for markets to load
-            time.sleep(3)
+            # Click Go button and wait for the postback to re-render the market list
+            click_and_wait_for_postback(driver, 'btnGo', 'ddlMarket')
+            timer.mark("search_postback")
             
             # Get market options
             try:
-                market_dropdown = wait.until(EC.presence_of_element_located((By.ID, 'ddlMarket')))
+                market_dropdown = wait.until(options_loaded('ddlMarket'))
+                timer.mark("markets_loaded")
                 market_select = Select(market_dropdown)
                 
                 markets = []
@@ -259,13 +353,16 @@ class AgmarknetScraper:
                 return []
                 
         except Exception as e:
+            failed = True
             logger.error(f"Error getting markets for {state}: {e}")
             return []
         
         finally:
-            driver.quit()
+            self.driver_pool.release(driver, failed=failed)
+            self.last_timings_ms = timer.steps
+            timer.log()
     
-    def scrape_multiple_commodities_parallel(self, state: str, commodities: List[str], market: str = None, max_workers: int = 3) -> Dict[str, List[Dict]]:
+    def scrape_multiple_commodities_parallel(self, state: str, commodities: List[str], market: str = None, max_workers: int = 3) -> Dict[str, List[PriceRow]]:
         """Scrape multiple commodities in parallel for better performance"""
         results = {}
         
@@ -288,15 +385,24 @@ class AgmarknetScraper:
         
         return results
     
-    def get_comprehensive_kerala_data(self, commodities: List[str] = None) -> Dict[str, Dict[str, List[Dict]]]:
-        """Get comprehensive data for all Kerala mandis and specified commodities"""
+    def scrape_state_sweep(self, state: str, commodities: List[str], days_back: int = 0) -> Dict[str, List[PriceRow]]:
+        """All markets' rows per commodity for a state, in as few upstream requests as the engine allows"""
+        result = self._via_http("scrape_state_sweep", state, commodities, days_back)
+        if result is not None:
+            return result or {commodity: [] for commodity in commodities}
+        # Selenium still needs one browser session per commodity, but searches the whole state at once
+        return self.scrape_multiple_commodities_parallel(state, commodities, market=None, max_workers=2)
+    
+    def fetch_comprehensive_kerala_data(self, commodities: List[str] = None
+                                        ) -> Tuple[Dict[str, List[PriceRow]], Dict[str, Dict[str, List[PriceRow]]]]:
+        """Kerala sweep as (every market's rows per commodity, rows of the known Kerala mandis by market)"""
         if not commodities:
             commodities = ["Onion", "Potato", "Tomato", "Rice", "Coconut", "Rubber", "Pepper", "Cardamom"]
         
-        kerala_data = {}
-        
-        # Get available markets for Kerala
-        available_markets = self.get_available_markets_for_state("Kerala")
+        # One state-wide sweep, then split the rows by market in memory
+        sweep = self.scrape_state_sweep("Kerala", commodities)
+        by_market = group_by_market(sweep)
+        available_markets = sorted(by_market)
         
         # Filter markets that match our known Kerala mandis
         kerala_markets = []
@@ -310,70 +416,33 @@ class AgmarknetScraper:
         if not kerala_markets:
             kerala_markets = available_markets[:5] if len(available_markets) > 5 else available_markets
         
-        logger.info(f"Scraping data for Kerala markets: {kerala_markets}")
-        
-        for market in kerala_markets:
-            logger.info(f"Scraping data for market: {market}")
-            market_data = self.scrape_multiple_commodities_parallel(
-                state="Kerala",
-                commodities=commodities,
-                market=market,
-                max_workers=2
-            )
-            kerala_data[market] = market_data
+        logger.info(f"Kerala sweep covered {len(available_markets)} markets; returning {kerala_markets}")
         
-        return kerala_data
+        return sweep, {
+            market: {commodity: by_market[market].get(commodity, []) for commodity in commodities}
+            for market in kerala_markets
+        }
     
-    def scrape_state_summary(self, state: str, top_commodities: List[str] = None) -> Dict[str, List[Dict]]:
+    def get_comprehensive_kerala_data(self, commodities: List[str] = None) -> Dict[str, Dict[str, List[PriceRow]]]:
+        """Get comprehensive data for all Kerala mandis and specified commodities"""
+        return self.fetch_comprehensive_kerala_data(commodities)[1]
+    
+    def scrape_state_summary(self, state: str, top_commodities: List[str] = None) -> Dict[str, List[PriceRow]]:
         """Get summary data for a state with top commodities"""
         if not top_commodities:
             top_commodities = ["Onion", "Potato", "Tomato", "Rice", "Wheat"]
         
         logger.info(f"Scraping summary data for {state}")
-        return self.scrape_multiple_commodities_parallel(
-            state=state,
-            commodities=top_commodities,
-            market=None,  # Get data from all available markets
-            max_workers=3
-        )
+        return self.scrape_state_sweep(state, top_commodities)
     
-    def get_realtime_price_data(self, state: str, commodity: str, market: str = None) -> List[Dict]:
+    def get_realtime_price_data(self, state: str, commodity: str, market: str = None) -> List[PriceRow]:
         """Get real-time price data for immediate API response"""
         logger.info(f"Getting real-time data: {commodity} in {state} - {market}")
         return self.scrape_single_commodity_data(state, commodity, market, days_back=0)
     
-    def cleanup_price_data(self, data: List[Dict]) -> List[Dict]:
+    def cleanup_price_data(self, data: List[PriceRow]) -> List[PriceRow]:
         """Clean and validate price data"""
-        cleaned_data = []
-        
-        for item in data:
-            try:
-                # Clean price values
-                for price_field in ['Min Prize', 'Max Prize', 'Model Prize']:
-                    if price_field in item:
-                        price_value = item[price_field]
-                        if price_value and price_value != 'NR':
-                            # Remove currency symbols and extra spaces
-                            cleaned_price = price_value.replace('₹', '').replace(',', '').strip()
-                            try:
-                                # Validate it's a number
-                                float(cleaned_price)
-                                item[price_field] = cleaned_price
-                            except ValueError:
-                                item[price_field] = 'NR'
-                        else:
-                            item[price_field] = 'NR'
-                
-                # Ensure required fields exist
-                required_fields = ['S.No', 'City', 'Commodity', 'Date']
-                if all(field in item for field in required_fields):
-                    cleaned_data.append(item)
-                
-            except Exception as e:
-                logger.warning(f"Error cleaning price data: {e}")
-                continue
-        
-        return cleaned_data
+        return clean_price_rows(data)
 
 # Factory function to create scraper instance
 def create_scraper():
@@ -386,7 +455,7 @@ if __name__ == "__main__":
     
     # Test Kerala data scraping
     kerala_data = scraper.get_comprehensive_kerala_data(["Onion", "Tomato", "Rice"])
-    print(json.dumps(kerala_data, indent=2))
+    print(json.dumps(kerala_data, indent=2, default=legacy_default))
     
     # Test single commodity
     onion_data = scraper.get_realtime_price_data("Kerala", "Onion", "Kottayam")
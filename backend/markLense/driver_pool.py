@@ -0,0 +1,200 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class DriverPoolTimeout(TimeoutError):
+    """Raised when no driver becomes free within the lease timeout"""
+
+
+class PooledDriver:
+    def __init__(self, driver: Any):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+
+class DriverPool:
+    """Bounded pool of warm WebDrivers with lease/return semantics.
+
+    Drivers are created lazily up to max_size, health-checked before each
+    lease, reset (cookies, storage, blank page) on return, and recycled
+    after max_uses leases or whenever a lease ends in an error.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_size: int = 3, max_uses: int = 20,
+                 lease_timeout: float = 60.0):
+        self.factory = factory
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+        self._idle: List[PooledDriver] = []
+        self._in_use: Dict[int, PooledDriver] = {}
+        self._size = 0  # idle + in use + being created
+        self._cond = threading.Condition()
+        self._closed = False
+        self._started = time.monotonic()
+        self._busy_seconds = 0.0
+        self._lease_started: Dict[int, float] = {}
+        self.counters: Dict[str, Any] = {
+            "leases": 0, "created": 0, "recycled": 0, "health_check_failures": 0,
+            "create_failures": 0, "lease_timeouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+        }
+
+    def _is_healthy(self, pooled: PooledDriver) -> bool:
+        try:
+            pooled.driver.current_url  # round-trips to chromedriver
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, pooled: PooledDriver):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting driver: {e}")
+
+    def _reset(self, pooled: PooledDriver) -> bool:
+        """Clear session state so the next lease starts from a clean page"""
+        try:
+            driver = pooled.driver
+            driver.delete_all_cookies()
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            logger.warning(f"Driver reset failed, recycling: {e}")
+            return False
+
+    def acquire(self) -> Any:
+        """Lease a driver, waiting up to lease_timeout for one to become free"""
+        wait_started = time.monotonic()
+        deadline = wait_started + self.lease_timeout
+        while True:
+            pooled = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Driver pool is closed")
+                    if self._idle:
+                        pooled = self._idle.pop()  # LIFO keeps the warmest driver busy
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters["lease_timeouts"] += 1
+                        raise DriverPoolTimeout(f"No WebDriver free after {self.lease_timeout:.0f}s")
+                    self._cond.wait(remaining)
+
+            if pooled is None:
+                driver = None
+                try:
+                    driver = self.factory()
+                except Exception as e:
+                    logger.error(f"Failed to create WebDriver: {e}")
+                if driver is None:
+                    with self._cond:
+                        self._size -= 1
+                        self.counters["create_failures"] += 1
+                        self._cond.notify()
+                    raise RuntimeError("Could not start a WebDriver")
+                pooled = PooledDriver(driver)
+                with self._cond:
+                    self.counters["created"] += 1
+            elif not self._is_healthy(pooled):
+                self._quit(pooled)
+                with self._cond:
+                    self._size -= 1
+                    self.counters["health_check_failures"] += 1
+                    self.counters["recycled"] += 1
+                    self._cond.notify()
+                continue
+
+            waited = time.monotonic() - wait_started
+            with self._cond:
+                pooled.uses += 1
+                self._in_use[id(pooled.driver)] = pooled
+                self._lease_started[id(pooled.driver)] = time.monotonic()
+                self.counters["leases"] += 1
+                self.counters["wait_seconds_total"] += waited
+                self.counters["wait_seconds_max"] = max(self.counters["wait_seconds_max"], waited)
+            return pooled.driver
+
+    def release(self, driver: Any, failed: bool = False):
+        """Return a leased driver; it is recycled if the lease failed or it is worn out"""
+        with self._cond:
+            pooled = self._in_use.pop(id(driver), None)
+            leased_at = self._lease_started.pop(id(driver), None)
+            if leased_at is not None:
+                self._busy_seconds += time.monotonic() - leased_at
+        if pooled is None:
+            return
+
+        keep = not failed and not self._closed and pooled.uses < self.max_uses and self._reset(pooled)
+        if keep:
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+            return
+
+        self._quit(pooled)
+        with self._cond:
+            self._size -= 1
+            self.counters["recycled"] += 1
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self):
+        driver = self.acquire()
+        failed = False
+        try:
+            yield driver
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(driver, failed=failed)
+
+    def close(self):
+        """Quit idle drivers; leased ones are quit when they are returned"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            busy = self._busy_seconds + sum(now - started for started in self._lease_started.values())
+            elapsed = max(now - self._started, 1e-9)
+            leases = self.counters["leases"]
+            return {
+                "max_size": self.max_size,
+                "max_uses": self.max_uses,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "utilization": round(busy / (elapsed * self.max_size), 4),
+                "avg_wait_ms": round(self.counters["wait_seconds_total"] / leases * 1000, 2) if leases else 0.0,
+                "max_wait_ms": round(self.counters["wait_seconds_max"] * 1000, 2),
+                **{k: v for k, v in self.counters.items() if not k.startswith("wait_seconds")},
+            }
+
+
+def create_driver_pool(factory: Callable[[], Any]) -> DriverPool:
+    return DriverPool(
+        factory,
+        max_size=int(os.getenv("SELENIUM_POOL_SIZE", "3")),
+        max_uses=int(os.getenv("SELENIUM_DRIVER_MAX_USES", "20")),
+        lease_timeout=float(os.getenv("SELENIUM_LEASE_TIMEOUT_SECONDS", "60")),
+    )
@@ -0,0 +1,144 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FanoutJob:
+    key: str
+    run: Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class FanoutResult:
+    key: str
+    status: str  # "ok", "error" or "timeout"
+    value: Any = None
+    error: Optional[str] = None
+    elapsed_ms: Optional[float] = None
+
+
+def parse_host_limits(spec: Optional[str]) -> Dict[str, int]:
+    """"host=n,host=n" -> {"host": n}"""
+    limits = {}
+    for item in (spec or "").split(","):
+        host, _, limit = item.partition("=")
+        if host.strip() and limit.strip().isdigit():
+            limits[host.strip()] = int(limit)
+    return limits
+
+
+class FanoutEngine:
+    """Runs many independent lookups concurrently and returns whatever finished by a deadline.
+
+    Jobs take a per-host slot (host_slot) only around their upstream call,
+    so cache and warehouse hits never wait behind live fetches. Jobs still
+    running at the deadline are cancelled and reported as "timeout"; work
+    that is shielded inside them (e.g. single-flight scrapes) carries on
+    and lands in the cache for the next request.
+    """
+
+    def __init__(self, default_host_limit: int = 2, host_limits: Optional[Dict[str, int]] = None,
+                 deadline_seconds: float = 8.0):
+        self.default_host_limit = default_host_limit
+        self.host_limits = host_limits or {}
+        self.deadline_seconds = deadline_seconds
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._waiting: Dict[str, int] = {}
+        self._in_use: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {"runs": 0, "jobs": 0, "ok": 0, "error": 0, "timeout": 0, "partial_runs": 0}
+
+    def limit_for(self, host: str) -> int:
+        return self.host_limits.get(host, self.default_host_limit)
+
+    @asynccontextmanager
+    async def host_slot(self, host: str):
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.limit_for(host))
+        self._waiting[host] = self._waiting.get(host, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting[host] -= 1
+        self._in_use[host] = self._in_use.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            self._in_use[host] -= 1
+            semaphore.release()
+
+    async def _timed(self, job: FanoutJob) -> FanoutResult:
+        started = time.perf_counter()
+        try:
+            value = await job.run()
+            return FanoutResult(job.key, "ok", value=value, elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+        except Exception as e:
+            return FanoutResult(job.key, "error", error=str(e) or type(e).__name__,
+                                elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+
+    async def run(self, jobs: List[FanoutJob], deadline_seconds: Optional[float] = None) -> List[FanoutResult]:
+        """Results in job order; never raises for individual job failures"""
+        deadline = self.deadline_seconds if deadline_seconds is None else deadline_seconds
+        self.counters["runs"] += 1
+        self.counters["jobs"] += len(jobs)
+        if not jobs:
+            return []
+
+        tasks = [asyncio.ensure_future(self._timed(job)) for job in jobs]
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+
+        results = []
+        for job, task in zip(jobs, tasks):
+            if task in done:
+                results.append(task.result())
+            else:
+                results.append(FanoutResult(job.key, "timeout", error=f"No result within {deadline:g}s"))
+        for result in results:
+            self.counters[result.status] += 1
+        if pending:
+            self.counters["partial_runs"] += 1
+            logger.info(f"Fan-out returned {len(done)}/{len(jobs)} results at the {deadline:g}s deadline")
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "deadline_seconds": self.deadline_seconds,
+            "hosts": {
+                host: {
+                    "limit": self.limit_for(host),
+                    "in_use": self._in_use.get(host, 0),
+                    "waiting": self._waiting.get(host, 0),
+                }
+                for host in self._semaphores
+            },
+            **self.counters,
+        }
+
+
+def summarize(results: List[FanoutResult], deadline_seconds: float, started: float) -> Dict[str, Any]:
+    """Per-run summary for API responses"""
+    counts = {status: sum(1 for r in results if r.status == status) for status in ("ok", "error", "timeout")}
+    return {
+        "items": len(results),
+        **counts,
+        "partial": counts["timeout"] > 0,
+        "deadline_seconds": deadline_seconds,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def create_fanout_engine() -> FanoutEngine:
+    return FanoutEngine(
+        default_host_limit=int(os.getenv("MANDI_FANOUT_HOST_LIMIT", "2")),
+        host_limits=parse_host_limits(os.getenv("MANDI_FANOUT_HOST_LIMITS")),
+        deadline_seconds=float(os.getenv("MANDI_FANOUT_DEADLINE_SECONDS", "8")),
+    )
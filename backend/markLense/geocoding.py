@@ -0,0 +1,211 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from .price_cache import PriceCache, MemoryBackend, SQLiteBackend
+from .single_flight import SingleFlight
+from .offline_geocoder import OfflineGeocoder, create_offline_geocoder
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
+USER_AGENT = "LeafLense-MandiPrices/1.0"
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "data", "geocode_cache.db")
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600  # place names barely change; a month keeps the cache warm
+
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """App-wide pooled AsyncClient, so keep-alive connections and TLS sessions are reused across requests"""
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+        )
+    return _shared_client
+
+
+async def close_shared_client():
+    global _shared_client
+    if _shared_client is not None and not _shared_client.is_closed:
+        await _shared_client.aclose()
+    _shared_client = None
+
+
+def quantize(lat: float, lon: float, precision: int = 2) -> Tuple[float, float]:
+    """Snap to a grid of 10**-precision degrees; precision 2 is ~1.1 km, so a farm's visits share a cell"""
+    return round(lat, precision), round(lon, precision)
+
+
+def parse_nominatim(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Nominatim reverse response -> the place fields the API returns"""
+    address = data.get("address", {})
+    details = {
+        "display_name": data.get("display_name", "Unknown Location"),
+        "city": address.get("city") or address.get("town") or address.get("village"),
+        "district": address.get("state_district") or address.get("county"),
+        "state": address.get("state"),
+        "country": address.get("country"),
+        "postcode": address.get("postcode")
+    }
+
+    # Short, readable location string
+    parts = []
+    if details["city"]:
+        parts.append(details["city"])
+    if details["district"] and details["district"] != details["city"]:
+        parts.append(details["district"])
+    if details["state"]:
+        parts.append(details["state"])
+
+    return {
+        "short_name": ", ".join(parts) if parts else "Unknown Location",
+        "full_address": details["display_name"],
+        "details": details,
+    }
+
+
+class AsyncRateLimiter:
+    """Spaces calls at least min_interval seconds apart across all coroutines"""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self._last = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            delay = self._last + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last = time.monotonic()
+
+
+class ReverseGeocoder:
+    """Offline district lookup first, then Nominatim behind a quantized-coordinate cache.
+
+    Points the offline geocoder resolves confidently never leave the
+    process. The rest are keyed on coordinates snapped to ~1 km cells and
+    cached with a long TTL; concurrent misses for the same cell share one
+    request, and remote calls are spaced min_interval apart to stay inside
+    Nominatim's usage policy of at most one request per second.
+    """
+
+    def __init__(self, cache: PriceCache, precision: int = 2, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 min_interval: float = 1.0, url: str = NOMINATIM_REVERSE_URL,
+                 client_factory: Callable[[], httpx.AsyncClient] = get_shared_client,
+                 offline: Optional[OfflineGeocoder] = None):
+        self.cache = cache
+        self.offline = offline
+        self.precision = precision
+        self.ttl_seconds = ttl_seconds
+        self.url = url
+        self.client_factory = client_factory
+        self.limiter = AsyncRateLimiter(min_interval)
+        self.flights = SingleFlight("reverse-geocode")
+        self.counters = {"offline_hits": 0, "remote_lookups": 0, "remote_failures": 0}
+
+    def cache_key(self, lat: float, lon: float) -> str:
+        qlat, qlon = quantize(lat, lon, self.precision)
+        return f"geocode_{qlat:.{self.precision}f}_{qlon:.{self.precision}f}"
+
+    async def _fetch(self, key: str, lat: float, lon: float) -> Dict[str, Any]:
+        await self.limiter.wait()
+        self.counters["remote_lookups"] += 1
+        try:
+            response = await self.client_factory().get(self.url, params={
+                "format": "json",
+                "lat": lat,
+                "lon": lon,
+                "zoom": 10,
+                "addressdetails": 1
+            })
+            response.raise_for_status()
+            place = parse_nominatim(response.json())
+        except Exception:
+            self.counters["remote_failures"] += 1
+            raise
+        await self.cache.set_async(key, place, ttl_seconds=self.ttl_seconds)
+        return place
+
+    def resolve_offline(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        place = self.offline.resolve(lat, lon) if self.offline else None
+        if place is not None:
+            self.counters["offline_hits"] += 1
+        return place
+
+    async def reverse(self, lat: float, lon: float) -> Tuple[Dict[str, Any], str]:
+        """(place, source) with source "offline", "cache" or "nominatim"; raises if the remote lookup fails"""
+        place = self.resolve_offline(lat, lon)
+        if place is not None:
+            return place, "offline"
+        return await self._reverse_cached(lat, lon)
+
+    async def _reverse_cached(self, lat: float, lon: float) -> Tuple[Dict[str, Any], str]:
+        key = self.cache_key(lat, lon)
+        cached = await self.cache.get_async(key)
+        if cached is not None:
+            return cached, "cache"
+        # Query the cell centre so every point in the cell caches the same answer
+        qlat, qlon = quantize(lat, lon, self.precision)
+        place = await self.flights.do(key, lambda: self._fetch(key, qlat, qlon))
+        return place, "nominatim"
+
+    async def reverse_many(self, points: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+        """Resolve many points: offline where possible, else one lookup per distinct cell, paced remotely"""
+        offline = [self.resolve_offline(lat, lon) for lat, lon in points]
+        cells: Dict[str, Tuple[float, float]] = {}
+        for (lat, lon), place in zip(points, offline):
+            if place is None:
+                cells.setdefault(self.cache_key(lat, lon), (lat, lon))
+        outcomes = await asyncio.gather(*(self._reverse_cached(lat, lon) for lat, lon in cells.values()),
+                                        return_exceptions=True)
+        by_key = dict(zip(cells, outcomes))
+
+        results = []
+        for (lat, lon), place in zip(points, offline):
+            if place is not None:
+                results.append({"status": "success", "place": place, "source": "offline"})
+                continue
+            outcome = by_key[self.cache_key(lat, lon)]
+            if isinstance(outcome, Exception):
+                results.append({"status": "error", "error": str(outcome) or type(outcome).__name__})
+            else:
+                place, source = outcome
+                results.append({"status": "success", "place": place, "source": source})
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "precision": self.precision,
+            "min_interval_seconds": self.limiter.min_interval,
+            **self.counters,
+            "offline": self.offline.stats() if self.offline else None,
+            "single_flight": self.flights.stats(),
+            "cache": self.cache.stats(),
+        }
+
+
+def create_reverse_geocoder() -> ReverseGeocoder:
+    """Geocoder with a persistent SQLite cache (MANDI_GEOCODE_CACHE_PATH), falling back to memory"""
+    max_entries = int(os.getenv("MANDI_GEOCODE_CACHE_MAX_ENTRIES", "50000"))
+    ttl_seconds = float(os.getenv("MANDI_GEOCODE_TTL_SECONDS", str(DEFAULT_TTL_SECONDS)))
+    try:
+        backend = SQLiteBackend(max_entries, os.getenv("MANDI_GEOCODE_CACHE_PATH", DEFAULT_DB_PATH))
+    except Exception as e:
+        logger.error(f"Failed to open geocode cache, using memory: {e}")
+        backend = MemoryBackend(max_entries)
+    return ReverseGeocoder(
+        PriceCache(backend, default_ttl=ttl_seconds, stale_seconds=0),
+        precision=int(os.getenv("MANDI_GEOCODE_PRECISION", "2")),
+        ttl_seconds=ttl_seconds,
+        min_interval=float(os.getenv("MANDI_GEOCODE_MIN_INTERVAL_SECONDS", "1.0")),
+        offline=create_offline_geocoder(),
+    )
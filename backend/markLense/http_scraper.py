@@ -0,0 +1,335 @@
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from .price_rows import PriceRow, parse_price, parse_price_date, to_epoch_day
+except ImportError:
+    from price_rows import PriceRow, parse_price, parse_price_date, to_epoch_day
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+BASE_URL = "https://agmarknet.gov.in/SearchCmmMkt.aspx"
+GRID_ID = "cphBody_GridPriceData"
+
+# Only parse the parts of the page each step needs
+FORM_STRAINER = SoupStrainer(["input", "select"])
+GRID_STRAINER = SoupStrainer("table", id=GRID_ID)
+
+# Grid header keyword -> legacy field, checked in order
+GRID_COLUMNS = [
+    ("sl", "S.No"),
+    ("district", "City"),
+    ("market", "Market"),
+    ("commodity", "Commodity"),
+    ("min", "Min Prize"),
+    ("max", "Max Prize"),
+    ("modal", "Model Prize"),
+    ("date", "Date"),
+]
+
+
+class FormUnavailableError(RuntimeError):
+    """The page came back without the search form (maintenance or error page); worth retrying.
+
+    Distinct from the ValueError raised when the form is there but does not
+    list the requested state or commodity, which retrying will not fix.
+    """
+
+
+class FormState:
+    """Fields of the ASP.NET form as the browser would submit them"""
+
+    def __init__(self, html: str):
+        soup = BeautifulSoup(html, HTML_PARSER, parse_only=FORM_STRAINER)
+        self.fields: Dict[str, str] = {}
+        self.names: Dict[str, str] = {}  # element id -> form field name
+        self.options: Dict[str, List[Tuple[str, str]]] = {}  # element id -> [(value, text)]
+        self.buttons: Dict[str, Tuple[str, str]] = {}  # element id -> (name, value)
+
+        for element in soup.find_all("input"):
+            name = element.get("name")
+            if not name:
+                continue
+            self.names[element.get("id", name)] = name
+            input_type = (element.get("type") or "text").lower()
+            if input_type in ("submit", "button", "image"):
+                self.buttons[element.get("id", name)] = (name, element.get("value", ""))
+            elif input_type in ("checkbox", "radio") and not element.has_attr("checked"):
+                continue
+            else:
+                self.fields[name] = element.get("value", "")
+
+        for element in soup.find_all("select"):
+            name = element.get("name")
+            if not name:
+                continue
+            element_id = element.get("id", name)
+            self.names[element_id] = name
+            options = [(option.get("value", option.get_text(strip=True)), option.get_text(strip=True))
+                       for option in element.find_all("option")]
+            self.options[element_id] = options
+            selected = element.find("option", selected=True)
+            if selected is not None:
+                self.fields[name] = selected.get("value", selected.get_text(strip=True))
+            elif options:
+                self.fields[name] = options[0][0]
+
+    def option_value(self, element_id: str, text: str) -> Optional[str]:
+        """Value of the option whose text matches exactly, else the first partial match"""
+        options = self.options.get(element_id, [])
+        wanted = text.strip().lower()
+        for value, option_text in options:
+            if option_text.lower() == wanted:
+                return value
+        for value, option_text in options:
+            if wanted in option_text.lower():
+                return value
+        return None
+
+    def require_options(self, *element_ids: str):
+        """Raise FormUnavailableError unless every dropdown lists more than its placeholder"""
+        missing = [element_id for element_id in element_ids if len(self.options.get(element_id, [])) < 2]
+        if missing:
+            raise FormUnavailableError(f"Agmarknet form is missing {', '.join(missing)}; site may be down")
+
+    def market_names(self) -> List[str]:
+        return [text for value, text in self.options.get("ddlMarket", []) if value not in ("0", "")
+                and not text.startswith("--")]
+
+    def payload(self, values: Dict[str, str], event_target: str = "", button: Optional[str] = None) -> Dict[str, str]:
+        data = dict(self.fields)
+        for element_id, value in values.items():
+            data[self.names.get(element_id, element_id)] = value
+        data["__EVENTTARGET"] = self.names.get(event_target, event_target)
+        data["__EVENTARGUMENT"] = ""
+        if button and button in self.buttons:
+            name, value = self.buttons[button]
+            data[name] = value
+        return data
+
+
+def parse_price_grid(html: str, state: str, commodity: str, market: Optional[str], date: str) -> List[PriceRow]:
+    """Parse the Agmarknet result grid into typed price rows"""
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=GRID_STRAINER)
+    table = soup.find("table", id=GRID_ID)
+    if table is None:
+        return []
+
+    rows = table.find_all("tr")
+    if not rows:
+        return []
+
+    headers = [cell.get_text(" ", strip=True).lower() for cell in rows[0].find_all(["th", "td"])]
+    columns: Dict[str, int] = {}
+    for index, header in enumerate(headers):
+        for keyword, field in GRID_COLUMNS:
+            if keyword in header and field not in columns:
+                columns[field] = index
+                break
+
+    default_day = to_epoch_day(parse_price_date(date))
+    results = []
+    for row in rows[1:]:
+        cells = [cell.get_text(" ", strip=True) for cell in row.find_all("td")]
+        if len(cells) < len(headers) or not any(cells):
+            continue  # pager / footer rows
+
+        def cell(field: str, default: Optional[str] = None) -> Optional[str]:
+            index = columns.get(field)
+            return cells[index] if index is not None and cells[index] else default
+
+        serial = cell("S.No", "")
+        row_date = cell("Date")
+        results.append(PriceRow(
+            serial=int(serial) if serial.isdigit() else len(results) + 1,
+            city=cell("City", market or "Unknown"),
+            commodity=cell("Commodity", commodity),
+            min_price=parse_price(cell("Min Prize")),
+            max_price=parse_price(cell("Max Prize")),
+            modal_price=parse_price(cell("Model Prize")),
+            day=to_epoch_day(parse_price_date(row_date)) if row_date else default_day,
+            state=state,
+            market=market or cell("Market", cell("City", "Unknown")),
+        ).keep_text(cell("Min Prize"), cell("Max Prize"), cell("Model Prize"), row_date or date))
+    return results
+
+
+def group_by_market(rows_by_commodity: Dict[str, List[PriceRow]]) -> Dict[str, Dict[str, List[PriceRow]]]:
+    """{commodity: rows} from a state sweep -> {market: {commodity: rows}}"""
+    grouped: Dict[str, Dict[str, List[PriceRow]]] = {}
+    for commodity, rows in rows_by_commodity.items():
+        for row in rows:
+            market = row.market or row.city or "Unknown"
+            grouped.setdefault(market, {}).setdefault(commodity, []).append(row)
+    return grouped
+
+
+class AgmarknetHttpScraper:
+    """Agmarknet scraper that replays the ASP.NET form postbacks over plain HTTP.
+
+    Each lookup is one GET for the form plus one or two POSTs, with no
+    browser, so a fetch costs a few hundred milliseconds instead of a
+    Chrome start-up and fixed sleeps. Every thread gets its own session
+    (cookie jar and ASP.NET session state), so parallel lookups never
+    interleave ViewState; the fetch_* methods return per-step timings
+    alongside the rows instead of keeping them on the instance.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, timeout: float = 15.0,
+                 session_factory: Callable[[], requests.Session] = requests.Session):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session_factory = session_factory
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self.session_factory()
+            session.headers.update({
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+            })
+        return session
+
+    def _get(self) -> str:
+        response = self.session.get(self.base_url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def _post(self, data: Dict[str, str]) -> str:
+        response = self.session.post(self.base_url, data=data, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def _search(self, state: str, commodity: str, target_date: datetime) -> Tuple[FormState, str, Dict[str, float]]:
+        """Submit commodity/state/date and return the resulting form, page and step timings"""
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        form = FormState(self._get())
+        timings["load_form"] = round((time.perf_counter() - started) * 1000, 2)
+        form.require_options("ddlCommodity", "ddlState")
+
+        commodity_value = form.option_value("ddlCommodity", commodity)
+        state_value = form.option_value("ddlState", state)
+        if commodity_value is None:
+            raise ValueError(f"Commodity '{commodity}' not found")
+        if state_value is None:
+            raise ValueError(f"State '{state}' not found")
+
+        # Selecting the state is an AutoPostBack that fills the market dropdown
+        started = time.perf_counter()
+        page = self._post(form.payload({
+            "ddlCommodity": commodity_value,
+            "ddlState": state_value,
+            "txtDate": target_date.strftime("%d-%b-%Y"),
+        }, event_target="ddlState"))
+        form = FormState(page)
+        timings["select_state"] = round((time.perf_counter() - started) * 1000, 2)
+
+        started = time.perf_counter()
+        page = self._post(form.payload({
+            "ddlCommodity": commodity_value,
+            "ddlState": state_value,
+            "txtDate": target_date.strftime("%d-%b-%Y"),
+        }, button="btnGo"))
+        timings["search"] = round((time.perf_counter() - started) * 1000, 2)
+        return FormState(page), page, timings
+
+    def fetch_single_commodity(self, state: str, commodity: str, market: str = None,
+                               days_back: int = 0) -> Tuple[List[PriceRow], Dict[str, float]]:
+        """(rows, per-step milliseconds) for one commodity in a state or market"""
+        target_date = datetime.now() - timedelta(days=days_back)
+        date_text = target_date.strftime("%d-%b-%Y")
+        form, page, timings = self._search(state, commodity, target_date)
+
+        if market:
+            market_value = form.option_value("ddlMarket", market)
+            if market_value is not None:
+                started = time.perf_counter()
+                page = self._post(form.payload({
+                    "ddlMarket": market_value,
+                    "txtDate": date_text,
+                }, button="btnGo"))
+                timings["select_market"] = round((time.perf_counter() - started) * 1000, 2)
+            else:
+                logger.warning(f"Market '{market}' not listed for {commodity} in {state}")
+
+        started = time.perf_counter()
+        rows = parse_price_grid(page, state, commodity, market, date_text)
+        timings["parse"] = round((time.perf_counter() - started) * 1000, 2)
+        return rows, timings
+
+    def scrape_single_commodity_data(self, state: str, commodity: str, market: str = None,
+                                     days_back: int = 0) -> List[PriceRow]:
+        """Same contract as AgmarknetScraper.scrape_single_commodity_data"""
+        return self.fetch_single_commodity(state, commodity, market, days_back)[0]
+
+    def fetch_state_sweep(self, state: str, commodities: List[str],
+                          days_back: int = 0) -> Tuple[Dict[str, List[PriceRow]], Dict[str, float]]:
+        """Rows for every market in a state, per commodity, plus per-step milliseconds.
+
+        The site searches one commodity at a time but returns all markets when
+        none is selected, so the sweep is one form load and one state postback
+        followed by a single search per commodity, each replaying the previous
+        page's ViewState. Unknown commodities map to an empty list.
+        """
+        target_date = datetime.now() - timedelta(days=days_back)
+        date_text = target_date.strftime("%d-%b-%Y")
+        timings: Dict[str, float] = {}
+
+        started = time.perf_counter()
+        form = FormState(self._get())
+        timings["load_form"] = round((time.perf_counter() - started) * 1000, 2)
+        form.require_options("ddlState")
+        state_value = form.option_value("ddlState", state)
+        if state_value is None:
+            raise ValueError(f"State '{state}' not found")
+
+        started = time.perf_counter()
+        form = FormState(self._post(form.payload({
+            "ddlState": state_value,
+            "txtDate": date_text,
+        }, event_target="ddlState")))
+        timings["select_state"] = round((time.perf_counter() - started) * 1000, 2)
+        form.require_options("ddlCommodity")
+
+        results: Dict[str, List[PriceRow]] = {}
+        parse_ms = 0.0
+        for commodity in commodities:
+            commodity_value = form.option_value("ddlCommodity", commodity)
+            if commodity_value is None:
+                logger.warning(f"Commodity '{commodity}' not found; skipping in {state} sweep")
+                results[commodity] = []
+                continue
+            started = time.perf_counter()
+            page = self._post(form.payload({
+                "ddlCommodity": commodity_value,
+                "ddlState": state_value,
+                "txtDate": date_text,
+            }, button="btnGo"))
+            timings[f"search_{commodity}"] = round((time.perf_counter() - started) * 1000, 2)
+            started = time.perf_counter()
+            form = FormState(page)
+            results[commodity] = parse_price_grid(page, state, commodity, None, date_text)
+            parse_ms += (time.perf_counter() - started) * 1000
+        timings["parse"] = round(parse_ms, 2)
+        return results, timings
+
+    def scrape_state_sweep(self, state: str, commodities: List[str], days_back: int = 0) -> Dict[str, List[PriceRow]]:
+        return self.fetch_state_sweep(state, commodities, days_back)[0]
+
+    def get_available_markets_for_state(self, state: str, commodity: str = "Onion") -> List[str]:
+        form, _, _ = self._search(state, commodity, datetime.now())
+        return form.market_names()
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATES = ["Kerala"]
+DEFAULT_COMMODITIES = ["Onion", "Potato", "Tomato", "Rice", "Coconut"]
+
+
+@dataclass(frozen=True)
+class IngestionTarget:
+    state: str
+    commodity: str
+    market: Optional[str] = None  # None sweeps every market the state reports
+
+
+def parse_targets(spec: Optional[str]) -> List[IngestionTarget]:
+    """Targets from MANDI_INGEST_TARGETS.
+
+    Accepts a JSON list of {"state", "commodity", "market"} objects, a path
+    to a file containing one, or "State:Commodity[:Market]" items separated
+    by commas. Without a spec every default state x commodity is swept.
+    """
+    if not spec:
+        return [IngestionTarget(state, commodity) for state in DEFAULT_STATES for commodity in DEFAULT_COMMODITIES]
+    spec = spec.strip()
+    if os.path.isfile(spec):
+        with open(spec, encoding="utf-8") as f:
+            spec = f.read().strip()
+    if spec.startswith("["):
+        return [IngestionTarget(item["state"], item["commodity"], item.get("market")) for item in json.loads(spec)]
+    targets = []
+    for item in spec.split(","):
+        parts = [part.strip() for part in item.split(":")]
+        if len(parts) >= 2 and parts[0] and parts[1]:
+            targets.append(IngestionTarget(parts[0], parts[1], parts[2] if len(parts) > 2 and parts[2] else None))
+    return targets
+
+
+class PriceIngestor:
+    """Sweeps configured targets with AgmarknetScraper into the price warehouse.
+
+    A sweep runs its targets one after another on a single background
+    thread with a pause between them, so ingestion adds at most one
+    concurrent scrape to the request-path load and stays polite upstream.
+    """
+
+    def __init__(self, scraper, warehouse, targets: List[IngestionTarget],
+                 interval_minutes: float = 60, delay_seconds: float = 2.0):
+        self.scraper = scraper
+        self.warehouse = warehouse
+        self.targets = targets
+        self.interval_minutes = interval_minutes
+        self.delay_seconds = delay_seconds
+        self.scheduler = AsyncIOScheduler()
+        self.running = False
+        self.last_sweep: Dict[str, Any] = {}
+        self.sweeps = 0
+
+    def ingest_target(self, target: IngestionTarget) -> int:
+        """Scrape, clean and store one target (blocking); returns rows written"""
+        started = time.time()
+        try:
+            raw_rows = self.scraper.scrape_single_commodity_data(target.state, target.commodity, target.market)
+            written = self.warehouse.store(self.scraper.cleanup_price_data(raw_rows), target.state, target.commodity)
+            self.warehouse.record_run(target.commodity, target.state, target.market, started, written)
+            return written
+        except Exception as e:
+            logger.warning(f"Ingestion failed for {target}: {e}")
+            self.warehouse.record_run(target.commodity, target.state, target.market, started, 0, str(e))
+            raise
+
+    def _sweep(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        rows, failures = 0, 0
+        for index, target in enumerate(self.targets):
+            if index and self.delay_seconds:
+                time.sleep(self.delay_seconds)
+            try:
+                rows += self.ingest_target(target)
+            except Exception:
+                failures += 1
+        return {
+            "targets": len(self.targets),
+            "rows": rows,
+            "failures": failures,
+            "duration_seconds": round(time.perf_counter() - started, 2),
+        }
+
+    async def run_sweep(self) -> Dict[str, Any]:
+        if self.running:
+            logger.info("Price ingestion sweep already running; skipping")
+            return self.last_sweep
+        self.running = True
+        try:
+            summary = await asyncio.to_thread(self._sweep)
+            summary["finished_at"] = time.time()
+            self.last_sweep = summary
+            self.sweeps += 1
+            logger.info(f"Price ingestion sweep finished: {summary}")
+            return summary
+        finally:
+            self.running = False
+
+    def start(self):
+        if self.scheduler.running:
+            return
+        # First sweep right away, then on the configured cadence
+        self.scheduler.add_job(self.run_sweep, IntervalTrigger(minutes=self.interval_minutes),
+                               id="mandi-price-ingestion", max_instances=1, coalesce=True)
+        self.scheduler.start()
+        asyncio.get_running_loop().create_task(self.run_sweep())
+        logger.info(f"Price ingestion scheduled every {self.interval_minutes} min for {len(self.targets)} targets")
+
+    def shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_minutes": self.interval_minutes,
+            "targets": [asdict(target) for target in self.targets],
+            "running": self.running,
+            "sweeps": self.sweeps,
+            "last_sweep": self.last_sweep,
+        }
+
+
+def create_price_ingestor(scraper, warehouse) -> Optional[PriceIngestor]:
+    """Opt-in (MANDI_INGEST_ENABLED=true): every worker that enables it runs its own scheduler,
+    so turn it on for exactly one process rather than across a multi-worker server"""
+    if scraper is None or warehouse is None or os.getenv("MANDI_INGEST_ENABLED", "false").lower() != "true":
+        return None
+    return PriceIngestor(
+        scraper,
+        warehouse,
+        parse_targets(os.getenv("MANDI_INGEST_TARGETS")),
+        interval_minutes=float(os.getenv("MANDI_INGEST_INTERVAL_MINUTES", "60")),
+        delay_seconds=float(os.getenv("MANDI_INGEST_DELAY_SECONDS", "2")),
+    )
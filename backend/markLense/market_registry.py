@@ -0,0 +1,221 @@
+import os
+import csv
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Optional: sklearn's KDTree; without it queries fall back to a NumPy brute-force scan
+try:
+    from sklearn.neighbors import KDTree
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+
+@dataclass(frozen=True)
+class Market:
+    name: str
+    state: str
+    lat: float
+    lon: float
+    district: Optional[str] = None
+
+
+def _market_from_dict(item: Dict[str, Any], state: Optional[str] = None) -> Market:
+    return Market(
+        name=str(item["name"]).strip(),
+        state=str(item.get("state") or state).strip(),
+        lat=float(item["lat"]),
+        lon=float(item["lon"]),
+        district=item.get("district") or None,
+    )
+
+
+def markets_from_locations(locations: Dict[str, List[Dict[str, Any]]]) -> List[Market]:
+    """{"State": [{"name", "lat", "lon"}, ...]} (the MANDI_LOCATIONS shape) -> markets"""
+    return [_market_from_dict(item, state) for state, items in locations.items() for item in items]
+
+
+def load_markets(path: str) -> List[Market]:
+    """Markets from a CSV (name,state,lat,lon[,district]) or JSON file.
+
+    JSON may be a list of market objects or a {"State": [...]} mapping like
+    MANDI_LOCATIONS. Rows without usable coordinates are skipped.
+    """
+    markets, skipped = [], 0
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            items = [(row, None) for row in csv.DictReader(f)]
+        else:
+            data = json.load(f)
+            if isinstance(data, dict):
+                items = [(item, state) for state, state_items in data.items() for item in state_items]
+            else:
+                items = [(item, None) for item in data]
+    for item, state in items:
+        try:
+            market = _market_from_dict(item, state)
+        except (KeyError, TypeError, ValueError):
+            skipped += 1
+            continue
+        if -90 <= market.lat <= 90 and -180 <= market.lon <= 180:
+            markets.append(market)
+        else:
+            skipped += 1
+    if skipped:
+        logger.warning(f"Skipped {skipped} market rows without usable coordinates in {path}")
+    return markets
+
+
+def to_unit_vectors(lat, lon) -> np.ndarray:
+    """Degrees -> points on the unit sphere, shape (n, 3)"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def haversine_matrix(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distances in km between every point of set 1 and set 2, shape (n1, n2)"""
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))[:, None]
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))[None, :]
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def top_k_columns(matrix: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per row, indexes and values of the k smallest entries, smallest first"""
+    k = min(k, matrix.shape[1])
+    if k <= 0:
+        empty = np.empty((matrix.shape[0], 0))
+        return empty.astype(np.int64), empty
+    indexes = np.argpartition(matrix, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(matrix, indexes, axis=1)
+    order = np.argsort(values, axis=1, kind="stable")
+    return np.take_along_axis(indexes, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def chord_to_km(chord):
+    # Straight-line distance between unit vectors -> great-circle distance
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+def km_to_chord(km: float) -> float:
+    return 2 * np.sin(min(km, np.pi * EARTH_RADIUS_KM) / (2 * EARTH_RADIUS_KM))
+
+
+class MarketIndex:
+    """Nearest-market lookups over a fixed registry.
+
+    Markets are stored as 3D unit vectors, where straight-line (chord)
+    distance orders points exactly like great-circle distance, so a plain
+    Euclidean KD-tree answers k-nearest and radius queries without the
+    wrap-around problems of indexing raw lat/lon. Built once at startup.
+    """
+
+    def __init__(self, markets: List[Market]):
+        self.markets = list(markets)
+        self.points = to_unit_vectors([m.lat for m in self.markets], [m.lon for m in self.markets])
+        self.tree = KDTree(self.points) if SKLEARN_AVAILABLE and self.markets else None
+        self._by_name: Dict[str, List[int]] = {}
+        for i, market in enumerate(self.markets):
+            self._by_name.setdefault(market.name.strip().lower(), []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.markets)
+
+    def find(self, name: str, state: Optional[str] = None) -> Optional[int]:
+        """Position of the named market (optionally within state), or None"""
+        positions = self._by_name.get(name.strip().lower(), [])
+        if state:
+            positions = [i for i in positions if self.markets[i].state.lower() == state.strip().lower()]
+        return positions[0] if positions else None
+
+    def nearest(self, lat: float, lon: float, k: int = 5) -> List[Tuple[Market, float]]:
+        """Up to k closest markets with their distance in km, closest first"""
+        k = min(k, len(self.markets))
+        if k <= 0:
+            return []
+        query = to_unit_vectors([lat], [lon])
+        if self.tree is not None:
+            chords, indexes = self.tree.query(query, k=k)
+            chords, indexes = chords[0], indexes[0]
+        else:
+            all_chords = np.linalg.norm(self.points - query, axis=1)
+            indexes = np.argpartition(all_chords, k - 1)[:k]
+            indexes = indexes[np.argsort(all_chords[indexes], kind="stable")]
+            chords = all_chords[indexes]
+        return [(self.markets[i], float(d)) for i, d in zip(indexes, chord_to_km(chords))]
+
+    def nearest_many(self, lats, lons, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """k nearest markets for many points in one pass: (indexes, distances_km), each (n, k)"""
+        k = min(k, len(self.markets))
+        queries = to_unit_vectors(lats, lons)
+        if k <= 0 or not len(queries):
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty
+        if self.tree is not None:
+            chords, indexes = self.tree.query(queries, k=k)
+            return indexes, chord_to_km(chords)
+        lats_all = [m.lat for m in self.markets]
+        lons_all = [m.lon for m in self.markets]
+        return top_k_columns(haversine_matrix(lats, lons, lats_all, lons_all), k)
+
+    def within(self, lat: float, lon: float, radius_km: float, limit: Optional[int] = None) -> List[Tuple[Market, float]]:
+        """Markets within radius_km, closest first"""
+        if not self.markets or radius_km < 0:
+            return []
+        query = to_unit_vectors([lat], [lon])
+        max_chord = km_to_chord(radius_km)
+        if self.tree is not None:
+            indexes, chords = self.tree.query_radius(query, r=max_chord, return_distance=True, sort_results=True)
+            indexes, chords = indexes[0], chords[0]
+        else:
+            all_chords = np.linalg.norm(self.points - query, axis=1)
+            indexes = np.nonzero(all_chords <= max_chord)[0]
+            indexes = indexes[np.argsort(all_chords[indexes], kind="stable")]
+            chords = all_chords[indexes]
+        if limit is not None:
+            indexes, chords = indexes[:limit], chords[:limit]
+        return [(self.markets[i], float(d)) for i, d in zip(indexes, chord_to_km(chords))]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "markets": len(self.markets),
+            "states": len({m.state for m in self.markets}),
+            "backend": "kdtree" if self.tree is not None else "numpy",
+        }
+
+
+def market_dict(market: Market, distance_km: Optional[float] = None) -> Dict[str, Any]:
+    data = {"name": market.name, "state": market.state, "lat": market.lat, "lon": market.lon}
+    if market.district:
+        data["district"] = market.district
+    if distance_km is not None:
+        data["distance_km"] = round(distance_km, 2)
+    return data
+
+
+def create_market_index(default_locations: Dict[str, List[Dict[str, Any]]]) -> MarketIndex:
+    """Index over MANDI_MARKET_REGISTRY (CSV/JSON) or, if unset or unreadable, the built-in locations"""
+    path = os.getenv("MANDI_MARKET_REGISTRY")
+    markets = None
+    if path:
+        try:
+            markets = load_markets(path)
+        except Exception as e:
+            logger.error(f"Failed to load market registry {path}: {e}; using built-in mandi list")
+    if not markets:
+        markets = markets_from_locations(default_locations)
+    index = MarketIndex(markets)
+    logger.info(f"Market index ready: {index.stats()}")
+    return index
@@ -0,0 +1,208 @@
+import os
+import csv
+import json
+import math
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .market_registry import EARTH_RADIUS_KM, to_unit_vectors
+
+logger = logging.getLogger(__name__)
+
+# Seed dataset: some district headquarters for the states the mandi list covers. It is not
+# complete (e.g. Krishnagiri and Mandya are missing), so nearest-point lookups can land on the
+# wrong neighbour; it is only used when MANDI_GEOCODE_OFFLINE=true is set explicitly
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), "geodata", "districts.csv")
+
+DISTRICT_KEYS = ("district", "DISTRICT", "dtname", "NAME_2", "name")
+STATE_KEYS = ("state", "STATE", "st_nm", "NAME_1")
+
+
+@dataclass(frozen=True)
+class District:
+    district: str
+    state: str
+    lat: float  # a representative point: the headquarters, or a polygon's vertex mean
+    lon: float
+
+
+def _first(properties: Dict[str, Any], keys) -> Optional[str]:
+    for key in keys:
+        if properties.get(key):
+            return str(properties[key]).strip()
+    return None
+
+
+def load_district_points(path: str) -> List[District]:
+    """District points from a CSV (district,state,lat,lon) or a JSON list of the same objects"""
+    with open(path, encoding="utf-8") as f:
+        items = list(csv.DictReader(f)) if path.lower().endswith(".csv") else json.load(f)
+    districts = []
+    for item in items:
+        try:
+            districts.append(District(item["district"].strip(), item["state"].strip(),
+                                      float(item["lat"]), float(item["lon"])))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+    return districts
+
+
+def load_district_polygons(path: str):
+    """(districts, rings) from a GeoJSON FeatureCollection of Polygon/MultiPolygon districts.
+
+    rings[i] holds every ring (outer and holes) of district i as (n, 2) lon/lat
+    arrays; containment uses the even-odd rule across all of them.
+    """
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f).get("features", [])
+    districts, rings = [], []
+    for feature in features:
+        geometry = feature.get("geometry") or {}
+        properties = feature.get("properties") or {}
+        name, state = _first(properties, DISTRICT_KEYS), _first(properties, STATE_KEYS)
+        if not name or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+            continue
+        polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        feature_rings = [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon]
+        outer = feature_rings[0]
+        districts.append(District(name, state or "", float(outer[:, 1].mean()), float(outer[:, 0].mean())))
+        rings.append(feature_rings)
+    return districts, rings
+
+
+def ring_edges(rings: List[np.ndarray]) -> np.ndarray:
+    """All edges of a district's rings as one (4, n) array of x1, y1, x2, y2"""
+    return np.hstack([np.vstack((ring[:, 0], ring[:, 1], np.roll(ring[:, 0], -1), np.roll(ring[:, 1], -1)))
+                      for ring in rings])
+
+
+def point_in_edges(lon: float, lat: float, edges: np.ndarray) -> bool:
+    """Even-odd ray casting; counting crossings over every ring at once handles holes"""
+    x1, y1, x2, y2 = edges
+    crosses = (y1 > lat) != (y2 > lat)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_at = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+    return bool(np.count_nonzero(crosses & (lon < x_at)) % 2)
+
+
+def district_place(district: District) -> Dict[str, Any]:
+    """Same shape as geocoding.parse_nominatim, at district granularity (city is always None)"""
+    display_name = ", ".join(part for part in (district.district, district.state, "India") if part)
+    return {
+        "short_name": ", ".join(part for part in (district.district, district.state) if part),
+        "full_address": display_name,
+        "details": {
+            "display_name": display_name,
+            "city": None,
+            "district": district.district,
+            "state": district.state or None,
+            "country": "India",
+            "postcode": None
+        },
+    }
+
+
+class OfflineGeocoder:
+    """Resolves coordinates to district/state from a local dataset, with no network calls.
+
+    With polygons a point must fall inside exactly one district. With
+    district points the nearest one wins unless it is farther than
+    max_distance_km (outside coverage) or a different district is nearly as
+    close (second / first distance under ambiguity_ratio, i.e. near a
+    border). Those cases return None so the caller can ask Nominatim.
+    A headquarters point says nothing about where its district ends, so
+    point mode only answers close to one; use polygons for real coverage.
+    """
+
+    def __init__(self, districts: List[District], rings: Optional[List[List[np.ndarray]]] = None,
+                 max_distance_km: float = 15.0, ambiguity_ratio: float = 1.3):
+        self.districts = districts
+        self.max_distance_km = max_distance_km
+        self.ambiguity_ratio = ambiguity_ratio
+        self.counters = {"resolved": 0, "ambiguous": 0, "out_of_coverage": 0}
+        # Everything is precomputed so a lookup is a few small vectorized ops
+        self.edges = [ring_edges(district_rings) for district_rings in rings] if rings else None
+        if self.edges:
+            bounds = np.array([[e[1].min(), e[1].max(), e[0].min(), e[0].max()] for e in self.edges])
+            self.min_lat, self.max_lat, self.min_lon, self.max_lon = bounds.T
+        # A few hundred districts scan faster as one dot product than through a tree
+        self.points = to_unit_vectors([d.lat for d in districts], [d.lon for d in districts])
+
+    def _resolve_polygon(self, lat: float, lon: float) -> Optional[District]:
+        candidates = np.nonzero((self.min_lat <= lat) & (lat <= self.max_lat) &
+                                (self.min_lon <= lon) & (lon <= self.max_lon))[0]
+        hits = [i for i in candidates if point_in_edges(lon, lat, self.edges[i])]
+        if len(hits) == 1:
+            return self.districts[hits[0]]
+        self.counters["ambiguous" if hits else "out_of_coverage"] += 1
+        return None
+
+    def _resolve_nearest(self, lat: float, lon: float) -> Optional[District]:
+        k = min(2, len(self.districts))
+        phi, lam = math.radians(lat), math.radians(lon)
+        query = np.array((math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)))
+        # Cosine of the central angle: larger is closer
+        cosines = self.points @ query
+        indexes = np.argpartition(-cosines, k - 1)[:k] if k < len(cosines) else np.arange(k)
+        indexes = indexes[np.argsort(-cosines[indexes], kind="stable")]
+        distances = EARTH_RADIUS_KM * np.arccos(np.clip(cosines[indexes], -1.0, 1.0))
+        if distances[0] > self.max_distance_km:
+            self.counters["out_of_coverage"] += 1
+            return None
+        nearest = self.districts[indexes[0]]
+        if k == 2:
+            runner_up = self.districts[indexes[1]]
+            if (runner_up.district, runner_up.state) != (nearest.district, nearest.state) \
+                    and distances[1] < distances[0] * self.ambiguity_ratio:
+                self.counters["ambiguous"] += 1
+                return None
+        return nearest
+
+    def resolve(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        """District-level place for (lat, lon), or None when the local answer is not trustworthy"""
+        if not self.districts:
+            return None
+        district = self._resolve_polygon(lat, lon) if self.edges else self._resolve_nearest(lat, lon)
+        if district is None:
+            return None
+        self.counters["resolved"] += 1
+        return district_place(district)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "districts": len(self.districts),
+            "mode": "polygon" if self.edges else "nearest_point",
+            **self.counters,
+        }
+
+
+def create_offline_geocoder() -> Optional[OfflineGeocoder]:
+    """From MANDI_GEOCODE_DISTRICTS_PATH (.geojson polygons, or CSV/JSON points) or the bundled points.
+
+    On by default only when a dataset path is configured; the bundled
+    points need MANDI_GEOCODE_OFFLINE=true.
+    """
+    path = os.getenv("MANDI_GEOCODE_DISTRICTS_PATH")
+    enabled = os.getenv("MANDI_GEOCODE_OFFLINE", "true" if path else "false")
+    if enabled.lower() != "true":
+        return None
+    path = path or DEFAULT_DATASET
+    try:
+        if path.lower().endswith(".geojson"):
+            districts, rings = load_district_polygons(path)
+        else:
+            districts, rings = load_district_points(path), None
+    except Exception as e:
+        logger.error(f"Failed to load district dataset {path}: {e}; offline geocoding disabled")
+        return None
+    geocoder = OfflineGeocoder(
+        districts,
+        rings,
+        max_distance_km=float(os.getenv("MANDI_GEOCODE_OFFLINE_MAX_KM", "15")),
+        ambiguity_ratio=float(os.getenv("MANDI_GEOCODE_OFFLINE_AMBIGUITY_RATIO", "1.3")),
+    )
+    logger.info(f"Offline geocoder ready: {geocoder.stats()}")
+    return geocoder
@@ -0,0 +1,393 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .price_rows import cache_default, cache_object_hook
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "data", "mandi_cache.db")
+DEFAULT_TTL_SECONDS = 30 * 60
+DEFAULT_STALE_SECONDS = 6 * 3600
+DEFAULT_PURGE_INTERVAL_SECONDS = 10 * 60
+
+# (value, stored_at, expires_at, keep_until) as wall-clock epoch seconds, so entries
+# written by one worker are interpreted identically by every other worker. Between
+# expires_at and keep_until an entry is stale but can still be served while refreshing.
+Entry = Tuple[Any, float, float, float]
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    stored_at: float
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.stored_at
+
+
+class MemoryBackend:
+    """Per-process OrderedDict LRU"""
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: float, keep_until: float):
+        with self._lock:
+            self._entries[key] = (value, stored_at, expires_at, keep_until)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def purge_expired(self, now: float) -> int:
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry[3] <= now]
+            for key in expired:
+                del self._entries[key]
+            return len(expired)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def keys(self, limit: int) -> List[str]:
+        with self._lock:
+            return list(reversed(self._entries))[:limit]
+
+
+class SQLiteBackend:
+    """Cache table in a local SQLite file shared by every worker on the host.
+
+    Recency lives in accessed_at; when the table exceeds max_entries the
+    periodic purge deletes the least recently read rows, so writes never
+    count the table. Reads never write either: access times are buffered
+    and flushed in batches alongside the next write, so WAL readers in
+    every worker stay off the write lock.
+    """
+
+    name = "sqlite"
+    blocking = True
+
+    TOUCH_BATCH = 256
+
+    def __init__(self, max_entries: int, db_path: str = DEFAULT_DB_PATH):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, "
+            "expires_at REAL NOT NULL, keep_until REAL NOT NULL, accessed_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at);"
+            "CREATE INDEX IF NOT EXISTS idx_cache_keep ON cache (keep_until);"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, expires_at, keep_until FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._flush_touched()
+                self._conn.commit()
+        return json.loads(row[0], object_hook=cache_object_hook), row[1], row[2], row[3]
+
+    def _flush_touched(self):
+        """Write buffered access times (caller holds the lock and commits)"""
+        if self._touched:
+            self._conn.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?",
+                                   [(accessed_at, key) for key, accessed_at in self._touched.items()])
+            self._touched.clear()
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: float, keep_until: float):
+        payload = json.dumps(value, default=cache_default)
+        with self._lock:
+            self._touched.pop(key, None)
+            self._flush_touched()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at, keep_until, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (key, payload, stored_at, expires_at, keep_until, time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._touched.pop(key, None)
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def purge_expired(self, now: float) -> int:
+        """Delete expired rows, then the least recently read ones beyond max_entries"""
+        with self._lock:
+            self._flush_touched()
+            deleted = self._conn.execute("DELETE FROM cache WHERE keep_until <= ?", (now,)).rowcount
+            overflow = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._conn.commit()
+            return deleted
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def keys(self, limit: int) -> List[str]:
+        with self._lock:
+            recent = sorted(self._touched, key=self._touched.get, reverse=True)[:limit]
+            rows = self._conn.execute("SELECT key FROM cache ORDER BY accessed_at DESC LIMIT ?", (limit,))
+            return (recent + [key for (key,) in rows if key not in self._touched])[:limit]
+
+
+class RedisBackend:
+    """Redis (or any RESP-compatible server such as Valkey/KeyDB) shared by all workers.
+
+    Keys get a server-side TTL so expired entries disappear on their own;
+    the size bound is the server's maxmemory with an allkeys-lru policy.
+    Recency is not tracked here, so keys() lists keys in SCAN order.
+    """
+
+    name = "redis"
+    blocking = True
+
+    def __init__(self, url: str, prefix: str = "mandi:"):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is not installed")
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.client.ping()
+
+    @property
+    def evictions(self) -> int:
+        try:
+            return int(self.client.info("stats").get("evicted_keys", 0))
+        except Exception:
+            return 0
+
+    def get(self, key: str) -> Optional[Entry]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        record = json.loads(raw, object_hook=cache_object_hook)
+        return record["value"], record["stored_at"], record["expires_at"], record["keep_until"]
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: float, keep_until: float):
+        ttl_ms = max(1, int((keep_until - time.time()) * 1000))
+        record = json.dumps({"value": value, "stored_at": stored_at, "expires_at": expires_at,
+                             "keep_until": keep_until}, default=cache_default)
+        self.client.set(self.prefix + key, record, px=ttl_ms)
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def purge_expired(self, now: float) -> int:
+        return 0  # the server expires keys itself
+
+    def size(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*", count=500))
+
+    def keys(self, limit: int) -> List[str]:
+        """Up to limit keys in arbitrary (SCAN) order"""
+        keys = []
+        for raw in self.client.scan_iter(match=self.prefix + "*", count=500):
+            keys.append(raw.decode()[len(self.prefix):])
+            if len(keys) >= limit:
+                break
+        return keys
+
+
+class PriceCache:
+    """TTL cache for scraped mandi data over a pluggable storage backend"""
+
+    def __init__(self, backend, default_ttl: float = DEFAULT_TTL_SECONDS,
+                 stale_seconds: float = DEFAULT_STALE_SECONDS, purge_interval: float = DEFAULT_PURGE_INTERVAL_SECONDS):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.stale_seconds = stale_seconds
+        self.purge_interval = purge_interval
+        self._next_purge = time.time() + purge_interval
+        self.purged = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.errors = 0
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache read failed for {key}: {e}")
+            return None
+        if entry is None or entry[3] <= time.time():
+            return None
+        return CacheEntry(*entry[:3])
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """Entry for key, fresh or stale; None once it is past its stale window"""
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+        elif entry.fresh:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        """Value for key if present and not expired"""
+        entry = self._lookup(key)
+        if entry is None or not entry.fresh:
+            self.misses += 1
+            self.expirations += entry is not None
+            return None
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        now = time.time()
+        expires_at = now + (ttl_seconds or self.default_ttl)
+        try:
+            self.backend.set(key, value, now, expires_at, expires_at + self.stale_seconds)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache write failed for {key}: {e}")
+        # Writes are rare next to reads, so they carry the periodic sweep of dead entries
+        if self.purge_interval and now >= self._next_purge:
+            self._next_purge = now + self.purge_interval
+            self.purged += self.purge_expired()
+
+    async def _offload(self, fn, *args, **kwargs):
+        # The memory tier is the only one cheap enough to touch from the event loop
+        if not getattr(self.backend, "blocking", True):
+            return fn(*args, **kwargs)
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    async def get_entry_async(self, key: str) -> Optional[CacheEntry]:
+        return await self._offload(self.get_entry, key)
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        return await self._offload(self.get, key)
+
+    async def set_async(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        await self._offload(self.set, key, value, ttl_seconds)
+
+    async def stats_async(self) -> Dict[str, Any]:
+        return await self._offload(self.stats)
+
+    async def keys_async(self, limit: int = 10) -> List[str]:
+        return await self._offload(self.keys, limit)
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache delete failed for {key}: {e}")
+
+    def purge_expired(self) -> int:
+        try:
+            return self.backend.purge_expired(time.time())
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache purge failed: {e}")
+            return 0
+
+    def keys(self, limit: int = 10) -> List[str]:
+        """Most recently used first for memory/SQLite; arbitrary order for Redis"""
+        try:
+            return self.backend.keys(limit)
+        except Exception:
+            return []
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        try:
+            entries = self.backend.size()
+        except Exception:
+            entries = None
+        return {
+            "backend": self.backend.name,
+            "entries": entries,
+            "max_entries": getattr(self.backend, "max_entries", None),
+            "default_ttl_seconds": self.default_ttl,
+            "stale_seconds": self.stale_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "expirations": self.expirations,
+            "evictions": self.backend.evictions,
+            "purged": self.purged,
+            "errors": self.errors,
+        }
+
+
+def create_price_cache() -> PriceCache:
+    """Build the mandi cache from MANDI_CACHE_* settings, falling back to memory"""
+    backend_name = os.getenv("MANDI_CACHE_BACKEND", "memory").lower()
+    max_entries = int(os.getenv("MANDI_CACHE_MAX_ENTRIES", "1000"))
+    default_ttl = float(os.getenv("MANDI_CACHE_TTL_SECONDS", str(DEFAULT_TTL_SECONDS)))
+    stale_seconds = float(os.getenv("MANDI_CACHE_STALE_SECONDS", str(DEFAULT_STALE_SECONDS)))
+    purge_interval = float(os.getenv("MANDI_CACHE_PURGE_INTERVAL_SECONDS", str(DEFAULT_PURGE_INTERVAL_SECONDS)))
+
+    backend = None
+    try:
+        if backend_name == "sqlite":
+            backend = SQLiteBackend(max_entries, os.getenv("MANDI_CACHE_PATH", DEFAULT_DB_PATH))
+        elif backend_name == "redis":
+            backend = RedisBackend(os.getenv("MANDI_CACHE_REDIS_URL", "redis://localhost:6379/0"))
+        elif backend_name != "memory":
+            logger.warning(f"Unknown MANDI_CACHE_BACKEND '{backend_name}', using memory")
+    except Exception as e:
+        logger.error(f"Failed to open {backend_name} mandi cache, using memory: {e}")
+
+    return PriceCache(backend or MemoryBackend(max_entries), default_ttl, stale_seconds, purge_interval)
@@ -0,0 +1,201 @@
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DATE_FORMATS = ("%d %b %Y", "%d-%b-%Y", "%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d")
+EPOCH = date(1970, 1, 1)
+LEGACY_DATE_FORMAT = "%d %b %Y"
+
+
+def parse_price(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value or "").replace("₹", "").replace(",", "").strip()
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_price_date(value: Any) -> Optional[date]:
+    text = str(value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def clean_price_text(value: Any) -> str:
+    """Price text as the endpoints always returned it: ₹ and commas stripped, "NR" unless numeric"""
+    text = str(value or "").replace("₹", "").replace(",", "").strip()
+    if not text or text == "NR":
+        return "NR"
+    try:
+        float(text)
+    except ValueError:
+        return "NR"
+    return text
+
+
+def format_price(value: Optional[float]) -> str:
+    """Legacy price string: "NR" when missing, no trailing zeros or exponent"""
+    if value is None:
+        return "NR"
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def to_epoch_day(value: Optional[date]) -> Optional[int]:
+    return (value - EPOCH).days if value is not None else None
+
+
+def from_epoch_day(day: Optional[int]) -> Optional[date]:
+    return EPOCH + timedelta(days=day) if day is not None else None
+
+
+@lru_cache(maxsize=4096)
+def format_epoch_day(day: Optional[int]) -> str:
+    """Legacy "Date" text; a response repeats a handful of days, and strftime dominates rendering"""
+    return from_epoch_day(day).strftime(LEGACY_DATE_FORMAT) if day is not None else ""
+
+
+class PriceRow:
+    """One mandi price observation, parsed once where it is scraped.
+
+    Prices are floats (None for "NR") and the date is an epoch day, so
+    nothing downstream re-parses strings. __slots__ keeps a row at about a
+    fifth of the legacy dict's footprint. The legacy string fields ("Min
+    Prize", "Date", ...) are produced only when a response is rendered.
+    text holds the source (min, max, modal, date) strings only for rows
+    whose strings the canonical rendering would change ("24.0",
+    "17-Oct-2026"), so those responses stay byte-for-byte what they were.
+    """
+
+    __slots__ = ("serial", "city", "commodity", "min_price", "max_price", "modal_price", "day", "state", "market",
+                 "text")
+
+    def __init__(self, serial: Optional[int], city: Optional[str], commodity: str,
+                 min_price: Optional[float], max_price: Optional[float], modal_price: Optional[float],
+                 day: Optional[int], state: Optional[str] = None, market: Optional[str] = None,
+                 text: Optional[Sequence[str]] = None):
+        self.serial = serial
+        self.city = city
+        self.commodity = commodity
+        self.min_price = min_price
+        self.max_price = max_price
+        self.modal_price = modal_price
+        self.day = day
+        self.state = state
+        self.market = market
+        self.text = tuple(text) if text else None
+
+    @classmethod
+    def from_legacy(cls, item: Dict[str, Any]) -> "PriceRow":
+        serial = str(item.get("S.No") or "").strip()
+        row = cls(
+            serial=int(serial) if serial.isdigit() else None,
+            city=item.get("City"),
+            commodity=item.get("Commodity"),
+            min_price=parse_price(item.get("Min Prize")),
+            max_price=parse_price(item.get("Max Prize")),
+            modal_price=parse_price(item.get("Model Prize")),
+            day=to_epoch_day(parse_price_date(item.get("Date"))),
+            state=item.get("State"),
+            market=item.get("Market"),
+        )
+        return row.keep_text(item.get("Min Prize"), item.get("Max Prize"), item.get("Model Prize"), item.get("Date"))
+
+    @property
+    def price_date(self) -> Optional[date]:
+        return from_epoch_day(self.day)
+
+    def canonical_text(self) -> Tuple[str, str, str, str]:
+        return (format_price(self.min_price), format_price(self.max_price), format_price(self.modal_price),
+                format_epoch_day(self.day))
+
+    def keep_text(self, min_text: Any, max_text: Any, modal_text: Any, date_text: Any) -> "PriceRow":
+        """Remember the source strings if rendering the parsed values would not reproduce them"""
+        text = (clean_price_text(min_text), clean_price_text(max_text), clean_price_text(modal_text),
+                str(date_text or "").strip())
+        self.text = text if text != self.canonical_text() else None
+        return self
+
+    def to_legacy(self) -> Dict[str, str]:
+        """The dict shape the mandi endpoints have always returned"""
+        min_text, max_text, modal_text, date_text = self.text or self.canonical_text()
+        legacy = {
+            "S.No": str(self.serial) if self.serial is not None else "",
+            "City": self.city or self.market or "Unknown",
+            "Commodity": self.commodity,
+            "Min Prize": min_text,
+            "Max Prize": max_text,
+            "Model Prize": modal_text,
+            "Date": date_text,
+        }
+        if self.state is not None:
+            legacy["State"] = self.state
+        if self.market is not None:
+            legacy["Market"] = self.market
+        return legacy
+
+    def to_compact(self) -> List[Any]:
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_compact(cls, values: List[Any]) -> "PriceRow":
+        return cls(*values)  # entries cached before text existed have one value fewer
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PriceRow) and self.to_compact() == other.to_compact()
+
+    def __repr__(self) -> str:
+        return f"PriceRow({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+def as_price_rows(items: Iterable[Any]) -> List[PriceRow]:
+    """Accept PriceRows or legacy dicts (old cache entries, the standalone scripts)"""
+    return [item if isinstance(item, PriceRow) else PriceRow.from_legacy(item) for item in items]
+
+
+def clean_price_rows(items: Iterable[Any]) -> List[PriceRow]:
+    """Drop rows without a commodity or place and blank out negative prices"""
+    cleaned = []
+    # Prices and dates were parsed when the rows were scraped; only validate here
+    for row in as_price_rows(items):
+        for price_field in ("min_price", "max_price", "modal_price"):
+            price_value = getattr(row, price_field)
+            if price_value is not None and price_value < 0:
+                setattr(row, price_field, None)
+                row.text = None  # the source strings no longer describe the row
+        if row.commodity and (row.city or row.market):
+            cleaned.append(row)
+    return cleaned
+
+
+# -- JSON at the boundaries --
+
+CACHE_TAG = "__price_row__"
+
+
+def cache_default(obj: Any) -> Any:
+    """json.dumps default for cache backends: rows become tagged compact lists"""
+    if isinstance(obj, PriceRow):
+        return {CACHE_TAG: obj.to_compact()}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def cache_object_hook(value: Dict[str, Any]) -> Any:
+    if len(value) == 1 and CACHE_TAG in value:
+        return PriceRow.from_compact(value[CACHE_TAG])
+    return value
+
+
+def legacy_default(obj: Any) -> Any:
+    """json.dumps default for API output: rows become legacy-named dicts"""
+    if isinstance(obj, PriceRow):
+        return obj.to_legacy()
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
@@ -0,0 +1,276 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import logging
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from .price_rows import PriceRow, as_price_rows, to_epoch_day
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "data", "price_warehouse.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    commodity_key TEXT NOT NULL,
+    state_key TEXT NOT NULL,
+    market_key TEXT NOT NULL,
+    price_date TEXT NOT NULL,
+    commodity TEXT NOT NULL,
+    state TEXT NOT NULL,
+    market TEXT NOT NULL,
+    city TEXT,
+    min_price REAL,
+    max_price REAL,
+    modal_price REAL,
+    scraped_at REAL NOT NULL,
+    source TEXT NOT NULL DEFAULT 'live',
+    PRIMARY KEY (commodity_key, state_key, market_key, price_date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_prices_state_date ON prices (state_key, price_date);
+CREATE TABLE IF NOT EXISTS ingest_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    commodity_key TEXT NOT NULL,
+    state_key TEXT NOT NULL,
+    market_key TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    rows INTEGER NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ingest_runs_target ON ingest_runs (commodity_key, state_key, market_key, finished_at);
+"""
+
+ALL_MARKETS = "*"
+# Rows loaded by python -m markLense.backfill are history, never evidence of a fresh scrape
+SOURCE_LIVE = "live"
+SOURCE_BACKFILL = "backfill"
+
+
+def normalize_key(text: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+def normalize_row(row: PriceRow, state: str, commodity: str) -> Optional[Dict[str, Any]]:
+    """PriceRow -> warehouse columns; None if it has no usable date"""
+    if row.day is None:
+        return None
+    market = row.market or row.city or "Unknown"
+    commodity = row.commodity or commodity
+    return {
+        "commodity_key": normalize_key(commodity),
+        "state_key": normalize_key(state),
+        "market_key": normalize_key(market),
+        "price_date": row.price_date.isoformat(),
+        "commodity": commodity,
+        "state": state,
+        "market": market,
+        "city": row.city,
+        "min_price": row.min_price,
+        "max_price": row.max_price,
+        "modal_price": row.modal_price,
+    }
+
+
+def to_price_row(row: Dict[str, Any], index: int) -> PriceRow:
+    """Warehouse columns -> PriceRow, numbered like a scraped grid"""
+    return PriceRow(
+        serial=index + 1,
+        city=row["city"] or row["market"],
+        commodity=row["commodity"],
+        min_price=row["min_price"],
+        max_price=row["max_price"],
+        modal_price=row["modal_price"],
+        day=to_epoch_day(date.fromisoformat(row["price_date"])),
+        state=row["state"],
+        market=row["market"],
+    )
+
+
+class PriceWarehouse:
+    """Local SQLite time series of mandi prices keyed by (commodity, state, market, date).
+
+    Like the diagnosis history store, all database work runs on one
+    dedicated thread; async callers await it without blocking the loop.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warehouse")
+        self._conn: Optional[sqlite3.Connection] = None
+        self.available = True
+        try:
+            self.executor.submit(self._connect).result()
+        except Exception as e:
+            logger.error(f"Failed to open price warehouse {db_path}: {e}")
+            self.available = False
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(prices)")}
+        if "source" not in columns:
+            self._conn.execute(f"ALTER TABLE prices ADD COLUMN source TEXT NOT NULL DEFAULT '{SOURCE_LIVE}'")
+        self._conn.commit()
+
+    def _run(self, fn, *args):
+        return self.executor.submit(fn, *args).result()
+
+    async def _run_async(self, fn, *args):
+        return await asyncio.wrap_future(self.executor.submit(fn, *args))
+
+    # -- writes --
+
+    def _upsert(self, rows: List[Dict[str, Any]], scraped_at: float, source: str) -> int:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO prices (commodity_key, state_key, market_key, price_date, commodity, state, "
+            "market, city, min_price, max_price, modal_price, scraped_at, source) VALUES (:commodity_key, "
+            ":state_key, :market_key, :price_date, :commodity, :state, :market, :city, :min_price, :max_price, "
+            ":modal_price, :scraped_at, :source)",
+            [{**row, "scraped_at": scraped_at, "source": source} for row in rows]
+        )
+        self._conn.commit()
+        return len(rows)
+
+    def store(self, price_rows: Iterable[PriceRow], state: str, commodity: str, source: str = SOURCE_LIVE) -> int:
+        """Upsert cleaned scraper rows (blocking); returns rows written"""
+        rows = [row for row in (normalize_row(raw, state, commodity) for raw in as_price_rows(price_rows)) if row]
+        if not rows:
+            return 0
+        return self._run(self._upsert, rows, time.time(), source)
+
+    async def store_async(self, price_rows: Iterable[PriceRow], state: str, commodity: str) -> int:
+        rows = [row for row in (normalize_row(raw, state, commodity) for raw in as_price_rows(price_rows)) if row]
+        if not rows:
+            return 0
+        return await self._run_async(self._upsert, rows, time.time(), SOURCE_LIVE)
+
+    def _record_run(self, commodity: str, state: str, market: Optional[str], started_at: float,
+                    rows: int, error: Optional[str]):
+        self._conn.execute(
+            "INSERT INTO ingest_runs (commodity_key, state_key, market_key, started_at, finished_at, rows, error) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (normalize_key(commodity), normalize_key(state), normalize_key(market) or ALL_MARKETS,
+             started_at, time.time(), rows, error)
+        )
+        self._conn.commit()
+
+    def record_run(self, commodity: str, state: str, market: Optional[str], started_at: float,
+                   rows: int, error: Optional[str] = None):
+        self._run(self._record_run, commodity, state, market, started_at, rows, error)
+
+    # -- reads --
+
+    def _latest(self, commodity: str, state: str, market: Optional[str]) -> Dict[str, Any]:
+        where = ["commodity_key = ?", "state_key = ?"]
+        params: List[Any] = [normalize_key(commodity), normalize_key(state)]
+        if market:
+            where.append("market_key = ?")
+            params.append(normalize_key(market))
+        where_sql = " AND ".join(where)
+        # Latest date per market, so one stale market does not hide the others
+        rows = self._conn.execute(
+            f"SELECT p.* FROM prices p JOIN (SELECT market_key, MAX(price_date) AS price_date FROM prices "
+            f"WHERE {where_sql} GROUP BY market_key) latest USING (market_key, price_date) "
+            f"WHERE p.commodity_key = ? AND p.state_key = ? ORDER BY p.market",
+            params + params[:2]
+        ).fetchall()
+        # Only runs that wrote rows vouch for the data; the scrapers report failures as empty results
+        run = self._conn.execute(
+            "SELECT MAX(finished_at) FROM ingest_runs WHERE commodity_key = ? AND state_key = ? "
+            "AND market_key IN (?, ?) AND error IS NULL AND rows > 0",
+            (params[0], params[1], normalize_key(market) or ALL_MARKETS, ALL_MARKETS)
+        ).fetchone()[0]
+        rows = [dict(row) for row in rows]
+        live = [row["scraped_at"] for row in rows if row["source"] == SOURCE_LIVE]
+        scraped_at = max(live + [run or 0]) or None
+        latest_price_date = max((row["price_date"] for row in rows), default=None)
+        return {
+            "rows": rows,
+            "freshness": {
+                "scraped_at": datetime.fromtimestamp(scraped_at).isoformat() if scraped_at else None,
+                "age_seconds": round(time.time() - scraped_at, 1) if scraped_at else None,
+                "latest_price_date": latest_price_date,
+                "price_age_days": (date.today() - date.fromisoformat(latest_price_date)).days
+                if latest_price_date else None,
+            },
+        }
+
+    async def latest(self, commodity: str, state: str, market: Optional[str] = None) -> Dict[str, Any]:
+        """Most recent rows per market with freshness metadata"""
+        return await self._run_async(self._latest, commodity, state, market)
+
+    def _markets(self, state: str, since: str) -> List[str]:
+        rows = self._conn.execute(
+            "SELECT DISTINCT market FROM prices WHERE state_key = ? AND price_date >= ? ORDER BY market",
+            (normalize_key(state), since)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    async def markets(self, state: str, since: date) -> List[str]:
+        return await self._run_async(self._markets, state, since.isoformat())
+
+    def _dates_present(self, commodity: str, state: str, market: Optional[str], start: str, end: str) -> List[str]:
+        where = "commodity_key = ? AND state_key = ? AND price_date BETWEEN ? AND ?"
+        params: List[Any] = [normalize_key(commodity), normalize_key(state), start, end]
+        if market:
+            where += " AND market_key = ?"
+            params.append(normalize_key(market))
+        rows = self._conn.execute(f"SELECT DISTINCT price_date FROM prices WHERE {where}", params).fetchall()
+        return [row[0] for row in rows]
+
+    def dates_present(self, commodity: str, state: str, market: Optional[str], start: date, end: date) -> set:
+        """Dates in [start, end] that already have rows (blocking)"""
+        return {date.fromisoformat(d) for d in
+                self._run(self._dates_present, commodity, state, market, start.isoformat(), end.isoformat())}
+
+    def _history(self, commodity: str, state: str, market: Optional[str], start: str, end: str) -> List[Dict[str, Any]]:
+        where = "commodity_key = ? AND state_key = ? AND price_date BETWEEN ? AND ?"
+        params: List[Any] = [normalize_key(commodity), normalize_key(state), start, end]
+        if market:
+            where += " AND market_key = ?"
+            params.append(normalize_key(market))
+        rows = self._conn.execute(
+            f"SELECT price_date, market, min_price, max_price, modal_price FROM prices WHERE {where} "
+            f"ORDER BY price_date, market", params
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    async def history(self, commodity: str, state: str, market: Optional[str], start: date, end: date) -> List[Dict[str, Any]]:
+        """Daily typed rows in [start, end], oldest first"""
+        return await self._run_async(self._history, commodity, state, market, start.isoformat(), end.isoformat())
+
+    def _stats(self) -> Dict[str, Any]:
+        rows, series, first, last = self._conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT commodity_key || '|' || state_key || '|' || market_key), "
+            "MIN(price_date), MAX(price_date) FROM prices"
+        ).fetchone()
+        runs, failed, last_run = self._conn.execute(
+            "SELECT COUNT(*), SUM(error IS NOT NULL), MAX(finished_at) FROM ingest_runs"
+        ).fetchone()
+        return {
+            "rows": rows,
+            "series": series,
+            "first_price_date": first,
+            "last_price_date": last,
+            "ingest_runs": runs,
+            "failed_runs": failed or 0,
+            "last_run_at": datetime.fromtimestamp(last_run).isoformat() if last_run else None,
+        }
+
+    async def stats(self) -> Dict[str, Any]:
+        return await self._run_async(self._stats)
+
+
+def create_price_warehouse() -> Optional[PriceWarehouse]:
+    if os.getenv("MANDI_WAREHOUSE_ENABLED", "true").lower() != "true":
+        return None
+    return PriceWarehouse(os.getenv("MANDI_WAREHOUSE_PATH", DEFAULT_DB_PATH))
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
 import asyncio
-import httpx
 import json
 from datetime import datetime, timedelta
 import os
@@ -17,6 +18,16 @@ import time
 backend_root = Path(__file__).parent.parent
 load_dotenv(backend_root / '.env')
 
+from .price_cache import create_price_cache
+from .single_flight import SingleFlight
+from .scrape_executor import ScraperBusyError, create_scrape_executor
+from .price_warehouse import create_price_warehouse, to_price_row
+from .price_rows import PriceRow, legacy_default, to_epoch_day
+from .ingestion import create_price_ingestor
+from .market_registry import create_market_index, market_dict, haversine_matrix, top_k_columns
+from .fanout import FanoutJob, create_fanout_engine, summarize
+from .geocoding import create_reverse_geocoder, close_shared_client
+
 # Import the comprehensive scraper
 try:
     from .comprehensive_scraper import create_scraper
@@ -38,26 +49,62 @@ if SCRAPER_AVAILABLE:
         logger.error(f"Failed to initialize scraper: {e}")
         scraper_instance = None
 
-# Cache for storing scraped data
-data_cache = {}
-cache_expiry = {}
-
-def is_cache_valid(key: str, expiry_minutes: int = 30) -> bool:
-    """Check if cached data is still valid"""
-    if key not in cache_expiry:
-        return False
-    return datetime.now() < cache_expiry[key] + timedelta(minutes=expiry_minutes)
+# Cache for storing scraped data (MANDI_CACHE_BACKEND=memory|sqlite|redis)
+price_cache = create_price_cache()
 
-def set_cache(key: str, data: any, expiry_minutes: int = 30):
+# SQLite/Redis cache I/O runs on a worker thread so a slow backend never stalls the event loop
+async def set_cache(key: str, data: any, expiry_minutes: int = 30):
     """Set data in cache with expiry"""
-    data_cache[key] = data
-    cache_expiry[key] = datetime.now()
+    await price_cache.set_async(key, data, ttl_seconds=expiry_minutes * 60)
 
-def get_cached_data(key: str):
+async def get_cached_data(key: str):
     """Get cached data if valid"""
-    if is_cache_valid(key):
-        return data_cache[key]
-    return None
+    return await price_cache.get_async(key)
+
+# In-flight realtime scrapes, so concurrent identical requests share one fetch
+realtime_flights = SingleFlight("realtime-price")
+
+# Blocking scraper calls run here, never on the event loop shared with the rest of the app
+scrape_executor = create_scrape_executor()
+SCRAPER_RETRY_AFTER_SECONDS = 30
+
+def scraper_busy(e: ScraperBusyError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e),
+                         headers={"Retry-After": str(SCRAPER_RETRY_AFTER_SECONDS)})
+
+# Local price time series filled by the scheduled ingestion sweep (and by live scrapes)
+price_warehouse = create_price_warehouse()
+price_ingestor = create_price_ingestor(scraper_instance, price_warehouse)
+WAREHOUSE_MAX_AGE_SECONDS = float(os.getenv("MANDI_WAREHOUSE_MAX_AGE_MINUTES", "180")) * 60
+# A recent scrape of old prices is still old prices: markets older than this are left out
+WAREHOUSE_MAX_PRICE_AGE_DAYS = int(os.getenv("MANDI_WAREHOUSE_MAX_PRICE_AGE_DAYS", "3"))
+
+# Bulk lookups fan out across (mandi, commodity) pairs; live scrapes are capped per upstream host
+price_fanout = create_fanout_engine()
+AGMARKNET_HOST = "agmarknet.gov.in"
+FANOUT_LIVE_DEFAULT = os.getenv("MANDI_FANOUT_LIVE", "false").lower() == "true"
+FANOUT_MOCK_FALLBACK = os.getenv("MANDI_FANOUT_MOCK_FALLBACK", "true").lower() == "true"
+
+async def warehouse_prices(commodity: str, state: str, market: Optional[str]) -> Optional[Dict]:
+    """Latest warehouse rows as PriceRows if they are fresh enough, else None"""
+    if price_warehouse is None or not price_warehouse.available:
+        return None
+    try:
+        latest = await price_warehouse.latest(commodity, state, market)
+    except Exception as e:
+        logger.warning(f"Price warehouse lookup failed: {e}")
+        return None
+    age = latest["freshness"]["age_seconds"]
+    if age is None or age > WAREHOUSE_MAX_AGE_SECONDS:
+        return None
+    cutoff = (datetime.now().date() - timedelta(days=WAREHOUSE_MAX_PRICE_AGE_DAYS)).isoformat()
+    rows = [row for row in latest["rows"] if row["price_date"] >= cutoff]
+    if not rows:
+        return None
+    return {
+        "price_data": [to_price_row(row, index) for index, row in enumerate(rows)],
+        "freshness": latest["freshness"]
+    }
 
 # Enhanced price data generator with more realistic prices
 def generate_enhanced_mock_price_data(vegetable: str, market: str, state: str):
@@ -78,20 +125,44 @@ def generate_enhanced_mock_price_data(vegetable: str, market: str, state: str):
     max_price = round(base_price * variation * 1.2, 2)
     modal_price = round(base_price * variation, 2)
     
-    today = datetime.now().strftime('%d-%b-%Y')
+    today = datetime.now()
     
-    return [{
-        "S.No": "1",
-        "City": market,
-        "Commodity": vegetable,
-        "Min Prize": str(min_price),
-        "Max Prize": str(max_price),
-        "Model Prize": str(modal_price),
-        "Date": today
-    }]
+    # Mock rows have always shown str(float) prices and "17-Oct-2026" dates
+    row = PriceRow(serial=1, city=market, commodity=vegetable, min_price=min_price,
+                   max_price=max_price, modal_price=modal_price, day=to_epoch_day(today.date()))
+    return [row.keep_text(str(min_price), str(max_price), str(modal_price), today.strftime('%d-%b-%Y'))]
+
+class PriceJSONResponse(JSONResponse):
+    """JSON response for payloads carrying PriceRows.
+
+    Rows stay typed all the way here and are turned into the legacy
+    "Min Prize"/"Date" dicts only while rendering, skipping FastAPI's
+    generic jsonable_encoder walk.
+    """
+
+    def render(self, content) -> bytes:
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+                          default=legacy_default).encode("utf-8")
 
 router = APIRouter(prefix="/mandi", tags=["Mandi Prices"])
 
+@router.on_event("startup")
+async def start_price_ingestion():
+    if price_ingestor:
+        price_ingestor.start()
+
+@router.on_event("shutdown")
+async def close_http_client():
+    await close_shared_client()
+
+@router.on_event("shutdown")
+def close_driver_pool():
+    if price_ingestor:
+        price_ingestor.shutdown()
+    scrape_executor.shutdown()
+    if scraper_instance:
+        scraper_instance.driver_pool.close()
+
 # Common Indian vegetables and their AgMarkNet names
 COMMON_VEGETABLES = [
     "Onion", "Potato", "Tomato", "Cabbage", "Cauliflower", 
@@ -150,6 +221,38 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     
     return distance
 
+# Spatial index over MANDI_MARKET_REGISTRY (or the list above), built once at import
+market_index = create_market_index(MANDI_LOCATIONS)
+
+# Reverse geocoding through the shared pooled client, cached per ~1 km cell on disk
+reverse_geocoder = create_reverse_geocoder()
+GEOCODE_BULK_MAX_POINTS = int(os.getenv("MANDI_GEOCODE_BULK_MAX_POINTS", "200"))
+
+# Full matrices are returned cell by cell, so cap their size; top-k answers stay small but are
+# still computed in chunks of origins so no intermediate matrix exceeds the cell cap either
+MAX_DISTANCE_MATRIX_CELLS = int(os.getenv("MANDI_DISTANCE_MATRIX_MAX_CELLS", "250000"))
+MAX_DISTANCE_MATRIX_ORIGINS = int(os.getenv("MANDI_DISTANCE_MATRIX_MAX_ORIGINS", "20000"))
+MAX_DISTANCE_MATRIX_MANDIS = int(os.getenv("MANDI_DISTANCE_MATRIX_MAX_MANDIS", "5000"))
+
+class GeoPoint(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+    id: Optional[str] = None
+
+class MandiRef(BaseModel):
+    name: str
+    state: Optional[str] = None
+    lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    lon: Optional[float] = Field(default=None, ge=-180, le=180)
+
+class ReverseGeocodeBulkRequest(BaseModel):
+    points: List[GeoPoint]
+
+class DistanceMatrixRequest(BaseModel):
+    origins: List[GeoPoint]
+    mandis: Optional[List[MandiRef]] = None  # None means every mandi in the registry
+    top_k: Optional[int] = Field(default=None, ge=1)
+
 @router.get("/")
 async def mandi_root():
     """Root endpoint for mandi service"""
@@ -164,71 +267,142 @@ async def mandi_root():
 async def get_nearest_mandis(
     lat: float = Query(..., description="User's latitude"),
     lon: float = Query(..., description="User's longitude"),
-    limit: int = Query(default=5, description="Number of nearest mandis to return")
+    limit: int = Query(default=5, description="Number of nearest mandis to return"),
+    radius_km: Optional[float] = Query(default=None, description="Only return mandis within this distance")
 ):
     """Find nearest mandis based on user's location"""
     try:
-        nearest_mandis = []
-        
-        # Calculate distance to all mandis
-        for state, mandis in MANDI_LOCATIONS.items():
-            for mandi in mandis:
-                distance = calculate_distance(lat, lon, mandi["lat"], mandi["lon"])
-                nearest_mandis.append({
-                    "name": mandi["name"],
-                    "state": state,
-                    "lat": mandi["lat"],
-                    "lon": mandi["lon"],
-                    "distance_km": round(distance, 2)
-                })
-        
-        # Sort by distance and return top results
-        nearest_mandis.sort(key=lambda x: x["distance_km"])
+        if radius_km is not None:
+            matches = market_index.within(lat, lon, radius_km, limit=limit)
+        else:
+            matches = market_index.nearest(lat, lon, k=limit)
         
         return {
             "status": "success",
             "user_location": {"lat": lat, "lon": lon},
-            "nearest_mandis": nearest_mandis[:limit]
+            "nearest_mandis": [market_dict(market, distance) for market, distance in matches]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error finding nearest mandis: {str(e)}")
 
+def resolve_mandis(refs: List[MandiRef]) -> List[Dict]:
+    """Mandi references -> market dicts, taking coordinates from the registry when not given"""
+    mandis, unknown = [], []
+    for ref in refs:
+        if ref.lat is not None and ref.lon is not None:
+            mandis.append(ref.dict(exclude_none=True))
+            continue
+        position = market_index.find(ref.name, ref.state)
+        if position is None:
+            unknown.append(f"{ref.name} ({ref.state})" if ref.state else ref.name)
+        else:
+            mandis.append(market_dict(market_index.markets[position]))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown mandis without coordinates: {', '.join(unknown)}")
+    return mandis
+
+def compute_distance_matrix(request: DistanceMatrixRequest) -> Dict:
+    lats = [origin.lat for origin in request.origins]
+    lons = [origin.lon for origin in request.origins]
+    origins = [origin.dict(exclude_none=True) for origin in request.origins]
+
+    if request.mandis is None and request.top_k:
+        # Whole registry: batch KD-tree query instead of materializing origins x mandis
+        indexes, distances = market_index.nearest_many(lats, lons, k=request.top_k)
+        nearest = [
+            [market_dict(market_index.markets[i], d) for i, d in zip(row_indexes, row_distances)]
+            for row_indexes, row_distances in zip(indexes.tolist(), distances.tolist())
+        ]
+        return {"origins": origins, "nearest": nearest}
+
+    mandis = ([market_dict(market) for market in market_index.markets] if request.mandis is None
+              else resolve_mandis(request.mandis))
+    mandi_lats, mandi_lons = [m["lat"] for m in mandis], [m["lon"] for m in mandis]
+    if request.top_k:
+        nearest = []
+        chunk = max(1, MAX_DISTANCE_MATRIX_CELLS // max(1, len(mandis)))
+        for start in range(0, len(origins), chunk):
+            matrix = haversine_matrix(lats[start:start + chunk], lons[start:start + chunk], mandi_lats, mandi_lons)
+            indexes, distances = top_k_columns(matrix, request.top_k)
+            nearest.extend(
+                [{**mandis[i], "distance_km": round(d, 2)} for i, d in zip(row_indexes, row_distances)]
+                for row_indexes, row_distances in zip(indexes.tolist(), distances.tolist())
+            )
+        return {"origins": origins, "nearest": nearest}
+    if len(origins) * len(mandis) > MAX_DISTANCE_MATRIX_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Matrix of {len(origins)} x {len(mandis)} exceeds {MAX_DISTANCE_MATRIX_CELLS} cells; "
+                   f"pass top_k or fewer mandis"
+        )
+    matrix = haversine_matrix(lats, lons, mandi_lats, mandi_lons)
+    return {"origins": origins, "mandis": mandis, "distances_km": matrix.round(2).tolist()}
+
+@router.post("/distance-matrix")
+async def get_distance_matrix(request: DistanceMatrixRequest):
+    """Distances from many user locations to many mandis in one call.
+
+    Without top_k the full origins x mandis matrix (km) is returned; with
+    top_k, the nearest mandis per origin. Omitting mandis uses the whole
+    registry, which is meant for assigning every farmer to nearby mandis.
+    """
+    if not request.origins:
+        raise HTTPException(status_code=400, detail="At least one origin is required")
+    if len(request.origins) > MAX_DISTANCE_MATRIX_ORIGINS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_DISTANCE_MATRIX_ORIGINS} origins per call")
+    if request.mandis is not None and len(request.mandis) > MAX_DISTANCE_MATRIX_MANDIS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_DISTANCE_MATRIX_MANDIS} mandis per call")
+    try:
+        started = time.perf_counter()
+        result = await asyncio.to_thread(compute_distance_matrix, request)
+        return {
+            "status": "success",
+            **result,
+            "compute_ms": round((time.perf_counter() - started) * 1000, 2),
+            "timestamp": datetime.now().isoformat()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing distance matrix: {str(e)}")
+
 @router.get("/vegetable-prices/{state}/{market}")
 async def get_vegetable_prices(
     state: str,
     market: str,
-    vegetables: Optional[List[str]] = Query(default=None, description="Specific vegetables to fetch prices for")
+    vegetables: Optional[List[str]] = Query(default=None, description="Specific vegetables to fetch prices for"),
+    live: Optional[bool] = Query(default=None, description="Scrape Agmarknet for items missing from cache/warehouse"),
+    deadline_seconds: Optional[float] = Query(default=None, gt=0, description="Return partial results after this long")
 ):
     """Get prices for multiple vegetables in a specific mandi"""
     try:
         if not vegetables:
             vegetables = COMMON_VEGETABLES[:10]  # Default to first 10 common vegetables
         
+        items, summary = await fan_out_prices(
+            [(vegetable, state, market) for vegetable in vegetables], live, deadline_seconds
+        )
+        
         price_data = []
         errors = []
+        for item in items:
+            if item["status"] == "ok":
+                price_data.extend(item["price_data"])
+            else:
+                errors.append(item["error"])
         
-        for vegetable in vegetables:
-            try:
-                # Generate enhanced mock price data
-                result = generate_enhanced_mock_price_data(vegetable, market, state)
-                if result:
-                    price_data.extend(result)
-                else:
-                    errors.append(f"No data found for {vegetable}")
-            except Exception as e:
-                errors.append(f"Error fetching {vegetable}: {str(e)}")
-                continue
-        
-        return {
+        return PriceJSONResponse({
             "status": "success",
             "state": state,
             "market": market,
             "vegetables_requested": vegetables,
             "price_data": price_data,
             "errors": errors if errors else None,
+            "sources": {item["commodity"]: item["source"] for item in items if item["status"] == "ok"},
+            "fanout": summary,
             "total_records": len(price_data),
             "timestamp": datetime.now().isoformat()
-        }
+        })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching vegetable prices: {str(e)}")
@@ -246,14 +420,14 @@ async def get_single_vegetable_price(
         if not result:
             raise HTTPException(status_code=404, detail=f"No price data found for {commodity} in {market}, {state}")
         
-        return {
+        return PriceJSONResponse({
             "status": "success",
             "commodity": commodity,
             "state": state,
             "market": market,
             "price_data": result,
             "timestamp": datetime.now().isoformat()
-        }
+        })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching price data: {str(e)}")
@@ -291,6 +465,15 @@ async def get_common_vegetables():
         "total_vegetables": len(COMMON_VEGETABLES)
     }
 
+def geocode_failure(lat: float, lon: float) -> Dict:
+    return {
+        "lat": lat,
+        "lon": lon,
+        "short_name": f"Location ({lat:.4f}, {lon:.4f})",
+        "full_address": "Address lookup failed",
+        "details": {}
+    }
+
 @router.get("/reverse-geocode")
 async def reverse_geocode(
     lat: float = Query(..., description="Latitude"),
@@ -298,84 +481,60 @@ async def reverse_geocode(
 ):
     """Get place name from coordinates using OpenStreetMap Nominatim API"""
     try:
-        async with httpx.AsyncClient() as client:
-            # Use OpenStreetMap Nominatim API for reverse geocoding
-            url = f"https://nominatim.openstreetmap.org/reverse"
-            params = {
-                "format": "json",
-                "lat": lat,
-                "lon": lon,
-                "zoom": 10,
-                "addressdetails": 1
-            }
-            headers = {
-                "User-Agent": "LeafLense-MandiPrices/1.0"
-            }
-            
-            response = await client.get(url, params=params, headers=headers)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                address = data.get("address", {})
-                display_name = data.get("display_name", "Unknown Location")
-                
-                # Extract meaningful location info
-                location_info = {
-                    "display_name": display_name,
-                    "city": address.get("city") or address.get("town") or address.get("village"),
-                    "district": address.get("state_district") or address.get("county"),
-                    "state": address.get("state"),
-                    "country": address.get("country"),
-                    "postcode": address.get("postcode")
-                }
-                
-                # Create a short, readable location string
-                parts = []
-                if location_info["city"]:
-                    parts.append(location_info["city"])
-                if location_info["district"] and location_info["district"] != location_info["city"]:
-                    parts.append(location_info["district"])
-                if location_info["state"]:
-                    parts.append(location_info["state"])
-                
-                short_name = ", ".join(parts) if parts else "Unknown Location"
-                
-                return {
-                    "status": "success",
-                    "location": {
-                        "lat": lat,
-                        "lon": lon,
-                        "short_name": short_name,
-                        "full_address": display_name,
-                        "details": location_info
-                    }
-                }
-            else:
-                return {
-                    "status": "error",
-                    "location": {
-                        "lat": lat,
-                        "lon": lon,
-                        "short_name": f"Location ({lat:.4f}, {lon:.4f})",
-                        "full_address": "Address lookup failed",
-                        "details": {}
-                    }
-                }
-                
+        place, source = await reverse_geocoder.reverse(lat, lon)
+        return {
+            "status": "success",
+            "location": {"lat": lat, "lon": lon, **place},
+            "source": source
+        }
     except Exception as e:
         return {
             "status": "error",
-            "location": {
-                "lat": lat,
-                "lon": lon,
-                "short_name": f"Location ({lat:.4f}, {lon:.4f})",
-                "full_address": "Address lookup failed",
-                "details": {}
-            },
+            "location": geocode_failure(lat, lon),
             "error": str(e)
         }
 
+@router.post("/reverse-geocode/bulk")
+async def reverse_geocode_bulk(request: ReverseGeocodeBulkRequest):
+    """Resolve many coordinates at once.
+
+    Points the offline district dataset resolves answer immediately, as do
+    cached cells; points in the same ~1 km cell share one lookup, and the
+    rest go to Nominatim at most once per second, so large uncached batches
+    take about a second per distinct cell.
+    """
+    if not request.points:
+        raise HTTPException(status_code=400, detail="At least one point is required")
+    if len(request.points) > GEOCODE_BULK_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {GEOCODE_BULK_MAX_POINTS} points per call")
+    
+    started = time.perf_counter()
+    outcomes = await reverse_geocoder.reverse_many([(point.lat, point.lon) for point in request.points])
+    
+    results = []
+    for point, outcome in zip(request.points, outcomes):
+        result = {"id": point.id} if point.id is not None else {}
+        if outcome["status"] == "success":
+            result.update(status="success", location={"lat": point.lat, "lon": point.lon, **outcome["place"]},
+                          source=outcome["source"])
+        else:
+            result.update(status="error", location=geocode_failure(point.lat, point.lon), error=outcome["error"])
+        results.append(result)
+    
+    return {
+        "status": "success",
+        "results": results,
+        "summary": {
+            "points": len(results),
+            "offline": sum(1 for r in results if r.get("source") == "offline"),
+            "cache_hits": sum(1 for r in results if r.get("source") == "cache"),
+            "remote": sum(1 for r in results if r.get("source") == "nominatim"),
+            "failed": sum(1 for r in results if r["status"] == "error"),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+
 @router.post("/bulk-prices")
 async def get_bulk_prices(
     request_data: Dict = {
@@ -384,7 +543,11 @@ async def get_bulk_prices(
         "max_mandis": 3
     }
 ):
-    """Get prices for multiple vegetables from nearest mandis"""
+    """Get prices for multiple vegetables from nearest mandis.
+
+    All (mandi, vegetable) lookups run concurrently; optional "live" and
+    "deadline_seconds" fields control scraping and how long to wait.
+    """
     try:
         user_lat = request_data.get("user_location", {}).get("lat")
         user_lon = request_data.get("user_location", {}).get("lon")
@@ -393,43 +556,127 @@ async def get_bulk_prices(
         
         if not user_lat or not user_lon:
             raise HTTPException(status_code=400, detail="User location (lat, lon) is required")
-        
+
+        # Same rules as the GET fan-out's Query(gt=0) / Optional[bool] parameters
+        live = request_data.get("live")
+        deadline_seconds = request_data.get("deadline_seconds")
+        if live is not None and not isinstance(live, bool):
+            raise HTTPException(status_code=400, detail="live must be true, false or null")
+        if deadline_seconds is not None and (
+                isinstance(deadline_seconds, bool) or not isinstance(deadline_seconds, (int, float))
+                or not 0 < deadline_seconds < math.inf):
+            raise HTTPException(status_code=400, detail="deadline_seconds must be a number greater than 0")
+
         # Get nearest mandis
-        nearest_mandis_response = await get_nearest_mandis(user_lat, user_lon, max_mandis)
-        nearest_mandis = nearest_mandis_response["nearest_mandis"]
+        nearest_mandis = [market_dict(market, distance)
+                          for market, distance in market_index.nearest(user_lat, user_lon, k=max_mandis)]
         
-        bulk_data = []
+        items, summary = await fan_out_prices(
+            [(vegetable, mandi["state"], mandi["name"]) for mandi in nearest_mandis for vegetable in vegetables],
+            live,
+            deadline_seconds
+        )
         
-        for mandi in nearest_mandis:
-            mandi_data = {
+        bulk_data = []
+        for position, mandi in enumerate(nearest_mandis):
+            mandi_items = items[position * len(vegetables):(position + 1) * len(vegetables)]
+            bulk_data.append({
                 "mandi": mandi,
-                "vegetables": [],
-                "errors": []
-            }
-            
-            for vegetable in vegetables:
-                try:
-                    result = generate_enhanced_mock_price_data(vegetable, mandi["name"], mandi["state"])
-                    if result:
-                        mandi_data["vegetables"].extend(result)
-                    else:
-                        mandi_data["errors"].append(f"No data for {vegetable}")
-                except Exception as e:
-                    mandi_data["errors"].append(f"Error fetching {vegetable}: {str(e)}")
-            
-            bulk_data.append(mandi_data)
+                "vegetables": [row for item in mandi_items if item["status"] == "ok" for row in item["price_data"]],
+                "errors": [item["error"] for item in mandi_items if item["status"] != "ok"],
+                "sources": {item["commodity"]: item["source"] for item in mandi_items if item["status"] == "ok"}
+            })
         
-        return {
+        return PriceJSONResponse({
             "status": "success",
             "user_location": {"lat": user_lat, "lon": user_lon},
             "bulk_price_data": bulk_data,
+            "fanout": summary,
             "timestamp": datetime.now().isoformat()
-        }
+        })
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching bulk prices: {str(e)}")
 
 # Real-time scraping endpoints
+def realtime_cache_key(commodity: str, state: str, market: Optional[str]) -> str:
+    """Case/whitespace-insensitive key so equivalent requests share a cache entry and a scrape"""
+    parts = [commodity, state, market or "all"]
+    return "realtime_" + "_".join(part.strip().lower() for part in parts)
+
+async def fetch_realtime_price(cache_key: str, state: str, commodity: str, market: Optional[str]) -> Optional[Dict]:
+    """Scrape, clean and cache one commodity/state/market; None when nothing was found"""
+    logger.info(f"Scraping real-time data for {commodity} in {state} - {market}")
+    scraped_data = await scrape_executor.run(scraper_instance.get_realtime_price_data, state, commodity, market)
+    if not scraped_data:
+        return None
+    cache_data = {
+        "price_data": scraper_instance.cleanup_price_data(scraped_data),
+        "timestamp": datetime.now().isoformat()
+    }
+    await set_cache(cache_key, cache_data, expiry_minutes=30)
+    if price_warehouse and price_warehouse.available:
+        try:
+            await price_warehouse.store_async(cache_data["price_data"], state, commodity)
+        except Exception as e:
+            logger.warning(f"Failed to store scraped prices in the warehouse: {e}")
+    return cache_data
+
+async def lookup_commodity_price(commodity: str, state: str, market: str, live: bool) -> Dict:
+    """One (mandi, commodity) for a fan-out: fresh cache, fresh warehouse, live scrape, then mock"""
+    cache_key = realtime_cache_key(commodity, state, market)
+    cached = await price_cache.get_async(cache_key)
+    if cached:
+        return {"source": "cache", "price_data": cached["price_data"]}
+    
+    stored = await warehouse_prices(commodity, state, market)
+    if stored:
+        return {"source": "warehouse", "price_data": stored["price_data"]}
+    
+    live_error = None
+    if live and SCRAPER_AVAILABLE and scraper_instance:
+        async def limited_fetch():
+            # The slot is held for the scrape itself, not by callers coalesced onto it
+            async with price_fanout.host_slot(AGMARKNET_HOST):
+                return await fetch_realtime_price(cache_key, state, commodity, market)
+        try:
+            scraped = await realtime_flights.do(cache_key, limited_fetch)
+            if scraped:
+                return {"source": "realtime_scrape", "price_data": scraped["price_data"]}
+            live_error = "no rows on Agmarknet"
+        except ScraperBusyError:
+            live_error = "scraper busy"
+    
+    if FANOUT_MOCK_FALLBACK:
+        return {"source": "enhanced_mock", "price_data": generate_enhanced_mock_price_data(commodity, market, state)}
+    raise LookupError(live_error or "no cached or stored data")
+
+async def fan_out_prices(pairs: List[tuple], live: Optional[bool], deadline_seconds: Optional[float]):
+    """Concurrent lookups for (commodity, state, market) triples; item per triple, in order, plus a summary"""
+    live = FANOUT_LIVE_DEFAULT if live is None else live
+    deadline = deadline_seconds or price_fanout.deadline_seconds
+    started = time.perf_counter()
+    jobs = [
+        FanoutJob(f"{commodity}|{state}|{market}",
+                  lambda c=commodity, s=state, m=market: lookup_commodity_price(c, s, m, live))
+        for commodity, state, market in pairs
+    ]
+    results = await price_fanout.run(jobs, deadline)
+    items = []
+    for (commodity, state, market), result in zip(pairs, results):
+        item = {"commodity": commodity, "state": state, "market": market,
+                "status": result.status, "elapsed_ms": result.elapsed_ms}
+        if result.status == "ok":
+            item.update(result.value)
+        elif result.status == "timeout":
+            item["error"] = f"Timed out fetching {commodity} in {market}"
+        else:
+            item["error"] = f"Error fetching {commodity} in {market}: {result.error}"
+        items.append(item)
+    return items, summarize(results, deadline, started)
+
 @router.get("/realtime-price")
 async def get_realtime_price(
     commodity: str = Query(..., description="Commodity/vegetable name"),
@@ -438,51 +685,66 @@ async def get_realtime_price(
 ):
     """Get real-time price data by scraping Agmarknet"""
     try:
-        # Check cache first
-        cache_key = f"realtime_{commodity}_{state}_{market}"
-        cached_data = get_cached_data(cache_key)
+        # Check cache first; an expired entry is still served while one background refresh runs
+        cache_key = realtime_cache_key(commodity, state, market)
+        cached = await price_cache.get_entry_async(cache_key)
         
-        if cached_data:
-            logger.info(f"Returning cached data for {cache_key}")
-            return {
+        # Then the ingested warehouse, unless the cache already has a fresh answer
+        if not (cached and cached.fresh):
+            stored = await warehouse_prices(commodity, state, market)
+            if stored:
+                return PriceJSONResponse({
+                    "status": "success",
+                    "data_source": "warehouse",
+                    "commodity": commodity,
+                    "state": state,
+                    "market": market,
+                    "price_data": stored["price_data"],
+                    "timestamp": stored["freshness"]["scraped_at"],
+                    "freshness": stored["freshness"]
+                })
+        
+        if cached:
+            revalidating = False
+            if not cached.fresh and SCRAPER_AVAILABLE and scraper_instance:
+                revalidating = True
+                realtime_flights.refresh(cache_key, lambda: fetch_realtime_price(cache_key, state, commodity, market))
+            logger.info(f"Returning {'fresh' if cached.fresh else 'stale'} cached data for {cache_key}")
+            return PriceJSONResponse({
                 "status": "success",
-                "data_source": "cache",
+                "data_source": "cache" if cached.fresh else "stale_cache",
                 "commodity": commodity,
                 "state": state,
                 "market": market,
-                "price_data": cached_data["price_data"],
-                "timestamp": cached_data["timestamp"],
-                "cache_time": datetime.now().isoformat()
-            }
+                "price_data": cached.value["price_data"],
+                "timestamp": cached.value["timestamp"],
+                "cache_time": datetime.now().isoformat(),
+                "cache_age_seconds": round(cached.age_seconds, 1),
+                "revalidating": revalidating
+            })
         
-        # If scraper is available, use it
+        # If scraper is available, use it; concurrent misses for the same key share one scrape
         if SCRAPER_AVAILABLE and scraper_instance:
             try:
-                logger.info(f"Scraping real-time data for {commodity} in {state} - {market}")
-                scraped_data = scraper_instance.get_realtime_price_data(state, commodity, market)
+                cache_data = await realtime_flights.do(
+                    cache_key, lambda: fetch_realtime_price(cache_key, state, commodity, market)
+                )
                 
-                if scraped_data:
-                    cleaned_data = scraper_instance.cleanup_price_data(scraped_data)
-                    
-                    # Cache the result
-                    cache_data = {
-                        "price_data": cleaned_data,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    set_cache(cache_key, cache_data, expiry_minutes=30)
-                    
-                    return {
+                if cache_data:
+                    return PriceJSONResponse({
                         "status": "success",
                         "data_source": "realtime_scrape",
                         "commodity": commodity,
                         "state": state,
                         "market": market,
-                        "price_data": cleaned_data,
-                        "timestamp": datetime.now().isoformat()
-                    }
+                        "price_data": cache_data["price_data"],
+                        "timestamp": cache_data["timestamp"]
+                    })
                 else:
                     logger.warning(f"No scraped data found for {commodity} in {state}")
                     
+            except ScraperBusyError as e:
+                raise scraper_busy(e)
             except Exception as e:
                 logger.error(f"Error scraping data: {e}")
         
@@ -490,7 +752,7 @@ async def get_realtime_price(
         logger.info(f"Using enhanced mock data for {commodity} in {state}")
         mock_data = generate_enhanced_mock_price_data(commodity, market or "Unknown", state)
         
-        return {
+        return PriceJSONResponse({
             "status": "success",
             "data_source": "enhanced_mock",
             "commodity": commodity,
@@ -498,8 +760,10 @@ async def get_realtime_price(
             "market": market,
             "price_data": mock_data,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching real-time price: {str(e)}")
 
@@ -511,24 +775,25 @@ async def get_kerala_comprehensive_data(
     try:
         # Check cache first
         cache_key = f"kerala_comprehensive_{','.join(commodities or [])}"
-        cached_data = get_cached_data(cache_key)
+        cached_data = await get_cached_data(cache_key)
         
         if cached_data:
             logger.info("Returning cached Kerala comprehensive data")
-            return {
+            return PriceJSONResponse({
                 "status": "success",
                 "data_source": "cache",
                 "state": "Kerala",
                 "data": cached_data["data"],
                 "timestamp": cached_data["timestamp"],
                 "cache_time": datetime.now().isoformat()
-            }
+            })
         
         # If scraper is available, use it
         if SCRAPER_AVAILABLE and scraper_instance:
             try:
                 logger.info("Scraping comprehensive Kerala data")
-                kerala_data = scraper_instance.get_comprehensive_kerala_data(commodities)
+                sweep, kerala_data = await scrape_executor.run(scraper_instance.fetch_comprehensive_kerala_data,
+                                                               commodities)
                 
                 if kerala_data:
                     # Cache the result
@@ -536,16 +801,27 @@ async def get_kerala_comprehensive_data(
                         "data": kerala_data,
                         "timestamp": datetime.now().isoformat()
                     }
-                    set_cache(cache_key, cache_data, expiry_minutes=45)
+                    await set_cache(cache_key, cache_data, expiry_minutes=45)
                     
-                    return {
+                    # The response only lists the known mandis, but the sweep covers every
+                    # market, so keep all of it in the warehouse
+                    if price_warehouse and price_warehouse.available:
+                        try:
+                            for commodity, rows in sweep.items():
+                                await price_warehouse.store_async(rows, "Kerala", commodity)
+                        except Exception as e:
+                            logger.warning(f"Failed to store Kerala sweep in the warehouse: {e}")
+                    
+                    return PriceJSONResponse({
                         "status": "success",
                         "data_source": "realtime_scrape",
                         "state": "Kerala",
                         "data": kerala_data,
                         "timestamp": datetime.now().isoformat()
-                    }
+                    })
                     
+            except ScraperBusyError as e:
+                raise scraper_busy(e)
             except Exception as e:
                 logger.error(f"Error scraping Kerala data: {e}")
         
@@ -560,14 +836,16 @@ async def get_kerala_comprehensive_data(
             for commodity in default_commodities:
                 mock_kerala_data[mandi][commodity] = generate_enhanced_mock_price_data(commodity, mandi, "Kerala")
         
-        return {
+        return PriceJSONResponse({
             "status": "success",
             "data_source": "enhanced_mock",
             "state": "Kerala",
             "data": mock_kerala_data,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching Kerala comprehensive data: {str(e)}")
 
@@ -577,7 +855,7 @@ async def get_available_markets_realtime(state: str):
     try:
         # Check cache first
         cache_key = f"markets_{state}"
-        cached_data = get_cached_data(cache_key)
+        cached_data = await get_cached_data(cache_key)
         
         if cached_data:
             return {
@@ -588,11 +866,23 @@ async def get_available_markets_realtime(state: str):
                 "timestamp": cached_data["timestamp"]
             }
         
+        # Markets that reported prices to the warehouse recently
+        if price_warehouse and price_warehouse.available:
+            markets = await price_warehouse.markets(state, since=(datetime.now() - timedelta(days=14)).date())
+            if markets:
+                return {
+                    "status": "success",
+                    "data_source": "warehouse",
+                    "state": state,
+                    "markets": markets,
+                    "timestamp": datetime.now().isoformat()
+                }
+        
         # If scraper is available, use it
         if SCRAPER_AVAILABLE and scraper_instance:
             try:
                 logger.info(f"Scraping available markets for {state}")
-                markets = scraper_instance.get_available_markets_for_state(state)
+                markets = await scrape_executor.run(scraper_instance.get_available_markets_for_state, state)
                 
                 if markets:
                     # Cache the result
@@ -600,7 +890,7 @@ async def get_available_markets_realtime(state: str):
                         "markets": markets,
                         "timestamp": datetime.now().isoformat()
                     }
-                    set_cache(cache_key, cache_data, expiry_minutes=120)  # Markets don't change often
+                    await set_cache(cache_key, cache_data, expiry_minutes=120)  # Markets don't change often
                     
                     return {
                         "status": "success",
@@ -610,6 +900,8 @@ async def get_available_markets_realtime(state: str):
                         "timestamp": datetime.now().isoformat()
                     }
                     
+            except ScraperBusyError as e:
+                raise scraper_busy(e)
             except Exception as e:
                 logger.error(f"Error scraping markets for {state}: {e}")
         
@@ -626,6 +918,8 @@ async def get_available_markets_realtime(state: str):
         else:
             raise HTTPException(status_code=404, detail=f"No markets found for state: {state}")
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching markets: {str(e)}")
 
@@ -648,10 +942,10 @@ async def scrape_multiple_commodities(
         
         # Check cache first
         cache_key = f"multi_{state}_{market}_{','.join(commodities)}"
-        cached_data = get_cached_data(cache_key)
+        cached_data = await get_cached_data(cache_key)
         
         if cached_data:
-            return {
+            return PriceJSONResponse({
                 "status": "success",
                 "data_source": "cache",
                 "state": state,
@@ -659,17 +953,28 @@ async def scrape_multiple_commodities(
                 "commodities": commodities,
                 "data": cached_data["data"],
                 "timestamp": cached_data["timestamp"]
-            }
+            })
+        
+        # Answer from the warehouse when every commodity has fresh rows there
+        stored = await asyncio.gather(*(warehouse_prices(commodity, state, market) for commodity in commodities))
+        if all(stored):
+            return PriceJSONResponse({
+                "status": "success",
+                "data_source": "warehouse",
+                "state": state,
+                "market": market,
+                "commodities": commodities,
+                "data": {commodity: entry["price_data"] for commodity, entry in zip(commodities, stored)},
+                "freshness": {commodity: entry["freshness"] for commodity, entry in zip(commodities, stored)},
+                "timestamp": min(entry["freshness"]["scraped_at"] for entry in stored)
+            })
         
         # If scraper is available, use it
         if SCRAPER_AVAILABLE and scraper_instance:
             try:
                 logger.info(f"Scraping multiple commodities for {state} - {market}")
-                scraped_data = scraper_instance.scrape_multiple_commodities_parallel(
-                    state=state,
-                    commodities=commodities,
-                    market=market,
-                    max_workers=3
+                scraped_data = await scrape_executor.run(
+                    scraper_instance.scrape_multiple_commodities_parallel, state, commodities, market, 3
                 )
                 
                 if scraped_data:
@@ -683,9 +988,9 @@ async def scrape_multiple_commodities(
                         "data": cleaned_data,
                         "timestamp": datetime.now().isoformat()
                     }
-                    set_cache(cache_key, cache_data, expiry_minutes=30)
+                    await set_cache(cache_key, cache_data, expiry_minutes=30)
                     
-                    return {
+                    return PriceJSONResponse({
                         "status": "success",
                         "data_source": "realtime_scrape",
                         "state": state,
@@ -693,8 +998,10 @@ async def scrape_multiple_commodities(
                         "commodities": commodities,
                         "data": cleaned_data,
                         "timestamp": datetime.now().isoformat()
-                    }
+                    })
                     
+            except ScraperBusyError as e:
+                raise scraper_busy(e)
             except Exception as e:
                 logger.error(f"Error scraping multiple commodities: {e}")
         
@@ -704,7 +1011,7 @@ async def scrape_multiple_commodities(
         for commodity in commodities:
             mock_data[commodity] = generate_enhanced_mock_price_data(commodity, market or "Unknown", state)
         
-        return {
+        return PriceJSONResponse({
             "status": "success",
             "data_source": "enhanced_mock",
             "state": state,
@@ -712,19 +1019,61 @@ async def scrape_multiple_commodities(
             "commodities": commodities,
             "data": mock_data,
             "timestamp": datetime.now().isoformat()
-        }
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error scraping multiple commodities: {str(e)}")
 
+@router.get("/price-history")
+async def get_price_history(
+    commodity: str = Query(..., description="Commodity/vegetable name"),
+    state: str = Query(..., description="State name"),
+    market: str = Query(None, description="Market name (optional)"),
+    days: int = Query(365, ge=1, le=3650, description="How many days back to return")
+):
+    """Daily prices from the local warehouse (filled by ingestion and python -m markLense.backfill)"""
+    if price_warehouse is None or not price_warehouse.available:
+        raise HTTPException(status_code=503, detail="Price warehouse is not enabled")
+    end = datetime.now().date()
+    rows = await price_warehouse.history(commodity, state, market, end - timedelta(days=days), end)
+    return {
+        "status": "success",
+        "data_source": "warehouse",
+        "commodity": commodity,
+        "state": state,
+        "market": market,
+        "history": rows,
+        "total_records": len(rows),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @router.get("/scraper-status")
 async def get_scraper_status():
     """Get status of the scraper and cache"""
+    cache_stats = await price_cache.stats_async()
     return {
         "status": "success",
         "scraper_available": SCRAPER_AVAILABLE,
         "scraper_instance_active": scraper_instance is not None,
-        "cache_entries": len(data_cache),
-        "cache_keys": list(data_cache.keys())[:10],  # Show first 10 cache keys
+        "scraper_engine": scraper_instance.engine if scraper_instance else None,
+        "engine_stats": scraper_instance.engine_stats if scraper_instance else None,
+        "driver_pool": scraper_instance.driver_pool.stats() if scraper_instance else None,
+        "last_timings_ms": {
+            "http": scraper_instance.last_http_timings_ms,
+            "selenium": scraper_instance.last_timings_ms,
+        } if scraper_instance else None,
+        "cache_entries": cache_stats["entries"],
+        # Most recently used first for memory/SQLite; Redis returns a sample in arbitrary order
+        "cache_keys": await price_cache.keys_async(10),
+        "cache": cache_stats,
+        "realtime_single_flight": realtime_flights.stats(),
+        "executor": scrape_executor.stats(),
+        "warehouse": await price_warehouse.stats() if price_warehouse and price_warehouse.available else None,
+        "ingestion": price_ingestor.stats() if price_ingestor else None,
+        "market_index": market_index.stats(),
+        "fanout": price_fanout.stats(),
+        "reverse_geocoder": await asyncio.to_thread(reverse_geocoder.stats),
         "timestamp": datetime.now().isoformat()
     }
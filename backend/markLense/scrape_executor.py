@@ -0,0 +1,98 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class ScraperBusyError(RuntimeError):
+    """Raised instead of queueing when the scraper executor is saturated"""
+
+
+class BoundedScrapeExecutor:
+    """Dedicated thread pool for blocking scraper calls with a bounded backlog.
+
+    At most max_workers scrapes run at once and max_queue more may wait;
+    anything beyond that is rejected immediately so callers can answer 503
+    instead of piling up requests behind minute-long scrapes.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 8):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scraper")
+        # _pending counts submitted scrapes until their thread finishes, even if the
+        # awaiting request was cancelled; it is decremented from worker threads
+        self._pending = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Any] = {
+            "submitted": 0, "completed": 0, "failed": 0, "rejected": 0,
+            "queue_wait_seconds_total": 0.0, "queue_wait_seconds_max": 0.0,
+        }
+
+    def _timed(self, fn: Callable, args: tuple, submitted_at: float):
+        waited = time.monotonic() - submitted_at
+        with self._lock:
+            self._running += 1
+        try:
+            return waited, fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _release(self, _future):
+        # Runs when the scrape thread finishes (or the job is cancelled before starting),
+        # not when the awaiting coroutine gives up, so the backlog bound stays real
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the scraper pool, or raise ScraperBusyError if the backlog is full"""
+        if self._pending >= self.max_workers + self.max_queue:
+            self.counters["rejected"] += 1
+            raise ScraperBusyError(
+                f"Scraper is busy ({self._pending} scrapes running or queued); try again shortly"
+            )
+
+        with self._lock:
+            self._pending += 1
+        self.counters["submitted"] += 1
+        future = self.executor.submit(self._timed, fn, args, time.monotonic())
+        future.add_done_callback(self._release)
+        try:
+            waited, result = await asyncio.wrap_future(future)
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+
+        self.counters["completed"] += 1
+        self.counters["queue_wait_seconds_total"] += waited
+        self.counters["queue_wait_seconds_max"] = max(self.counters["queue_wait_seconds_max"], waited)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self.counters["completed"]
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queued": max(0, self._pending - self._running),
+            "avg_queue_wait_ms": round(self.counters["queue_wait_seconds_total"] / completed * 1000, 2) if completed else 0.0,
+            "max_queue_wait_ms": round(self.counters["queue_wait_seconds_max"] * 1000, 2),
+            **{k: v for k, v in self.counters.items() if not k.startswith("queue_wait")},
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_scrape_executor() -> BoundedScrapeExecutor:
+    return BoundedScrapeExecutor(
+        max_workers=int(os.getenv("SCRAPER_WORKERS", "4")),
+        max_queue=int(os.getenv("SCRAPER_MAX_QUEUE", "8")),
+    )
@@ -0,0 +1,70 @@
+import time
+import logging
+from typing import Dict
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.1
+# Never wait longer for a postback than the fixed sleep these waits replaced
+POSTBACK_TIMEOUT_SECONDS = 3.0
+
+
+class StepTimer:
+    """Wall-clock milliseconds per step of a scrape; mark() closes the current step"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.steps: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    def mark(self, name: str):
+        now = time.perf_counter()
+        self.steps[name] = round((now - self._started) * 1000, 2)
+        self._started = now
+
+    def log(self):
+        total = sum(self.steps.values())
+        detail = ", ".join(f"{name}={ms:.0f}ms" for name, ms in self.steps.items())
+        logger.info(f"{self.label}: {total:.0f}ms ({detail})")
+
+
+class options_loaded:
+    """Expected condition: the <select> with element_id lists more than the placeholder option"""
+
+    def __init__(self, element_id: str, min_options: int = 2):
+        self.element_id = element_id
+        self.min_options = min_options
+
+    def __call__(self, driver):
+        elements = driver.find_elements(By.ID, self.element_id)
+        if not elements:
+            return False
+        options = elements[0].find_elements(By.TAG_NAME, "option")
+        return elements[0] if len(options) >= self.min_options else False
+
+
+def click_and_wait_for_postback(driver, button_id: str, watched_id: str,
+                                timeout: float = POSTBACK_TIMEOUT_SECONDS) -> bool:
+    """Click button_id and wait until the postback re-renders watched_id.
+
+    ASP.NET replaces the element on both full and partial (UpdatePanel)
+    postbacks, so the old element going stale means the server answered.
+    Returns False if it never went stale within timeout; callers then carry
+    on as they did after the old fixed sleep, so the worst case is no slower.
+    """
+    watched = driver.find_elements(By.ID, watched_id)
+    driver.find_element(By.ID, button_id).click()
+    if not watched:
+        return True
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_SECONDS).until(EC.staleness_of(watched[0]))
+        return True
+    except TimeoutException:
+        logger.warning(f"{watched_id} was not re-rendered {timeout}s after clicking {button_id}")
+        return False
+
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Per-key deduplication of concurrent async fetches.
+
+    The first caller for a key starts the fetch; callers arriving while it
+    runs await the same future instead of starting their own. The fetch is
+    shielded, so a client disconnecting does not cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counters: Dict[str, int] = {"fetches": 0, "coalesced": 0, "refreshes": 0, "refresh_failures": 0}
+
+    def _start(self, key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        future = asyncio.ensure_future(factory())
+        self._inflight[key] = future
+        self.counters["fetches"] += 1
+
+        def done(task: asyncio.Future):
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+        future.add_done_callback(done)
+        return future
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await factory() for key, sharing one in-flight call among concurrent callers"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._start(key, factory)
+        else:
+            self.counters["coalesced"] += 1
+        return await asyncio.shield(future)
+
+    def refresh(self, key: str, factory: Callable[[], Awaitable[Any]]) -> bool:
+        """Start a background fetch for key unless one is already running"""
+        if key in self._inflight:
+            return False
+        self.counters["refreshes"] += 1
+        future = self._start(key, factory)
+
+        def report(task: asyncio.Future):
+            if not task.cancelled() and task.exception() is not None:
+                self.counters["refresh_failures"] += 1
+                logger.warning(f"[{self.name}] background refresh of {key} failed: {task.exception()}")
+
+        future.add_done_callback(report)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._inflight), **self.counters}